@@ -0,0 +1,362 @@
+"""
+这个模块提供了 MiniAGI 主循环（think → read_mind → act）的离线基准测试。
+
+代理和摘要器由 `replay.ReplayLLM` 替代，因此不会发起任何 OpenAI 调用。每个场景报告各阶段的耗时、
+分词器耗时和峰值内存，模拟的 LLM 延迟会从开销中扣除，便于发现我们自己代码中的性能回退。
+
+`--startup` 则在新的解释器进程中测量导入 main.py 和构造 `MiniAGI` 的耗时。
+
+用法:
+    python benchmark.py [--latency 秒] [--repeat 次数] [--replay 录制文件] [--json 输出文件]
+    python benchmark.py --startup [--repeat 次数] [--json 输出文件]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from contextlib import contextmanager
+
+from main import MiniAGI
+from replay import ReplayLLM
+from tracing import Tracer
+from exceptions import InvalidLLMResponseError, ReplayExhaustedError
+
+# 每个场景是一个固定的目标和按顺序回放的代理响应。
+SCENARIOS = {
+    "memorize": (
+        "规划一次周末旅行",
+        [
+            "<r>先整理思路。</r><c>memorize_thoughts</c>\n目的地、预算、交通、住宿。",
+            "<r>细化计划。</r><c>memorize_thoughts</c>\n周六出发，周日返回，预算 2000 元。",
+            "<r>目标已完成。</r><c>done</c>\n",
+        ],
+    ),
+    "python": (
+        "计算前 20 个斐波那契数",
+        [
+            "<r>用 Python 计算。</r><c>execute_python</c>\n"
+            "a, b = 0, 1\nfor _ in range(20):\n    a, b = b, a + b\nprint(a)",
+            "<r>把结果写入文件。</r><c>execute_python</c>\n"
+            "with open('fib.txt', 'w') as f:\n    f.write('6765')\nprint('ok')",
+            "<r>目标已完成。</r><c>done</c>\n",
+        ],
+    ),
+    "shell": (
+        "列出工作目录中的文件",
+        [
+            "<r>列出文件。</r><c>execute_shell</c>\nls -la",
+            "<r>统计行数。</r><c>execute_shell</c>\nwc -l data.txt",
+            "<r>目标已完成。</r><c>done</c>\n",
+        ],
+    ),
+    "ingest": (
+        "阅读 data.txt 并总结",
+        [
+            "<r>阅读本地文件。</r><c>ingest_data</c>\ndata.txt",
+            "<r>提取要点。</r><c>process_data</c>\n提取要点|data.txt",
+            # process_data 也通过代理的 predict 生成结果。
+            "要点：黄油、糖、面粉、巧克力豆。",
+            "<r>我需要向用户确认。</r><c>talk_to_user</c>\n摘要可以吗？",
+            "<r>目标已完成。</r><c>done</c>\n",
+        ],
+    ),
+}
+
+# 在新的解释器中测量启动耗时：导入 main.py，然后用回放后端构造代理（包括加载分词器）。
+STARTUP_SCRIPT = """
+import sys, json, time
+start = time.perf_counter()
+from main import MiniAGI
+from replay import ReplayLLM
+imported = time.perf_counter()
+try:
+    MiniAGI("gpt-4", "gpt-3.5-turbo", "startup", 4000, 2000,
+            agent=ReplayLLM(), summarizer=ReplayLLM(model_name="gpt-3.5-turbo"))
+    constructed = time.perf_counter() - imported
+except Exception as exception:
+    constructed = None
+    print(f"{type(exception).__name__}: {exception}", file=sys.stderr)
+print(json.dumps({"import_s": imported - start, "construct_s": constructed, "modules": len(sys.modules)}))
+"""
+
+# 场景使用的本地数据文件，足够大以触发观察结果的分块摘要。
+DATA_LINES = 20000
+
+
+class TimedEncoding:
+    """
+    包装 tiktoken 编码，统计 `encode` 的调用次数和耗时。
+    """
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.calls = 0
+        self.seconds = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self.encoding, name)
+
+    def encode(self, text, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.encoding.encode(text, *args, **kwargs)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.calls += 1
+
+
+@contextmanager
+def timed(timings: dict, phase: str):
+    """
+    把代码块的耗时累加到 `timings[phase]`。
+
+    Args:
+        timings (dict): 阶段名称到耗时列表的映射。
+        phase (str): 阶段名称。
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.setdefault(phase, []).append(time.perf_counter() - start)
+
+
+def run_loop(miniagi: MiniAGI, timings: dict, max_steps: int = 50) -> int:
+    """
+    以非交互方式运行与 main.py 相同的主循环。
+
+    Args:
+        miniagi (MiniAGI): 要运行的代理。
+        timings (dict): 阶段耗时的累加目标。
+        max_steps (int, optional): 最大步数。
+
+    Returns:
+        int: 执行的步数。
+    """
+    steps = 0
+    while steps < max_steps:
+        steps += 1
+        try:
+            with timed(timings, "think"):
+                miniagi.think()
+        except InvalidLLMResponseError:
+            continue
+        except ReplayExhaustedError:
+            break
+
+        with timed(timings, "read_mind"):
+            (_, command, _) = miniagi.read_mind()
+
+        if command == "done":
+            break
+
+        if command == "talk_to_user":
+            with timed(timings, "user_response"):
+                miniagi.user_response("好的，继续。")
+            continue
+
+        with timed(timings, "act"):
+            miniagi.act()
+
+    with timed(timings, "flush_summary"):
+        miniagi.flush_summary()
+
+    return steps
+
+
+def run_scenario(name: str, objective: str, agent: ReplayLLM, summarizer: ReplayLLM, args) -> dict:
+    """
+    在临时工作目录中运行一个场景并收集指标。
+
+    Args:
+        name (str): 场景名称。
+        objective (str): 代理的目标。
+        agent (ReplayLLM): 代理后端。
+        summarizer (ReplayLLM): 摘要器后端。
+        args: 命令行参数。
+
+    Returns:
+        dict: 场景的指标。
+    """
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            with open("data.txt", "w", encoding="utf-8") as file:
+                for i in range(DATA_LINES):
+                    file.write(f"第 {i} 行：巧克力曲奇需要黄油、糖、面粉和巧克力豆。\n")
+
+            miniagi = MiniAGI(
+                agent.model_name, summarizer.model_name, objective,
+                4000, 2000, False,
+                background_summary=args.background_summary,
+                stream=args.stream,
+                semantic_recall=args.semantic_recall,
+                prefetch=args.prefetch,
+                tracer=args.tracer,
+                result_cache=args.result_cache,
+                function_calling=args.function_calling,
+                agent=agent, summarizer=summarizer
+            )
+            encoding = TimedEncoding(miniagi.encoding)
+            miniagi.encoding = encoding
+            miniagi.tokens.encoding = encoding
+
+            timings = {}
+            tracemalloc.start()
+            start = time.perf_counter()
+            steps = run_loop(miniagi, timings)
+            wall = time.perf_counter() - start
+            (_, peak) = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            miniagi.close()
+        finally:
+            os.chdir(cwd)
+
+    llm_calls = sum(agent.calls.values()) + sum(summarizer.calls.values())
+    return {
+        "scenario": name,
+        "steps": steps,
+        "wall_s": wall,
+        # 假设 LLM 调用是串行的；并发摘要时这个估计会偏低。
+        "overhead_s": max(0.0, wall - llm_calls * args.latency),
+        "llm_calls": llm_calls,
+        "phases": {phase: {"count": len(values), "total_s": sum(values)} for phase, values in timings.items()},
+        "tokenizer_calls": encoding.calls,
+        "tokenizer_s": encoding.seconds,
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+def measure_startup(repeat: int) -> dict:
+    """
+    在新的解释器进程中多次测量启动耗时。
+
+    Args:
+        repeat (int): 测量次数。
+
+    Returns:
+        dict: 启动指标，耗时取中位数。
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        )
+        sample = json.loads(completed.stdout.strip().splitlines()[-1])
+        sample["process_s"] = time.perf_counter() - start
+        if completed.stderr:
+            sample["error"] = completed.stderr.strip().splitlines()[-1]
+        samples.append(sample)
+
+    constructs = [sample["construct_s"] for sample in samples if sample["construct_s"] is not None]
+    return {
+        "scenario": "startup",
+        "repeat": repeat,
+        "process_s": statistics.median(sample["process_s"] for sample in samples),
+        "import_s": statistics.median(sample["import_s"] for sample in samples),
+        "construct_s": statistics.median(constructs) if constructs else None,
+        "modules": samples[-1]["modules"],
+        "error": samples[-1].get("error"),
+    }
+
+
+def print_startup_report(result: dict):
+    """
+    打印启动耗时。
+
+    Args:
+        result (dict): `measure_startup` 返回的指标。
+    """
+    print(f"\n== startup (median of {result['repeat']}) ==")
+    print(f"process={result['process_s'] * 1000:.1f}ms import={result['import_s'] * 1000:.1f}ms "
+          f"modules={result['modules']}")
+    if result["construct_s"] is None:
+        print(f"construct: failed ({result['error']})")
+    else:
+        print(f"construct={result['construct_s'] * 1000:.1f}ms")
+
+
+def print_report(results: list):
+    """
+    以表格形式打印基准测试结果。
+
+    Args:
+        results (list): `run_scenario` 返回的指标列表。
+    """
+    for result in results:
+        print(f"\n== {result['scenario']} ==")
+        print(f"steps={result['steps']} llm_calls={result['llm_calls']} "
+              f"wall={result['wall_s'] * 1000:.1f}ms overhead={result['overhead_s'] * 1000:.1f}ms")
+        print(f"tokenizer: {result['tokenizer_calls']} calls, {result['tokenizer_s'] * 1000:.1f}ms; "
+              f"peak memory {result['peak_memory_kb']:.0f}KB")
+        for phase, stats in result["phases"].items():
+            mean = stats["total_s"] / stats["count"] * 1000
+            print(f"  {phase:<14} n={stats['count']:<3} total={stats['total_s'] * 1000:8.1f}ms mean={mean:8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MiniAGI 主循环的离线基准测试")
+    parser.add_argument("--latency", type=float, default=0.0, help="每次 LLM 调用的模拟延迟（秒）")
+    parser.add_argument("--repeat", type=int, default=1, help="每个场景的重复次数")
+    parser.add_argument("--replay", help="由 RECORD_FILE 录制的 JSONL 文件，代替内置场景")
+    parser.add_argument("--background-summary", action="store_true", help="在后台线程中更新历史摘要")
+    parser.add_argument("--stream", action="store_true", help="以流式方式生成并解析动作")
+    parser.add_argument("--semantic-recall", action="store_true", help="按相关性回忆较早的记忆")
+    parser.add_argument("--prefetch", action="store_true", help="在思考期间预取 ingest_data/process_data 的来源")
+    parser.add_argument("--result-cache", action="store_true", help="缓存重复的幂等命令的观察结果")
+    parser.add_argument("--function-calling", action="store_true", help="以函数调用的形式生成动作")
+    parser.add_argument("--trace", help="把各阶段的区间写入 JSONL 追踪文件，可用 tracing.py 汇总")
+    parser.add_argument("--startup", action="store_true", help="测量导入 main.py 和构造代理的启动耗时")
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    if args.startup:
+        result = measure_startup(args.repeat)
+        print_startup_report(result)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as file:
+                json.dump(result, file, ensure_ascii=False, indent=2)
+        return 0
+
+    args.tracer = Tracer(os.path.abspath(args.trace)) if args.trace else None
+
+    results = []
+    for _ in range(args.repeat):
+        if args.replay:
+            results.append(run_scenario(
+                "replay", "回放录制的运行",
+                ReplayLLM.from_recording(args.replay, "agent", latency=args.latency),
+                ReplayLLM.from_recording(args.replay, "summarizer", latency=args.latency, model_name="gpt-3.5-turbo"),
+                args
+            ))
+            continue
+
+        for name, (objective, responses) in SCENARIOS.items():
+            results.append(run_scenario(
+                name, objective,
+                ReplayLLM({"predict": responses}, latency=args.latency),
+                ReplayLLM(model_name="gpt-3.5-turbo", latency=args.latency),
+                args
+            ))
+
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
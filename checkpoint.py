@@ -0,0 +1,147 @@
+"""
+这个模块提供了 MiniAGI 代理状态的检查点：把摘要历史、记忆（包括已经计算好的嵌入向量）、
+批评和建议的动作以压缩的 JSON 格式原子地写入磁盘，并能从中恢复，不需要重新调用 LLM。
+"""
+
+import os
+import gzip
+import json
+import base64
+
+CHECKPOINT_VERSION = 2
+
+
+def _encode_embedding(embedding) -> str:
+    """
+    把嵌入向量编码为 float32 的 base64 字符串。
+    """
+    if embedding is None:
+        return None
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    return base64.b64encode(np.asarray(embedding, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def _decode_embedding(data: str):
+    """
+    把 base64 字符串解码为嵌入向量。
+    """
+    if data is None:
+        return None
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32)
+
+
+def export_memories(agent) -> list:
+    """
+    导出代理的记忆。`ThinkGPT` 的记忆带有嵌入向量，`ReplayLLM` 的记忆只有文本。
+
+    Args:
+        agent: `ThinkGPT` 实例或替身。
+
+    Returns:
+        list: 包含 text 和 embedding 的字典列表。
+    """
+    memories = []
+    for item in agent.memory:
+        if isinstance(item, str):
+            memories.append({"text": item, "embedding": None})
+        else:
+            memories.append({"text": item.text, "embedding": _encode_embedding(item.embedding)})
+    return memories
+
+
+def import_memories(agent, memories: list):
+    """
+    把导出的记忆按原顺序写回代理。带有嵌入向量的记忆直接复用向量，不再调用嵌入接口。
+
+    Args:
+        agent: `ThinkGPT` 实例或替身。
+        memories (list): `export_memories` 返回的列表。
+    """
+    for memory in memories:
+        embedding = _decode_embedding(memory["embedding"])
+        if embedding is None:
+            agent.memorize(memory["text"])
+        else:
+            from docarray import Document  # pylint: disable=import-outside-toplevel
+            agent.memorize(Document(text=memory["text"], embedding=embedding))
+
+
+def save_checkpoint(miniagi, path: str):
+    """
+    以原子方式把代理的完整状态写入检查点文件。
+
+    Args:
+        miniagi (MiniAGI): 要保存的代理。
+        path (str): 检查点文件路径。
+    """
+    (summarized_history, pending_memories, history) = miniagi.summary_state()
+
+    state = {
+        "version": CHECKPOINT_VERSION,
+        "steps": miniagi.steps,
+        "objective": miniagi.objective,
+        "max_context_size": miniagi.max_context_size,
+        "max_memory_item_size": miniagi.max_memory_item_size,
+        "summarized_history": summarized_history,
+        "pending_memories": pending_memories,
+        "history": history,
+        "criticism": miniagi.criticism,
+        "thought": miniagi.thought,
+        "proposed_command": miniagi.proposed_command,
+        "proposed_arg": miniagi.proposed_arg,
+        "memories": export_memories(miniagi.agent),
+    }
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as file:
+        file.write(json.dumps(state, ensure_ascii=False).encode("utf-8"))
+    with open(tmp_path, "rb") as raw:
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str) -> dict:
+    """
+    读取检查点文件。
+
+    Args:
+        path (str): 检查点文件路径。
+
+    Returns:
+        dict: 保存的代理状态。
+    """
+    with gzip.open(path, "rb") as file:
+        state = json.loads(file.read().decode("utf-8"))
+
+    # 版本 1 没有分层的历史摘要，恢复时把原来的摘要作为顶层摘要。
+    if state.get("version") not in (1, CHECKPOINT_VERSION):
+        raise ValueError(f"不支持的检查点版本: {state.get('version')}")
+    return state
+
+
+def restore_checkpoint(miniagi, state: dict):
+    """
+    把检查点中的状态恢复到一个新构造的代理中。
+
+    Args:
+        miniagi (MiniAGI): 新构造的代理，其目标和大小限制应与检查点一致。
+        state (dict): `load_checkpoint` 返回的状态。
+    """
+    miniagi.steps = state["steps"]
+    miniagi.history.restore(state.get("history") or {
+        "recent": [], "segments": [], "digest": state["summarized_history"]
+    })
+    miniagi.summarized_history = miniagi.history.render()
+    miniagi.criticism = state["criticism"]
+    miniagi.thought = state["thought"]
+    miniagi.proposed_command = state["proposed_command"]
+    miniagi.proposed_arg = state["proposed_arg"]
+
+    import_memories(miniagi.agent, state["memories"])
+    for memory in state["memories"]:
+        miniagi.tokens.count(memory["text"])
+        if miniagi.memory_index is not None:
+            miniagi.memory_index.add(memory["text"])
+
+    miniagi.restore_pending_memories(state["pending_memories"])
@@ -2,10 +2,91 @@
 这个模块提供了一组可以执行不同命令的静态方法。
 """
 
+import os
+import time
+import codecs
+import signal
+import threading
 import subprocess
 from io import StringIO
 from contextlib import redirect_stdout
 
+from python_worker import PythonWorker
+
+# execute_shell 的默认超时（秒），以及 stdout/stderr 各自保留的头部和尾部字节数。
+SHELL_TIMEOUT = float(os.getenv("SHELL_TIMEOUT", "120"))
+SHELL_HEAD_BYTES = 16 * 1024
+SHELL_TAIL_BYTES = 16 * 1024
+
+
+class HeadTailBuffer:
+    """
+    有界的输出缓冲区：保留开头的 `head_bytes` 字节和最后的 `tail_bytes` 字节，丢弃中间部分。
+    头部在写入时增量解码。
+
+    Attributes:
+        total_bytes (int): 写入的总字节数。
+    """
+
+    def __init__(self, head_bytes: int, tail_bytes: int):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.total_bytes = 0
+        self._head = []
+        self._head_size = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._tail = bytearray()
+
+    def write(self, data: bytes):
+        """
+        写入一段输出。
+
+        Args:
+            data (bytes): 输出的字节。
+        """
+        self.total_bytes += len(data)
+        if self._head_size < self.head_bytes:
+            room = self.head_bytes - self._head_size
+            self._head.append(self._decoder.decode(data[:room]))
+            self._head_size += min(room, len(data))
+            data = data[room:]
+        if data:
+            self._tail += data
+            if len(self._tail) > self.tail_bytes:
+                del self._tail[:len(self._tail) - self.tail_bytes]
+
+    @property
+    def truncated_bytes(self) -> int:
+        """
+        被丢弃的字节数。
+        """
+        return self.total_bytes - self._head_size - len(self._tail)
+
+    def getvalue(self) -> str:
+        """
+        返回保留的输出文本，被丢弃的部分用一行说明代替。
+
+        Returns:
+            str: 输出文本。
+        """
+        text = "".join(self._head)
+        if not self._tail:
+            return text + self._decoder.decode(b"", final=True)
+
+        tail = self._tail
+        if self.truncated_bytes:
+            # 尾部可能从一个多字节字符的中间开始，跳过开头的续字节。
+            start = 0
+            while start < len(tail) and start < 4 and tail[start] & 0xC0 == 0x80:
+                start += 1
+            tail = tail[start:]
+            # 头部末尾被截断的多字节字符直接丢弃。
+            self._decoder.reset()
+            text += f"\n...[省略 {self.truncated_bytes} 字节]...\n"
+            return text + tail.decode("utf-8", errors="replace")
+
+        return text + self._decoder.decode(bytes(tail), final=True)
+
 # 禁用 pylint 的特定警告
 # pylint: disable=broad-exception-caught, exec-used, unspecified-encoding
 
@@ -15,13 +96,14 @@ class Commands:
     """
 
     @staticmethod
-    def execute_command(command, arg) -> str:
+    def execute_command(command, arg, work_dir: str = None) -> str:
         """
         执行与提供的命令字符串对应的命令。
 
         Args:
             command (str): 表示要执行的命令的命令字符串。
             arg (str): 要传递给命令的参数。
+            work_dir (str, optional): 执行代码和 shell 命令的工作目录；为 None 时使用当前工作目录。
 
         Returns:
             str: 命令执行的结果，或者在执行过程中引发异常时的错误消息。
@@ -31,9 +113,9 @@ class Commands:
                 case "memorize_thoughts":
                     result = Commands.memorize_thoughts(arg)
                 case "execute_python":
-                    result = Commands.execute_python(arg)
+                    result = Commands.execute_python(arg, work_dir)
                 case "execute_shell":
-                    result = Commands.execute_shell(arg)
+                    result = Commands.execute_shell(arg, work_dir)
                 case _:
                     result = f"未知命令: {command}"
         except Exception as exception:
@@ -55,16 +137,23 @@ class Commands:
         return arg
 
     @staticmethod
-    def execute_python(arg: str) -> str:
+    def execute_python(arg: str, work_dir: str = None) -> str:
         """
         执行输入的 Python 代码并返回 stdout。
 
+        默认在常驻的进程外工作进程中执行，导入的模块和变量在多次执行之间保留，每个工作目录一个工作进程；
+        设置环境变量 PYTHON_WORKER=0 时退回到在当前进程中执行，此时忽略 `work_dir`。
+
         Args:
             arg (str): 输入的 Python 代码。
+            work_dir (str, optional): 工作进程的工作目录。
 
         Returns:
             str: 执行的 Python 代码产生的 stdout。
         """
+        if os.getenv("PYTHON_WORKER") != "0":
+            return PythonWorker.shared(work_dir).execute(arg)
+
         _stdout = StringIO()
         with redirect_stdout(_stdout):
             exec(arg)
@@ -72,20 +161,93 @@ class Commands:
         return _stdout.getvalue()
 
     @staticmethod
-    def execute_shell(arg: str) -> str:
+    def run_shell(arg: str, timeout: float = SHELL_TIMEOUT,
+                  head_bytes: int = SHELL_HEAD_BYTES, tail_bytes: int = SHELL_TAIL_BYTES, cwd: str = None) -> dict:
+        """
+        执行 shell 命令，以流的方式把 stdout 和 stderr 收集到有界的缓冲区中。
+        超时后终止命令所在的整个进程组。
+
+        Args:
+            arg (str): 输入的 shell 命令。
+            timeout (float, optional): 超时（秒）；为 0 或 None 时不限制。
+            head_bytes (int, optional): 每个输出流保留的头部字节数。
+            tail_bytes (int, optional): 每个输出流保留的尾部字节数。
+            cwd (str, optional): 命令的工作目录。
+
+        Returns:
+            dict: 包含 stdout、stderr、exit_code、timed_out、stdout_truncated_bytes、
+                stderr_truncated_bytes 和 runtime（秒）的字典。
+        """
+        start = time.monotonic()
+        process = subprocess.Popen(
+            arg, shell=True, cwd=cwd,
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            start_new_session=hasattr(os, "killpg")
+        )
+
+        buffers = (HeadTailBuffer(head_bytes, tail_bytes), HeadTailBuffer(head_bytes, tail_bytes))
+
+        def pump(stream, buffer):
+            with stream:
+                for data in iter(lambda: stream.read1(64 * 1024), b""):
+                    buffer.write(data)
+
+        readers = [
+            threading.Thread(target=pump, args=(stream, buffer), daemon=True)
+            for (stream, buffer) in zip((process.stdout, process.stderr), buffers)
+        ]
+        for reader in readers:
+            reader.start()
+
+        timed_out = False
+        try:
+            process.wait(timeout=timeout or None)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            try:
+                if hasattr(os, "killpg"):
+                    os.killpg(process.pid, signal.SIGKILL)
+                else:
+                    process.kill()
+            except OSError:
+                pass
+            process.wait()
+
+        # 脱离进程组的后台进程可能仍持有管道，不无限等待。
+        for reader in readers:
+            reader.join(timeout=1)
+
+        (stdout, stderr) = buffers
+        return {
+            "stdout": stdout.getvalue(),
+            "stderr": stderr.getvalue(),
+            "exit_code": process.returncode,
+            "timed_out": timed_out,
+            "stdout_truncated_bytes": stdout.truncated_bytes,
+            "stderr_truncated_bytes": stderr.truncated_bytes,
+            "runtime": time.monotonic() - start,
+        }
+
+    @staticmethod
+    def execute_shell(arg: str, work_dir: str = None) -> str:
         """
-        执行输入的 shell 命令并返回 stdout 和 stderr。
+        执行输入的 shell 命令并返回 stdout 和 stderr，以及退出码、运行时间和截断信息。
 
         Args:
             arg (str): 输入的 shell 命令。
+            work_dir (str, optional): 命令的工作目录。
 
         Returns:
             str: 执行的 shell 命令产生的 stdout 和 stderr。
         """
-        result = subprocess.run(arg, capture_output=True, shell=True, check=False)
+        result = Commands.run_shell(arg, cwd=work_dir)
 
-        stdout = result.stdout.decode("utf-8")
-        stderr = result.stderr.decode("utf-8")
+        status = f"EXIT CODE: {result['exit_code']}, RUNTIME: {result['runtime']:.2f}s"
+        if result["timed_out"]:
+            status += f", TIMED OUT after {SHELL_TIMEOUT:g}s"
+        if result["stdout_truncated_bytes"] or result["stderr_truncated_bytes"]:
+            status += f", TRUNCATED: stdout {result['stdout_truncated_bytes']} bytes," \
+                f" stderr {result['stderr_truncated_bytes']} bytes"
 
-        return f"STDOUT:\n{stdout}\nSTDERR:\n{stderr}"
+        return f"STDOUT:\n{result['stdout']}\nSTDERR:\n{result['stderr']}\n{status}"
 
@@ -6,3 +6,24 @@ class InvalidLLMResponseError(Exception):
     属性:
         无
     """
+
+class ReplayExhaustedError(Exception):
+    """当回放后端没有剩余的录制响应时引发的异常。
+
+    属性:
+        无
+    """
+
+class PythonWorkerError(Exception):
+    """当Python工作进程中的代码出错、超时或工作进程崩溃时引发的异常。
+
+    属性:
+        无
+    """
+
+class TokenizerUnavailableError(Exception):
+    """当分词器既不在本地缓存中、也无法下载时引发的异常。
+
+    属性:
+        无
+    """
@@ -0,0 +1,56 @@
+"""
+这个模块提供了大文件的分块读取：通过 mmap 按需映射文件，在分块边界处安全地增量解码文本，
+并支持在超出标记上限时提前停止计数。
+"""
+
+import os
+import mmap
+import codecs
+
+
+def iter_text_chunks(path: str, chunk_bytes: int = 256 * 1024, encoding: str = "utf-8"):
+    """
+    通过 mmap 逐块读取并解码文件。多字节字符被分块边界截断时，会留到下一块再解码。
+
+    Args:
+        path (str): 文件路径。
+        chunk_bytes (int, optional): 每块的字节数。
+        encoding (str, optional): 文件的文本编码，无法解码的字节会被替换。
+
+    Yields:
+        tuple: (已读取的字节数, 解码后的文本块)。
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for start in range(0, size, chunk_bytes):
+            end = min(start + chunk_bytes, size)
+            text = decoder.decode(mapped[start:end], final=end == size)
+            if text:
+                yield (end, text)
+
+
+def measure_file(path: str, count_tokens, limit: int, chunk_bytes: int = 256 * 1024) -> tuple:
+    """
+    逐块计算文件的标记数，一旦超出上限就停止。
+
+    Args:
+        path (str): 文件路径。
+        count_tokens (callable): 计算文本标记数的函数。
+        limit (int): 标记上限。
+        chunk_bytes (int, optional): 每块的字节数。
+
+    Returns:
+        tuple: (已计数的标记数, 是否超出上限, 平均每个标记的字节数)。
+    """
+    tokens = 0
+    consumed = 0
+    for (consumed, text) in iter_text_chunks(path, chunk_bytes):
+        tokens += count_tokens(text)
+        if tokens > limit:
+            return (tokens, True, consumed / tokens)
+
+    return (tokens, False, consumed / tokens if tokens else 1.0)
@@ -0,0 +1,291 @@
+"""
+这个模块提供了无界面的批量运行器：从 JSONL 文件读取目标，在同一个进程中并发运行多个 `MiniAGI` 实例，
+并把每个目标的结果写入 JSONL 文件。
+
+所有实例共享一个限速器、HTTP 连接池、tiktoken 编码和来源缓存；每个目标有自己独立的工作目录，
+其中的 Python 工作进程、shell 命令和相对路径文件都限定在这个目录里，并在每一步后保存检查点。
+
+输入文件的每一行是 `{"objective": "...", "id": "..."}`，`id` 可省略（默认为行号）。
+`id` 用作工作目录名，不能包含路径分隔符或为 `..`，同一批目标中也不能重复。
+代理请求用户回应时，运行器以固定的回复让代理自行决定。
+
+用法:
+    python fleet.py <目标文件> <结果文件> [--workers 并发数] [--rpm 每分钟请求数] [--max-steps 步数] [--work-root 目录]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from main import MiniAGI
+from python_worker import PythonWorker
+from rate_limit import RateLimiter
+from http_client import HttpClient
+from source_cache import SourceCache
+from checkpoint import save_checkpoint
+from exceptions import InvalidLLMResponseError
+
+# 代理请求用户回应时使用的固定回复。
+HEADLESS_RESPONSE = "没有用户可以回应。请根据已有信息自行决定下一步。"
+
+# 连续收到无效响应的最大次数，超过后放弃该目标。
+MAX_INVALID_RESPONSES = 3
+
+
+def check_objectives(objectives: list):
+    """
+    检查目标的 id 都可以安全地用作 `work_root` 下的目录名，并且互不重复。
+
+    Args:
+        objectives (list): 包含 id 和 objective 的字典列表。
+
+    Raises:
+        ValueError: id 为空、是 `.` 或 `..`、包含路径分隔符，或与之前的 id 重复时。
+    """
+    seen = set()
+    for item in objectives:
+        item_id = item["id"]
+        if item_id in ("", ".", "..") or any(char in item_id for char in "/\\:\0"):
+            raise ValueError(f"目标 id {item_id!r} 不能用作目录名")
+        if item_id in seen:
+            raise ValueError(f"目标 id {item_id!r} 重复")
+        seen.add(item_id)
+
+
+def read_objectives(path: str) -> list:
+    """
+    读取目标文件。
+
+    Args:
+        path (str): JSONL 目标文件路径。
+
+    Returns:
+        list: 包含 id 和 objective 的字典列表。
+
+    Raises:
+        ValueError: 某个 id 不能用作目录名或重复时。
+    """
+    objectives = []
+    with open(path, "r", encoding="utf-8") as file:
+        for (number, line) in enumerate(file, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            objectives.append({"id": str(item.get("id", number)), "objective": item["objective"]})
+    check_objectives(objectives)
+    return objectives
+
+
+def run_objective(miniagi: MiniAGI, max_steps: int, checkpoint_file: str = None) -> str:
+    """
+    以非交互方式运行与 main.py 相同的主循环，直到代理发出 done 或达到最大步数。
+
+    Args:
+        miniagi (MiniAGI): 要运行的代理。
+        max_steps (int): 最大步数。
+        checkpoint_file (str, optional): 每一步后保存检查点的文件。
+
+    Returns:
+        str: 结束状态："done"、"max_steps" 或 "invalid_response"。
+    """
+    invalid_responses = 0
+    while miniagi.steps < max_steps:
+        try:
+            miniagi.think()
+        except InvalidLLMResponseError:
+            invalid_responses += 1
+            if invalid_responses >= MAX_INVALID_RESPONSES:
+                return "invalid_response"
+            continue
+        invalid_responses = 0
+
+        if miniagi.proposed_command == "done":
+            return "done"
+
+        if miniagi.proposed_command == "talk_to_user":
+            miniagi.user_response(HEADLESS_RESPONSE)
+        else:
+            miniagi.act()
+
+        if checkpoint_file is not None:
+            save_checkpoint(miniagi, checkpoint_file)
+
+    return "max_steps"
+
+
+class Fleet:
+    """
+    在一个进程中并发运行多个目标的批量运行器。
+
+    Attributes:
+        work_root (str): 各目标工作目录的父目录。
+        workers (int): 同时运行的目标数。
+        max_steps (int): 每个目标的最大步数。
+        rate_limiter (RateLimiter): 所有代理共享的限速器。
+        http_client (HttpClient): 所有代理共享的 HTTP 客户端，每个并发目标可同时占用代理和摘要器两个连接。
+        source_cache (SourceCache): 所有代理共享的来源缓存；为 None 时不缓存。
+        agent_model (str): 代理模型名称。
+        summarizer_model (str): 摘要模型名称。
+    """
+
+    def __init__(self, work_root: str, workers: int = 4, max_steps: int = 50, requests_per_minute: float = 60,
+                 source_cache=None, agent_model: str = "gpt-4", summarizer_model: str = "gpt-3.5-turbo"):
+        """
+        构造一个 `Fleet` 实例。
+
+        Args:
+            work_root (str): 各目标工作目录的父目录。
+            workers (int, optional): 同时运行的目标数。
+            max_steps (int, optional): 每个目标的最大步数。
+            requests_per_minute (float, optional): 所有代理合计每分钟允许的 LLM 请求数。
+            source_cache (SourceCache, optional): 共享的来源缓存。
+            agent_model (str, optional): 代理模型名称。
+            summarizer_model (str, optional): 摘要模型名称。
+        """
+        self.work_root = work_root
+        self.workers = workers
+        self.max_steps = max_steps
+        self.rate_limiter = RateLimiter(requests_per_minute, burst=workers)
+        self.http_client = HttpClient(pool_maxsize=2 * workers)
+        self.source_cache = source_cache
+        self.agent_model = agent_model
+        self.summarizer_model = summarizer_model
+
+    def create_agent(self, objective: str, work_dir: str) -> MiniAGI:
+        """
+        为一个目标创建代理。可以在子类中覆盖，例如换用 `replay.ReplayLLM`。
+
+        Args:
+            objective (str): 目标。
+            work_dir (str): 目标的工作目录。
+
+        Returns:
+            MiniAGI: 新的代理。
+        """
+        return MiniAGI(
+            self.agent_model,
+            self.summarizer_model,
+            objective,
+            4000,
+            2000,
+            background_summary=True,
+            source_cache=self.source_cache,
+            work_dir=work_dir,
+            rate_limiter=self.rate_limiter,
+            http_client=self.http_client
+        )
+
+    def run_one(self, item: dict) -> dict:
+        """
+        在独立的工作目录中运行一个目标。
+
+        Args:
+            item (dict): 包含 id 和 objective 的字典。
+
+        Returns:
+            dict: 目标的结果。
+        """
+        work_dir = os.path.join(self.work_root, item["id"])
+        os.makedirs(work_dir, exist_ok=True)
+
+        result = {"id": item["id"], "objective": item["objective"], "work_dir": work_dir}
+        start = time.monotonic()
+        miniagi = None
+        try:
+            miniagi = self.create_agent(item["objective"], work_dir)
+            result["status"] = run_objective(
+                miniagi, self.max_steps, os.path.join(work_dir, "miniagi_checkpoint.json.gz")
+            )
+            miniagi.flush_summary()
+        except Exception as exception:  # pylint: disable=broad-exception-caught
+            result["status"] = "error"
+            result["error"] = f"{type(exception).__name__}: {exception}"
+        finally:
+            PythonWorker.release(work_dir)
+            if miniagi is not None:
+                miniagi.close()
+
+        if miniagi is not None:
+            result.update({
+                "steps": miniagi.steps,
+                "thought": miniagi.thought,
+                "command": miniagi.proposed_command,
+                "arg": miniagi.proposed_arg,
+                "summary": miniagi.summarized_history,
+            })
+        result["runtime"] = time.monotonic() - start
+        return result
+
+    def run(self, objectives: list, results_path: str, on_result=None) -> list:
+        """
+        并发运行所有目标，每完成一个就把结果追加到结果文件。
+
+        Args:
+            objectives (list): `read_objectives` 返回的列表。
+            results_path (str): JSONL 结果文件路径。
+            on_result (callable, optional): 每完成一个目标时调用的回调，参数为结果。
+
+        Returns:
+            list: 按完成顺序排列的结果。
+
+        Raises:
+            ValueError: 某个 id 不能用作目录名或重复时，此时不会运行任何目标。
+        """
+        check_objectives(objectives)
+        results = []
+        with open(results_path, "a", encoding="utf-8") as file, \
+                ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.run_one, item) for item in objectives]
+            for future in as_completed(futures):
+                result = future.result()
+                file.write(json.dumps(result, ensure_ascii=False) + "\n")
+                file.flush()
+                results.append(result)
+                if on_result is not None:
+                    on_result(result)
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在一个进程中并发运行多个 MiniAGI 目标")
+    parser.add_argument("objectives", help="JSONL 目标文件，每行包含 objective 和可选的 id")
+    parser.add_argument("results", help="JSONL 结果文件，每完成一个目标追加一行")
+    parser.add_argument("--workers", type=int, default=4, help="同时运行的目标数")
+    parser.add_argument("--rpm", type=float, default=60, help="所有代理合计每分钟允许的 LLM 请求数")
+    parser.add_argument("--max-steps", type=int, default=50, help="每个目标的最大步数")
+    parser.add_argument("--work-root", default=os.path.join(Path.home(), "miniagi", "fleet"),
+                        help="各目标工作目录的父目录")
+    args = parser.parse_args()
+
+    try:
+        objectives = read_objectives(args.objectives)
+    except ValueError as e:
+        parser.error(f"{args.objectives}: {e}")
+
+    # 与 main.py 一样，SOURCE_CACHE_DIR 设置为空字符串时禁用来源缓存。
+    source_cache = SourceCache(
+        os.getenv("SOURCE_CACHE_DIR", os.path.join(Path.home(), ".cache", "miniagi", "sources"))
+    ) if os.getenv("SOURCE_CACHE_DIR") != "" else None
+
+    fleet = Fleet(
+        os.path.abspath(args.work_root),
+        workers=args.workers,
+        max_steps=args.max_steps,
+        requests_per_minute=args.rpm,
+        source_cache=source_cache
+    )
+    fleet.run(
+        objectives,
+        args.results,
+        on_result=lambda result: print(f"[{result['id']}] {result['status']} ({result.get('steps', 0)} steps)")
+    )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
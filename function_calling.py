@@ -0,0 +1,169 @@
+"""
+这个模块提供了函数调用模式：把 `Commands` 支持的命令声明为结构化的函数，
+由模型以函数调用的形式返回动作，不再需要解析自由文本的 `<r>…</r><c>…</c>` 格式。
+
+函数的参数由 API 按 JSON 返回，格式错误导致的重试大大减少；
+命令表、动作格式和示例也不必在每一步的提示中重复发送。
+"""
+
+import os
+import re
+import json
+
+from exceptions import InvalidLLMResponseError
+
+# 每个命令的函数名与 `Commands` 中的命令相同；每个函数都有 reasoning 参数，其余参数组成命令的参数。
+FUNCTIONS = [
+    {
+        "name": "memorize_thoughts",
+        "description": "记录内部辩论、细化或规划。",
+        "parameters": {"thoughts": "要记住的想法，不能为空"},
+    },
+    {
+        "name": "execute_python",
+        "description": "运行 Python 代码（可以多行），代码必须以输出结果的 print 语句结束。",
+        "parameters": {"code": "Python 代码"},
+    },
+    {
+        "name": "execute_shell",
+        "description": "运行一条非交互式的单行 shell 命令。",
+        "parameters": {"command": "shell 命令"},
+    },
+    {
+        "name": "ingest_data",
+        "description": "读取一个文件或 URL，内容过大时会被摘要。",
+        "parameters": {"source": "一个文件路径或 URL"},
+    },
+    {
+        "name": "process_data",
+        "description": "用更大的上下文窗口按提示处理一个文件或 URL 中的大量数据。",
+        "parameters": {"prompt": "处理数据的提示", "source": "一个文件路径或 URL"},
+    },
+    {
+        "name": "talk_to_user",
+        "description": "对用户说话并等待回应。",
+        "parameters": {"message": "要说的话"},
+    },
+    {
+        "name": "done",
+        "description": "目标已经实现。",
+        "parameters": {},
+    },
+]
+
+# 函数名到参数名列表的映射，参数按顺序以 "|" 连接为命令的参数。
+FUNCTION_ARGUMENTS = {function["name"]: list(function["parameters"]) for function in FUNCTIONS}
+
+# 自由文本动作的格式，用于把录制的文本响应转换为函数调用。
+ACTION_PATTERN = r'^<r>(.*?)</r><c>(.*?)</c>\n*(.*)$'
+
+
+def function_schemas() -> list:
+    """
+    返回 OpenAI `functions` 参数格式的函数声明。
+
+    Returns:
+        list: 函数声明列表。
+    """
+    schemas = []
+    for function in FUNCTIONS:
+        properties = {"reasoning": {"type": "string"}}
+        for (name, description) in function["parameters"].items():
+            properties[name] = {"type": "string", "description": description}
+        schemas.append({
+            "name": function["name"],
+            "description": function["description"],
+            "parameters": {"type": "object", "properties": properties, "required": list(properties)},
+        })
+    return schemas
+
+
+def call_function(llm, prompt: str) -> dict:
+    """
+    让模型以函数调用的形式返回下一个动作。
+
+    如果后端自己实现了 `call_function`（例如 `replay.ReplayLLM`），则使用它；否则直接调用 OpenAI 接口。
+
+    Args:
+        llm: `ThinkGPT` 实例或实现了 `call_function` 的后端。
+        prompt (str): 提示。
+
+    Returns:
+        dict: 模型返回的消息，函数调用位于 "function_call" 中。
+    """
+    if hasattr(type(llm), "call_function"):
+        return llm.call_function(prompt)
+
+    import openai  # pylint: disable=import-outside-toplevel
+
+    response = openai.ChatCompletion.create(
+        model=llm.model_name,
+        messages=[{"role": "user", "content": prompt}],
+        functions=function_schemas(),
+        function_call="auto",
+        request_timeout=getattr(llm, "request_timeout", None),
+        api_key=os.environ.get("OPENAI_API_KEY"),
+    )
+    message = response["choices"][0]["message"]
+    result = {"content": message.get("content")}
+    if message.get("function_call"):
+        result["function_call"] = {
+            "name": message["function_call"]["name"],
+            "arguments": message["function_call"].get("arguments") or "{}",
+        }
+    return result
+
+
+def parse_function_call(message: dict) -> tuple:
+    """
+    把函数调用解析为推理、命令和参数。
+
+    Args:
+        message (dict): `call_function` 返回的消息。
+
+    Returns:
+        tuple: 包含推理、命令、参数和按名称的参数的元组。参数是按 "|" 连接的文本形式，用于显示和记忆；
+            按名称的参数是命令参数名到值的字典，执行命令时使用，参数值中的 "|" 不会被误认为分隔符。
+
+    Raises:
+        InvalidLLMResponseError: 消息中没有函数调用、函数未知或参数不是 JSON 对象时。
+    """
+    function_call = message.get("function_call")
+    if not function_call or function_call.get("name") not in FUNCTION_ARGUMENTS:
+        raise InvalidLLMResponseError
+
+    try:
+        # 模型偶尔在字符串中输出未转义的换行，strict=False 允许这些控制字符。
+        arguments = json.loads(function_call.get("arguments") or "{}", strict=False)
+    except ValueError as exc:
+        raise InvalidLLMResponseError from exc
+    if not isinstance(arguments, dict):
+        raise InvalidLLMResponseError
+
+    command = function_call["name"]
+    named_args = {name: str(arguments.get(name, "")) for name in FUNCTION_ARGUMENTS[command]}
+    arg = "|".join(named_args.values())
+    return (str(arguments.get("reasoning", "")), command, arg, named_args)
+
+
+def message_from_text(response_text: str) -> dict:
+    """
+    把自由文本格式的动作转换为函数调用消息，使录制的文本响应也可以在函数调用模式中回放。
+
+    Args:
+        response_text (str): `<r>…</r><c>…</c>` 格式的响应。
+
+    Returns:
+        dict: 等价的函数调用消息；无法解析时只包含文本内容。
+    """
+    match = re.search(ACTION_PATTERN, response_text, flags=re.DOTALL | re.MULTILINE)
+    if match is None or match[2] not in FUNCTION_ARGUMENTS:
+        return {"content": response_text}
+
+    names = FUNCTION_ARGUMENTS[match[2]]
+    values = match[3].split("|", len(names) - 1) if names else []
+    arguments = {"reasoning": match[1], **dict(zip(names, values))}
+    return {
+        "content": None,
+        "function_call": {"name": match[2], "arguments": json.dumps(arguments, ensure_ascii=False)},
+    }
@@ -0,0 +1,149 @@
+"""
+这个模块提供了 `HistorySummary` 类，一个分层滚动的历史摘要：
+最近的记忆项保持原文，较早的记忆项被摘要为片段，最早的片段再并入顶层摘要。
+
+只有某一层超出其标记预算时才调用 LLM，而且每次只摘要溢出的那一部分，
+不必在每一步都把整个摘要重写一遍。
+"""
+
+import threading
+
+
+class HistorySummary:
+    """
+    分层滚动的历史摘要。
+
+    第 0 层是最近的记忆项原文（它们同时出现在上下文的 PREV ACTIONS 中，因此不参与 `render`），
+    第 1 层是若干片段摘要，第 2 层是一份顶层摘要。
+
+    Attributes:
+        recent (list): 尚未摘要的最近记忆项。
+        segments (list): 片段摘要，从旧到新。
+        digest (str): 顶层摘要。
+        recent_tokens (int): 第 0 层的标记预算。
+        recent_items (int): 第 0 层的最大条目数；为 None 时只按标记数限制。
+        segments_tokens (int): 第 1 层的标记预算。
+        segment_tokens (int): 每个片段摘要的最大标记数。
+        digest_tokens (int): 顶层摘要的最大标记数。
+    """
+
+    def __init__(self, summarize, count_tokens, recent_tokens: int, segments_tokens: int, digest_tokens: int,
+                 recent_items: int = None, segment_hint: str = "", digest_hint: str = ""):
+        """
+        构造一个 `HistorySummary` 实例。
+
+        Args:
+            summarize (callable): 摘要函数，参数为内容、最大标记数和摘要提示。
+            count_tokens (callable): 计算文本标记数的函数。
+            recent_tokens (int): 第 0 层的标记预算。
+            segments_tokens (int): 第 1 层的标记预算，每个片段摘要最多占四分之一。
+            digest_tokens (int): 顶层摘要的最大标记数。
+            recent_items (int, optional): 第 0 层的最大条目数，不应超过上下文中回忆的记忆项数。
+            segment_hint (str, optional): 摘要片段时的提示。
+            digest_hint (str, optional): 更新顶层摘要时的提示。
+        """
+        self.summarize = summarize
+        self.count_tokens = count_tokens
+        self.recent_tokens = recent_tokens
+        self.segments_tokens = segments_tokens
+        self.segment_tokens = max(1, segments_tokens // 4)
+        self.digest_tokens = digest_tokens
+        self.recent_items = recent_items
+        self.segment_hint = segment_hint
+        self.digest_hint = digest_hint
+
+        self.recent = []
+        self.segments = []
+        self.digest = ""
+        self._lock = threading.Lock()
+
+    def add(self, items: list):
+        """
+        记录新的记忆项，不调用 LLM。
+
+        Args:
+            items (list): 新的记忆项，从旧到新。
+        """
+        with self._lock:
+            self.recent = self.recent + list(items)
+
+    def extend(self, items: list):
+        """
+        记录新的记忆项，并在某一层超出预算时向上滚动。
+
+        记忆项总是先被记录下来；滚动失败时异常会传给调用方，下一次滚动时再继续。
+
+        Args:
+            items (list): 新的记忆项，从旧到新。
+        """
+        self.add(items)
+        self.roll()
+
+    def _oldest_half(self, texts: list) -> int:
+        """
+        返回从最旧开始、标记数达到总数一半所需的条目数（至少一条，至多留下一条）。
+        """
+        counts = [self.count_tokens(text) for text in texts]
+        half = sum(counts) / 2
+        (taken, total) = (0, 0)
+        while taken < len(texts) - 1 and (taken == 0 or total < half):
+            total += counts[taken]
+            taken += 1
+        return taken
+
+    def roll(self):
+        """
+        把超出预算的层向上滚动：最旧的一半记忆项摘要为一个片段，最旧的一半片段并入顶层摘要。
+        """
+        while len(self.recent) > 1 and (
+                sum(map(self.count_tokens, self.recent)) > self.recent_tokens
+                or self.recent_items is not None and len(self.recent) > self.recent_items):
+            taken = self._oldest_half(self.recent)
+            segment = self.summarize("\n".join(self.recent[:taken]), self.segment_tokens, self.segment_hint)
+            with self._lock:
+                self.segments = self.segments + [segment]
+                self.recent = self.recent[taken:]
+
+        while len(self.segments) > 1 and sum(map(self.count_tokens, self.segments)) > self.segments_tokens:
+            taken = self._oldest_half(self.segments)
+            new_segments = "\n".join(self.segments[:taken])
+            digest = self.summarize(
+                f"Current summary:\n{self.digest}\nAdd to summary:\n{new_segments}",
+                self.digest_tokens,
+                self.digest_hint
+            )
+            with self._lock:
+                self.digest = digest
+                self.segments = self.segments[taken:]
+
+    def render(self) -> str:
+        """
+        返回用于上下文的摘要文本：顶层摘要，然后是从旧到新的片段摘要。
+
+        Returns:
+            str: 摘要文本。
+        """
+        with self._lock:
+            return "\n".join([self.digest] + self.segments if self.digest else self.segments)
+
+    def state(self) -> dict:
+        """
+        返回可以序列化的状态，用于保存检查点。
+
+        Returns:
+            dict: 包含 recent、segments 和 digest 的字典。
+        """
+        with self._lock:
+            return {"recent": list(self.recent), "segments": list(self.segments), "digest": self.digest}
+
+    def restore(self, state: dict):
+        """
+        从 `state` 返回的状态中恢复。
+
+        Args:
+            state (dict): 保存的状态。
+        """
+        with self._lock:
+            self.recent = list(state["recent"])
+            self.segments = list(state["segments"])
+            self.digest = state["digest"]
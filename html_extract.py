@@ -0,0 +1,140 @@
+"""
+这个模块提供了流式的 HTML 文本提取：边读取响应边解析，丢弃 script/style/nav 等样板内容，
+并在达到字节或标记上限时停止读取。
+"""
+
+import codecs
+from html.parser import HTMLParser
+
+# 这些标签内的内容不是正文，直接丢弃。
+SKIPPED_TAGS = {
+    "script", "style", "noscript", "template", "svg", "iframe",
+    "head", "nav", "footer", "aside",
+}
+
+# 这些标签结束后换行，避免相邻段落的文本粘在一起。
+BLOCK_TAGS = {
+    "p", "div", "li", "tr", "br", "section", "article", "blockquote", "pre",
+    "h1", "h2", "h3", "h4", "h5", "h6",
+}
+
+
+class StreamingTextExtractor(HTMLParser):
+    """
+    增量提取 HTML 正文的解析器。
+
+    Attributes:
+        max_tokens (int): 提取文本的标记上限；为 None 时不限制。
+        full (bool): 是否已经收集到足够的文本。
+    """
+
+    def __init__(self, max_tokens: int = None, count_tokens=None):
+        """
+        构造一个 `StreamingTextExtractor` 实例。
+
+        Args:
+            max_tokens (int, optional): 提取文本的标记上限。
+            count_tokens (callable, optional): 计算文本标记数的函数；为 None 时按字符数估算。
+        """
+        super().__init__(convert_charrefs=True)
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens or len
+        self.full = False
+        self._pieces = []
+        self._tokens = 0
+        self._skip_tag = None
+        self._skip_depth = 0
+
+    # 跳过时只跟踪同名标签的嵌套，未闭合的 <li>、<p> 等不会让跳过范围失控。
+    def handle_starttag(self, tag, attrs):
+        # </head> 可以省略，<body> 开始时 <head> 一定已经结束。
+        if tag == "body" and self._skip_tag == "head":
+            self._skip_tag = None
+            self._skip_depth = 0
+        if self._skip_tag is None and tag in SKIPPED_TAGS:
+            self._skip_tag = tag
+            self._skip_depth = 1
+        elif tag == self._skip_tag:
+            self._skip_depth += 1
+        elif tag == "br":
+            self._newline()
+
+    def handle_endtag(self, tag):
+        if tag == self._skip_tag:
+            self._skip_depth -= 1
+            if self._skip_depth == 0:
+                self._skip_tag = None
+        elif tag in BLOCK_TAGS:
+            self._newline()
+
+    def _newline(self):
+        """
+        在已提取的文本末尾追加一个换行（如果还没有）。
+        """
+        if self._skip_tag is None and self._pieces and not self._pieces[-1].endswith("\n"):
+            self._pieces.append("\n")
+
+    def handle_data(self, data):
+        if self._skip_tag is not None or self.full:
+            return
+
+        # 连续的空白只保留一个换行，减少无意义的标记。
+        if not data.strip():
+            self._newline()
+            return
+
+        self._pieces.append(data)
+        if self.max_tokens is not None:
+            self._tokens += self.count_tokens(data)
+            if self._tokens >= self.max_tokens:
+                self.full = True
+
+    def get_text(self) -> str:
+        """
+        返回目前为止提取的文本。
+
+        Returns:
+            str: 提取的文本。
+        """
+        return "".join(self._pieces)
+
+
+def extract_text(response, max_bytes: int = None, max_tokens: int = None, count_tokens=None,
+                 chunk_size: int = 64 * 1024) -> tuple:
+    """
+    从 HTTP 响应中流式提取正文，达到上限后停止读取。
+
+    Args:
+        response: `urlopen` 返回的响应对象，或任何带有 `read(size)` 方法的对象。
+        max_bytes (int, optional): 最多读取的字节数。
+        max_tokens (int, optional): 提取文本的标记上限。
+        count_tokens (callable, optional): 计算文本标记数的函数。
+        chunk_size (int, optional): 每次读取的字节数。
+
+    Returns:
+        tuple: (提取的文本, 从响应中读取的字节数)。
+    """
+    charset = None
+    headers = getattr(response, "headers", None)
+    if headers is not None and hasattr(headers, "get_content_charset"):
+        charset = headers.get_content_charset()
+    try:
+        decoder = codecs.getincrementaldecoder(charset or "utf-8")(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    parser = StreamingTextExtractor(max_tokens, count_tokens)
+    total = 0
+    while not parser.full:
+        size = chunk_size if max_bytes is None else min(chunk_size, max_bytes - total)
+        if size <= 0:
+            break
+        chunk = response.read(size)
+        if not chunk:
+            break
+        total += len(chunk)
+        parser.feed(decoder.decode(chunk))
+
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    return (parser.get_text(), total)
@@ -0,0 +1,215 @@
+"""
+这个模块提供了 `HttpClient` 类，一个代理和摘要器共享的 HTTP 客户端：
+连接池保持长连接，遇到 429 和 5xx 响应时按 `Retry-After` 或带抖动的指数退避重试，
+读取超时按预期的输出标记数计算，而不是对所有请求使用同一个很长的超时。
+
+`HttpClient.install` 把会话交给 openai，之后 `ThinkGPT` 和流式接口的所有请求都通过它发送。
+设置 OPENAI_API_BASE 可以把请求发往本地的替身服务器进行测试。
+"""
+
+import random
+import threading
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from streaming import stream_predict
+from function_calling import call_function
+
+# 可以重试的响应状态码：速率限制和服务端的暂时错误。
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# 代理动作（推理、命令和参数）的典型最大标记数，用于计算预测请求的超时。
+ACTION_OUTPUT_TOKENS = 1000
+
+
+class JitteredRetry(Retry):
+    """
+    以“完全抖动”计算退避时间的重试策略：在 0 到指数退避时间之间随机取值，
+    避免多个代理在同一时刻重试。响应带有 `Retry-After` 时 urllib3 优先按它等待。
+
+    退避上限由 `max_backoff` 设置，而不是 urllib3 2.x 才有的 `backoff_max` 参数，因此也适用于 urllib3 1.26。
+    """
+
+    def __init__(self, *args, max_backoff: float = 60, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_backoff = max_backoff
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.max_backoff = self.max_backoff
+        return retry
+
+    def get_backoff_time(self) -> float:
+        backoff = min(self.max_backoff, super().get_backoff_time())
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+
+class _TimeoutAdapter(HTTPAdapter):
+    """
+    按当前线程预期的输出标记数设置读取超时的连接池适配器。
+    """
+
+    def __init__(self, client, **kwargs):
+        self.client = client
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        output_tokens = getattr(self.client._local, "output_tokens", None)
+        if output_tokens is not None:
+            kwargs["timeout"] = self.client.timeout_for(output_tokens)
+        return super().send(request, **kwargs)
+
+
+class HttpClient:
+    """
+    共享的 HTTP 客户端。所有方法都是线程安全的，可以在多个代理之间共享。
+
+    Attributes:
+        session (requests.Session): 带连接池和重试策略的会话。
+        connect_timeout (float): 建立连接的超时（秒）。
+        base_timeout (float): 读取超时的固定部分（秒），包括排队和处理提示的时间。
+        tokens_per_second (float): 估计的最低输出速度，用于按输出标记数增加读取超时。
+        max_timeout (float): 读取超时的上限（秒）。
+    """
+
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 16, retries: int = 5,
+                 backoff_factor: float = 1.0, backoff_max: float = 60, connect_timeout: float = 10,
+                 base_timeout: float = 30, tokens_per_second: float = 10, max_timeout: float = 600):
+        """
+        构造一个 `HttpClient` 实例。
+
+        Args:
+            pool_connections (int, optional): 缓存连接池的主机数。
+            pool_maxsize (int, optional): 每个主机保持的最大连接数，应不小于并发请求数。
+            retries (int, optional): 每个请求的最大重试次数。
+            backoff_factor (float, optional): 指数退避的基数（秒）。
+            backoff_max (float, optional): 单次退避的上限（秒）。
+            connect_timeout (float, optional): 建立连接的超时（秒）。
+            base_timeout (float, optional): 读取超时的固定部分（秒）。
+            tokens_per_second (float, optional): 估计的最低输出速度。
+            max_timeout (float, optional): 读取超时的上限（秒）。
+        """
+        self.connect_timeout = connect_timeout
+        self.base_timeout = base_timeout
+        self.tokens_per_second = tokens_per_second
+        self.max_timeout = max_timeout
+        self._local = threading.local()
+
+        # 读取超时不重试：服务端可能已经开始生成，超时异常原样交给调用方。
+        retry = JitteredRetry(
+            total=retries,
+            connect=retries,
+            read=False,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=None,
+            max_backoff=backoff_max,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+
+        adapter = _TimeoutAdapter(
+            self, pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def timeout_for(self, output_tokens: int) -> tuple:
+        """
+        计算预期输出 `output_tokens` 个标记的请求的超时。
+
+        Args:
+            output_tokens (int): 预期的最大输出标记数。
+
+        Returns:
+            tuple: (连接超时, 读取超时)。
+        """
+        read_timeout = self.base_timeout + output_tokens / self.tokens_per_second
+        return (self.connect_timeout, min(self.max_timeout, read_timeout))
+
+    @contextmanager
+    def expect_output(self, output_tokens: int):
+        """
+        在代码块中，当前线程发出的请求使用按 `output_tokens` 计算的超时。
+
+        Args:
+            output_tokens (int): 预期的最大输出标记数。
+        """
+        previous = getattr(self._local, "output_tokens", None)
+        self._local.output_tokens = output_tokens
+        try:
+            yield
+        finally:
+            self._local.output_tokens = previous
+
+    def install(self):
+        """
+        让 openai 的所有请求都使用这个客户端的会话。
+        """
+        import openai  # pylint: disable=import-outside-toplevel
+
+        openai.requestssession = self.session
+
+    def close(self):
+        """
+        关闭连接池中的所有连接。
+        """
+        self.session.close()
+
+
+class PooledLLM:
+    """
+    包装 `ThinkGPT` 或替身，为每次预测、流式预测、函数调用和摘要请求设置按预期输出大小计算的超时。
+
+    Attributes:
+        llm: 被包装的 `ThinkGPT` 实例或替身。
+        http_client (HttpClient): 共享的 HTTP 客户端。
+        output_tokens (int): 预测请求的预期最大输出标记数。
+    """
+
+    def __init__(self, llm, http_client: HttpClient, output_tokens: int = ACTION_OUTPUT_TOKENS):
+        """
+        构造一个 `PooledLLM` 实例。
+
+        Args:
+            llm: 被包装的 `ThinkGPT` 实例或替身。
+            http_client (HttpClient): 共享的 HTTP 客户端。
+            output_tokens (int, optional): 预测请求的预期最大输出标记数。
+        """
+        self.llm = llm
+        self.http_client = http_client
+        self.output_tokens = output_tokens
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def predict(self, prompt: str, **kwargs) -> str:
+        with self.http_client.expect_output(self.output_tokens):
+            return self.llm.predict(prompt=prompt, **kwargs)
+
+    def stream(self, prompt: str):
+        # 请求在取第一个片段时发出，超时只需覆盖这一步；之后的读取沿用连接上已经设置的超时，
+        # 生成器暂停期间当前线程的其他请求不受影响。
+        response = stream_predict(self.llm, prompt)
+        try:
+            with self.http_client.expect_output(self.output_tokens):
+                first = next(response, None)
+            if first is None:
+                return
+            yield first
+            yield from response
+        finally:
+            response.close()
+
+    def call_function(self, prompt: str) -> dict:
+        with self.http_client.expect_output(self.output_tokens):
+            return call_function(self.llm, prompt)
+
+    def summarize(self, content: str, max_tokens: int = 4096, instruction_hint: str = "") -> str:
+        with self.http_client.expect_output(max_tokens):
+            return self.llm.summarize(content, max_tokens, instruction_hint=instruction_hint)
@@ -3,20 +3,34 @@
 import os
 import sys
 import re
+import json
 import platform
+import threading
 import urllib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from urllib.request import urlopen
 from termcolor import colored
-import openai
-from thinkgpt.llm import ThinkGPT
-import tiktoken
-from bs4 import BeautifulSoup
 from spinner import Spinner
 from commands import Commands
 from exceptions import InvalidLLMResponseError
+from tokenizer import encoding_for_model
+from tracing import Tracer, TracedEncoding
+from token_ledger import TokenLedger
+from replay import RecordingLLM
+from streaming import stream_predict, ActionStreamParser
+from function_calling import call_function, parse_function_call, function_schemas
+from source_cache import SourceCache
+from html_extract import extract_text
+from parallel_summarizer import ParallelSummarizer
+from rate_limit import RateLimitedLLM
+from result_cache import ResultCache
+from history_summary import HistorySummary
+from file_chunks import iter_text_chunks, measure_file
+from checkpoint import save_checkpoint, load_checkpoint, restore_checkpoint
 import os
-os.environ["OPENAI_API_KEY"] = "sk-"
+# 只在没有设置密钥时使用占位值，作为库导入（例如 fleet.py）时不覆盖调用方的密钥
+os.environ.setdefault("OPENAI_API_KEY", "sk-")
 operating_system = platform.platform()
 PROMPT = f"你是在{operating_system}上运行的自主代理。" + '''
 目标：{objective}（例如“查找巧克力曲奇食谱”）
@@ -95,8 +109,33 @@ RETRIEVAL_PROMPT = "你将被要求处理来自 URL 或文件的数据。你无
 
 OBSERVATION_SUMMARY_HINT = "使用简短的句子和缩写总结文本。"
 
+# 从URL读取的最大字节数，以及提取文本相对于上下文大小的上限倍数。
+# 超出上下文大小的文本会被分块摘要，更多的文本只会增加摘要成本。
+MAX_SOURCE_BYTES = 16 * 1024 * 1024
+SOURCE_CONTEXT_FACTOR = 8
+
+# 函数调用模式的提示：命令由函数声明描述，这里只保留目标、上下文和行为规则。
+TOOL_PROMPT = f"你是在{operating_system}上运行的自主代理。" + '''
+目标：{objective}
+
+你正在逐步朝着目标努力。之前的步骤：
+
+{context}
+
+调用一个函数作为下一个动作，并在 reasoning 参数中简要说明理由。
+ingest_data 和 process_data 一次只能指定一个文件或 URL。
+不要搜索 GPT3/GPT4 已经知道的信息。
+不要重复之前执行的命令。
+如果目标已实现，请调用 done。
+每个动作都会返回一个观察结果，观察结果可能会被总结以适应你有限的记忆。'''
+
 HISTORY_SUMMARY_HINT = "你是一个自主代理，正在总结你的历史。根据你的历史摘要和最新动作生成一个新摘要。包括所有先前动作的列表。保持简短。使用简短的句子和缩写。"
 
+# 历史摘要中保持原文的最近记忆项数，不超过构建上下文时回忆的条数。
+RECENT_HISTORY_ITEMS = 16
+
+SEGMENT_SUMMARY_HINT = "你是一个自主代理，正在总结你的一段连续动作。列出每个动作及其关键结果。保持简短。使用简短的句子和缩写。"
+
 class MiniAGI:
     """
     代表一个自主代理。
@@ -108,12 +147,26 @@ class MiniAGI:
         max_context_size (int): 代理短期记忆的最大大小（以标记计数）。
         max_memory_item_size (int): 记忆项的最大大小（以标记计数）。
         debug (bool): 指示是否打印调试信息。
-        summarized_history (str): 代理动作的摘要历史。
+        steps (int): 已完成的步数。
+        summarized_history (str): 代理动作的摘要历史，由 `history` 生成。
+        history: `HistorySummary` 的一个实例，分层滚动地摘要代理的历史。
         criticism (str): 代理最后一个动作的批评。
         thought (str): 代理最后一个动作的推理。
         proposed_command (str): 代理建议执行的下一个命令。
         proposed_arg (str): 建议命令的参数。
+        proposed_named_args (dict): 函数调用模式下建议命令按名称的参数；其他模式下为 None。
         encoding: 代理模型词汇表的编码。
+        tokens: `TokenLedger` 的一个实例，缓存记忆项、摘要和提示模板的标记计数。
+        background_summary (bool): 指示是否在后台线程中更新历史摘要。
+        stream (bool): 指示是否以流式方式生成并解析动作，动作完整后立即停止生成。
+        source_cache: `SourceCache` 的一个实例，缓存URL和文件的提取文本；为 None 时不缓存。
+        chunk_summarizer: `ParallelSummarizer` 的一个实例，并发摘要超出大小限制的输入。
+        memory_index: `MemoryIndex` 的一个实例，用于按相关性回忆较早的记忆；为 None 时只使用最近的记忆。
+        pending_memories (list): 尚未并入摘要的记忆项。
+        work_dir (str): 代理执行命令和读取相对路径文件的工作目录；为 None 时使用当前工作目录。
+        prefetch (bool): 指示是否预取动作中的 ingest_data/process_data 来源。
+        tracer: `Tracer` 的一个实例，记录每一步各阶段的耗时、标记数和读取的字节数。
+        result_cache: `ResultCache` 的一个实例，缓存幂等命令的观察结果；为 None 时不缓存。
     """
 
     def __init__(
@@ -123,7 +176,21 @@ class MiniAGI:
         objective: str,
         max_context_size: int,
         max_memory_item_size: int,
-        debug: bool = False
+        debug: bool = False,
+        background_summary: bool = False,
+        stream: bool = False,
+        source_cache=None,
+        summary_workers: int = 4,
+        semantic_recall: bool = False,
+        agent=None,
+        summarizer=None,
+        work_dir: str = None,
+        rate_limiter=None,
+        prefetch: bool = False,
+        tracer: Tracer = None,
+        result_cache: bool = False,
+        http_client=None,
+        function_calling: bool = False
         ):
         """
         构造一个 `MiniAGI` 实例。
@@ -135,31 +202,142 @@ class MiniAGI:
             max_context_size (int): 代理记忆的最大上下文大小（以标记计数）。
             max_memory_item_size (int): 记忆项的最大大小（以标记计数）。
             debug (bool, 可选): 一个标志，指示是否打印调试信息。
+            background_summary (bool, 可选): 一个标志，指示是否在后台线程中更新历史摘要。
+            stream (bool, 可选): 一个标志，指示是否以流式方式生成并解析动作。
+            source_cache (SourceCache, 可选): 用于 ingest_data/process_data 来源的磁盘缓存。
+            summary_workers (int, 可选): 并发摘要超大输入分块的最大线程数。
+            semantic_recall (bool, 可选): 一个标志，指示是否在上下文中加入与目标相关的较早记忆。
+            agent (可选): 替代 `ThinkGPT` 代理的后端，例如 `replay.ReplayLLM`。
+            summarizer (可选): 替代 `ThinkGPT` 摘要器的后端。
+            work_dir (str, 可选): 代理的工作目录；为 None 时使用当前工作目录。
+            rate_limiter (RateLimiter, 可选): 代理和摘要器的每次请求都从中获取令牌的限速器，可在多个代理间共享。
+            prefetch (bool, 可选): 一个标志，指示是否在动作中出现 ingest_data/process_data 的来源后立即在后台预取。
+            tracer (Tracer, 可选): 记录各阶段耗时的追踪器；为 None 时不记录。
+            result_cache (bool, 可选): 一个标志，指示是否缓存幂等命令的观察结果。
+            http_client (HttpClient, 可选): 代理和摘要器共享的 HTTP 客户端，负责连接池、重试和按输出大小计算的超时。
+            function_calling (bool, 可选): 一个标志，指示是否以函数调用的形式生成动作；启用时不使用流式模式。
         """
 
-        self.agent = ThinkGPT(
+        # thinkgpt 会导入 langchain 等大量模块，只在需要真实后端时才导入。
+        if agent is None or summarizer is None:
+            from thinkgpt.llm import ThinkGPT  # pylint: disable=import-outside-toplevel
+
+        # 使用共享的 HTTP 客户端时由它负责重试（遵循 Retry-After），langchain 自身不再重试。
+        llm_options = {"max_retries": 1} if http_client is not None else {}
+
+        self.agent = agent or ThinkGPT(
             model_name=agent_model,
             request_timeout=600,
-            verbose=False
+            verbose=False,
+            **llm_options
         )
 
-        self.summarizer = ThinkGPT(
+        self.summarizer = summarizer or ThinkGPT(
             model_name=summarizer_model,
             request_timeout=600,
-            verbose=False
+            verbose=False,
+            **llm_options
         )
+
+        if http_client is not None:
+            from http_client import PooledLLM  # pylint: disable=import-outside-toplevel
+            http_client.install()
+            self.agent = PooledLLM(self.agent, http_client)
+            self.summarizer = PooledLLM(self.summarizer, http_client)
+
+        if rate_limiter is not None:
+            self.agent = RateLimitedLLM(self.agent, rate_limiter)
+            self.summarizer = RateLimitedLLM(self.summarizer, rate_limiter)
+
         self.objective = objective
         self.max_context_size = max_context_size
         self.max_memory_item_size = max_memory_item_size
         self.debug = debug
-
+        self.stream = stream
+        self.function_calling = function_calling
+        self.source_cache = source_cache
+        self.work_dir = work_dir
+        self.result_cache = ResultCache() if result_cache else None
+        self.memory_index = None
+        if semantic_recall:
+            # 记忆索引依赖 scikit-learn，只在启用时导入。
+            from memory_index import MemoryIndex  # pylint: disable=import-outside-toplevel
+            self.memory_index = MemoryIndex()
+
+        self.steps = 0
         self.summarized_history = ""
         self.criticism = ""
         self.thought = ""
         self.proposed_command = ""
         self.proposed_arg = ""
+        self.proposed_named_args = None
+
+        # 后台摘要：单个工作线程按顺序把待处理的记忆项并入摘要。
+        self.background_summary = background_summary
+        self.pending_memories = []
+        self._summary_lock = threading.Lock()
+        self._summary_future = None
+        self._summary_executor = ThreadPoolExecutor(max_workers=1) if background_summary else None
+        # 后台滚动摘要最近一次失败的异常，由 flush_summary() 重新抛出；之后的滚动成功时清除。
+        self.summary_error = None
+
+        # 来源预取：(来源, 标记数上限) 到后台读取任务的映射，由 act() 取用，未使用的被取消。
+        self.prefetch = prefetch
+        self._prefetches = {}
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=2) if prefetch else None
+
+        self.tracer = tracer or Tracer()
+        self.encoding = encoding_for_model(self.agent.model_name)
+        if self.tracer.enabled:
+            self.encoding = TracedEncoding(self.encoding, self.tracer)
+        self.tokens = TokenLedger(self.encoding)
+        # 摘要器已经带有限速；使用共享的 HTTP 客户端时速率限制由它重试，分块摘要器不再重试。
+        self.chunk_summarizer = ParallelSummarizer(
+            self.summarizer,
+            self.count_tokens,
+            max_workers=summary_workers,
+            max_retries=0 if http_client is not None else 5,
+            tracer=self.tracer
+        )
 
-        self.encoding = tiktoken.encoding_for_model(self.agent.model_name)
+        # 分层的历史摘要：最近的记忆项保持原文，超出预算时才摘要溢出的部分。
+        # 顶层摘要和片段摘要各占记忆项大小的一半，与原来单一摘要的大小相同。
+        # 未摘要的记忆项不超过上下文回忆的条数，保证它们都还在 PREV ACTIONS 中。
+        self.history = HistorySummary(
+            self.__summarize_history,
+            self.tokens.count,
+            recent_tokens=self.max_memory_item_size,
+            recent_items=RECENT_HISTORY_ITEMS,
+            segments_tokens=self.max_memory_item_size // 2,
+            digest_tokens=self.max_memory_item_size // 2,
+            segment_hint=SEGMENT_SUMMARY_HINT,
+            digest_hint=HISTORY_SUMMARY_HINT
+        )
+
+        # 提示模板的固定部分只计数一次；函数调用模式下包括函数声明。
+        if function_calling:
+            self.prompt_tokens = self.tokens.count(
+                TOOL_PROMPT.format(context="", objective=self.objective)
+                + json.dumps(function_schemas(), ensure_ascii=False)
+            )
+        else:
+            self.prompt_tokens = self.tokens.count(
+                PROMPT.format(context="", objective=self.objective)
+            )
+
+    # 不经缓存地计算文本的标记数，用于一次性的大文本。
+    def count_tokens(self, text: str) -> int:
+        """
+        计算文本的标记数，不写入标记计数缓存。
+
+        参数:
+            text (str): 要计数的文本。
+
+        返回:
+            int: 文本的标记数。
+        """
+
+        return len(self.encoding.encode(text))
 
     # 更新代理的记忆，包括执行的动作和观察到的结果。
     # 可选地，还可以更新代理历史的摘要。
@@ -177,13 +355,18 @@ class MiniAGI:
             action (str): ThinkGPT实例执行的动作。
             observation (str): ThinkGPT实例在执行动作后进行的观察。
             update_summary (bool, optional): 是否更新摘要。
+
+        返回:
+            str: 写入记忆的观察结果（超出大小时为摘要）。
         """
 
         # 如果观察结果的编码长度超过最大记忆项大小，则使用摘要器进行摘要。
-        if len(self.encoding.encode(observation)) > self.max_memory_item_size:
-            observation = self.summarizer.chunked_summarize(
+        observation_len = self.tokens.count(observation)
+        if observation_len > self.max_memory_item_size:
+            observation = self.chunk_summarizer.chunked_summarize(
                 observation, self.max_memory_item_size,
-                instruction_hint=OBSERVATION_SUMMARY_HINT
+                instruction_hint=OBSERVATION_SUMMARY_HINT,
+                num_tokens=observation_len
                 )
 
         # 根据动作类型，构造新的记忆项。
@@ -193,15 +376,154 @@ class MiniAGI:
             new_memory = f"ACTION:\n{action}\nRESULT:\n{observation}\n"
 
         # 如果需要更新摘要，则将新的记忆项添加到摘要中。
-        if update_summary:
-            self.summarized_history = self.summarizer.summarize(
-                f"Current summary:\n{self.summarized_history}\nAdd to summary:\n{new_memory}",
-                self.max_memory_item_size,
-                instruction_hint=HISTORY_SUMMARY_HINT
+        if update_summary and self.background_summary:
+            with self._summary_lock:
+                self.pending_memories.append(new_memory)
+                self.__schedule_summary()
+        elif update_summary:
+            self.history.extend([new_memory])
+            self.summarized_history = self.history.render()
+
+        # 将新的记忆项添加到代理的记忆中，并预先记录其标记数以便构建上下文时复用。
+        self.tokens.count(new_memory)
+        self.agent.memorize(new_memory)
+        if self.memory_index is not None:
+            self.memory_index.add(new_memory)
+        self.steps += 1
+
+        return observation
+
+    # 摘要历史的一部分，由 `HistorySummary` 在某一层超出预算时调用。
+    def __summarize_history(self, content: str, max_tokens: int, instruction_hint: str) -> str:
+        """
+        使用摘要器摘要历史的一部分。
+
+        参数:
+            content (str): 要摘要的记忆项或摘要。
+            max_tokens (int): 摘要的最大标记数。
+            instruction_hint (str): 摘要提示。
+
+        返回:
+            str: 摘要。
+        """
+
+        tokens_in = self.count_tokens(content) if self.tracer.enabled else None
+        with self.tracer.span("summarize_history", tokens_in=tokens_in) as span:
+            summary = self.summarizer.summarize(
+                content,
+                max_tokens,
+                instruction_hint=instruction_hint
                 )
+            if self.tracer.enabled:
+                span.set(tokens_out=self.count_tokens(summary))
+        return summary
 
-        # 将新的记忆项添加到代理的记忆中。
-        self.agent.memorize(new_memory)
+    # 如果没有正在运行的摘要任务，则提交一个新任务。调用方必须持有 `_summary_lock`。
+    def __schedule_summary(self):
+        """
+        把所有待处理的记忆项提交给后台工作线程。
+        """
+
+        if self._summary_future is not None or not self.pending_memories:
+            return
+
+        self._summary_future = self._summary_executor.submit(self.__run_summary)
+
+    # 在后台线程中运行：把待处理的记忆项移入历史摘要，再在锁外滚动超出预算的层。
+    def __run_summary(self):
+        """
+        把待处理的记忆项并入分层的历史摘要。
+        """
+
+        with self._summary_lock:
+            self.history.add(self.pending_memories)
+            self.pending_memories = []
+
+        # 记忆项已经记录在历史中，滚动失败时在下一次更新记忆时重试；
+        # 异常记录在追踪区间中，并保存下来由 flush_summary() 重新抛出。
+        error = None
+        try:
+            with self.tracer.span("summary.roll"):
+                self.history.roll()
+        except Exception as exception:  # pylint: disable=broad-exception-caught
+            error = exception
+
+        with self._summary_lock:
+            self.summary_error = error
+            self.summarized_history = self.history.render()
+            self._summary_future = None
+            self.__schedule_summary()
+
+    # 等待后台摘要把所有待处理的记忆项并入摘要。
+    def flush_summary(self):
+        """
+        阻塞直到后台摘要处理完所有待处理的记忆项。
+
+        异常:
+            Exception: 最后一次后台滚动摘要失败时抛出的异常。
+        """
+
+        if not self.background_summary:
+            return
+
+        while True:
+            with self._summary_lock:
+                future = self._summary_future
+                if future is None:
+                    self.__schedule_summary()
+                    future = self._summary_future
+                if future is None:
+                    (error, self.summary_error) = (self.summary_error, None)
+                    if error is not None:
+                        raise error
+                    return
+            future.result()
+
+    # 关闭后台摘要和来源预取的线程池，并把来源缓存的访问时间写回磁盘。
+    def close(self):
+        """
+        等待后台摘要和预取任务结束，关闭它们的线程池，并刷新来源缓存的索引。关闭后不应再使用该代理。
+        """
+
+        self.__cancel_prefetches()
+        for executor in (self._summary_executor, self._prefetch_executor):
+            if executor is not None:
+                executor.shutdown(wait=True)
+        if self.source_cache is not None:
+            self.source_cache.flush()
+
+    # 读取摘要和尚未并入摘要的记忆项，二者保持一致。
+    def summary_state(self) -> tuple:
+        """
+        读取一致的摘要状态，用于保存检查点。
+
+        返回:
+            tuple: 包含摘要、尚未并入摘要的记忆项列表和分层历史摘要状态的元组。
+        """
+
+        with self._summary_lock:
+            return (self.summarized_history, list(self.pending_memories), self.history.state())
+
+    # 恢复检查点中尚未并入摘要的记忆项。
+    def restore_pending_memories(self, pending_memories: list):
+        """
+        恢复尚未并入摘要的记忆项。后台模式下交给工作线程，否则立即并入摘要。
+
+        参数:
+            pending_memories (list): 尚未并入摘要的记忆项。
+        """
+
+        if not pending_memories:
+            return
+
+        if self.background_summary:
+            with self._summary_lock:
+                self.pending_memories.extend(pending_memories)
+                self.__schedule_summary()
+            return
+
+        self.history.extend(pending_memories)
+        self.summarized_history = self.history.render()
 
     # 获取代理当前的上下文，用于思考和行动。
     def __get_context(self) -> str:
@@ -212,54 +534,143 @@ class MiniAGI:
             str: 代理的上下文。
         """
 
-        # 计算摘要和批评的编码长度。
-        summary_len = len(self.encoding.encode(self.summarized_history))
-        criticism_len = len(self.encoding.encode(self.criticism)) if len(self.criticism) > 0 else 0
+        # 后台摘要可能随时替换摘要，这里只读取一次。
+        summarized_history = self.summarized_history
+
+        # 计算摘要和批评的编码长度，只有文本变化时才重新编码。
+        summary_len = self.tokens.slot("summary", summarized_history)
+        criticism_len = self.tokens.slot("criticism", self.criticism)
 
         # 根据可用的上下文大小，从代理的记忆中回忆动作。
-        action_buffer = "\n".join(
-                self.agent.remember(
-                limit=32,
-                sort_by_order=True,
-                max_tokens=self.max_context_size - summary_len - criticism_len
+        # 记忆项的标记数已在写入时记录，这里只做查表。
+        # 后台摘要尚未并入的记忆项是最新的记忆，因此会最先被选入。
+        # 预算扣除提示模板（和函数声明）的固定开销，整个提示不超过上下文大小。
+        max_tokens = max(0, self.max_context_size - self.prompt_tokens - summary_len - criticism_len)
+        if self.memory_index is not None:
+            # 最近的记忆优先，其余预算留给与目标和上一步推理最相关的较早记忆。
+            actions = self.tokens.fit_ranked(
+                self.memory_index.recall(
+                    f"{self.objective}\n{self.thought}\n{self.proposed_command}\n{self.proposed_arg}",
+                    recent=16,
+                    relevant=16
+                ),
+                max_tokens
             )
-        )
+        else:
+            actions = self.tokens.fit(
+                self.agent.remember(limit=32, sort_by_order=True),
+                max_tokens
+            )
+        action_buffer = "\n".join(actions)
 
         # 构造并返回上下文字符串。
-        return f"SUMMARY\n{self.summarized_history}\nPREV ACTIONS:"\
+        return f"SUMMARY\n{summarized_history}\nPREV ACTIONS:"\
             f"\n{action_buffer}\n{self.criticism}"
 
 
+    # 以流式方式生成动作，推理一到达就交给回调，动作完整后立即停止生成。
+    def __stream_action(self, prompt: str, on_thought=None) -> tuple:
+        """
+        以流式方式生成并解析动作。
+
+        参数:
+            prompt (str): 完整的提示。
+            on_thought (callable, 可选): 推理解析完成时调用的回调，参数为推理文本。
+
+        返回:
+            tuple: 包含推理、命令和参数的元组。
+        """
+
+        parser = ActionStreamParser()
+        tokens_in = self.count_tokens(prompt) if self.tracer.enabled else None
+        with self.tracer.span("agent.stream", tokens_in=tokens_in) as span:
+            chunks = stream_predict(self.agent, prompt)
+            try:
+                for chunk in chunks:
+                    for (event, value) in parser.feed(chunk):
+                        if event == "thought" and on_thought is not None:
+                            on_thought(value)
+                        elif event == "arg_line":
+                            # 来源在参数的第一行，不必等待生成结束就可以开始读取。
+                            self.__prefetch_source(parser.command, value)
+                    if parser.complete:
+                        break
+            finally:
+                chunks.close()
+            if self.tracer.enabled:
+                span.set(tokens_out=self.count_tokens(parser.buffer))
+
+        if parser.command is None:
+            raise InvalidLLMResponseError
+
+        return (parser.thought, parser.command, parser.arg)
+
     # 使用`ThinkGPT`模型预测代理应该采取的下一个行动。
-    def think(self):
+    def think(self, on_thought=None):
         """
         使用`ThinkGPT`模型预测代理应该采取的下一个行动。
+
+        参数:
+            on_thought (callable, 可选): 流式模式下推理解析完成时调用的回调，参数为推理文本。
         """
 
-        context = self.__get_context()
+        self.tracer.step = self.steps
+        with self.tracer.span("think", stream=self.stream) as span:
+            self.__think(on_thought)
+            span.set(command=self.proposed_command)
+
+    # 构造提示、生成并解析动作。
+    def __think(self, on_thought=None):
+        """
+        构造提示，生成并解析代理的下一个动作。
+
+        参数:
+            on_thought (callable, 可选): 流式模式下推理解析完成时调用的回调，参数为推理文本。
+        """
+
+        # 上一次思考留下的预取不会再被使用。
+        self.__cancel_prefetches()
+
+        with self.tracer.span("context"):
+            context = self.__get_context()
+            template = TOOL_PROMPT if self.function_calling else PROMPT
+            prompt = template.format(context=context, objective=self.objective)
 
         # if self.debug:
         #     print(context)
         # print("PROMPT-------")
-        # print(PROMPT.format(context=context, objective=self.objective))
+        # print(prompt)
 
-        response_text = self.agent.predict(
-            prompt=PROMPT.format(context=context, objective=self.objective)
-        )
+        if self.function_calling:
+            tokens_in = self.count_tokens(prompt) if self.tracer.enabled else None
+            with self.tracer.span("agent.call_function", tokens_in=tokens_in):
+                message = call_function(self.agent, prompt)
 
-        # if self.debug:
-        #     print(f"RAW RESPONSE:\n{response_text}")
+            with self.tracer.span("parse"):
+                (_thought, _command, _arg, _named_args) = parse_function_call(message)
+        elif self.stream:
+            (_thought, _command, _arg) = self.__stream_action(prompt, on_thought)
+        else:
+            tokens_in = self.count_tokens(prompt) if self.tracer.enabled else None
+            with self.tracer.span("agent.predict", tokens_in=tokens_in) as span:
+                response_text = self.agent.predict(prompt=prompt)
+                if self.tracer.enabled:
+                    span.set(tokens_out=self.count_tokens(response_text))
 
-        PATTERN = r'^<r>(.*?)</r><c>(.*?)</c>\n*(.*)$'
+            # if self.debug:
+            #     print(f"RAW RESPONSE:\n{response_text}")
 
-        try:
-            match = re.search(PATTERN, response_text, flags=re.DOTALL | re.MULTILINE)
+            PATTERN = r'^<r>(.*?)</r><c>(.*?)</c>\n*(.*)$'
+
+            with self.tracer.span("parse"):
+                try:
+                    match = re.search(PATTERN, response_text, flags=re.DOTALL | re.MULTILINE)
 
-            _thought = match[1]
-            _command = match[2]
-            _arg = match[3]
-        except Exception as exc:
-            raise InvalidLLMResponseError from exc
+                    _thought = match[1]
+                    _command = match[2]
+                    _arg = match[3]
+                except Exception as exc:
+                    raise InvalidLLMResponseError from exc
 
         # 移除不需要的代码格式化反引号
         _arg = _arg.replace("```", "")
@@ -267,6 +678,13 @@ class MiniAGI:
         self.thought = _thought
         self.proposed_command = _command
         self.proposed_arg = _arg
+        # 函数调用模式下保留按名称的参数，process_data 不必再按 "|" 拆分提示和来源。
+        self.proposed_named_args = {
+            name: value.replace("```", "") for (name, value) in _named_args.items()
+        } if self.function_calling else None
+
+        # 在操作者查看动作的同时开始读取来源；流式模式下通常已经开始。
+        self.__prefetch_source(_command, _arg, self.proposed_named_args)
 
     # 检索代理的最后一个思考、建议的命令和参数。
     def read_mind(self) -> tuple:
@@ -286,44 +704,249 @@ class MiniAGI:
             _arg
         )
 
-    # 从URL或文件中检索内容。
+    # 从HTML响应中流式提取文本。
+    def __extract_html(self, response) -> tuple:
+        """
+        从HTML响应中流式提取文本，丢弃脚本、样式和导航等样板内容，
+        收集到足够的文本后停止读取。
+
+        参数:
+            response: `urlopen` 返回的响应对象。
+
+        返回:
+            tuple: (页面中的文本, 从响应中读取的字节数)。
+        """
+
+        return extract_text(
+            response,
+            max_bytes=MAX_SOURCE_BYTES,
+            max_tokens=self.max_context_size * SOURCE_CONTEXT_FACTOR,
+            count_tokens=self.count_tokens
+        )
+
+    # 读取本地文件。
     @staticmethod
-    def __get_url_or_file(_arg: str) -> str:
+    def __read_file(path: str) -> str:
         """
-        从URL或文件中检索内容。
+        读取本地文件。
+
+        参数:
+            path (str): 文件名
+
+        返回:
+            str: 文件的内容。
+        """
+
+        with open(path, "r") as file:
+            return file.read()
+
+    # 从URL或文件中检索内容。
+    def __get_url_or_file(self, _arg: str, max_tokens: int = None, summarize: bool = True) -> tuple:
+        """
+        从URL或文件中检索内容。如果配置了来源缓存，则优先从缓存中读取。
+        超出 `max_tokens` 的本地文件不会整体读入内存，而是逐块摘要。
 
         参数:
             arg (str): URL或文件名
+            max_tokens (int, 可选): 本地文件内容的最大标记数。
+            summarize (bool, 可选): 是否摘要超出上限的本地文件；为 False 时对这样的文件返回 (None, None)。
 
         返回:
-            str: 观察结果：URL或文件的内容。
+            tuple: (观察结果：URL或文件的内容, 内容的标记数)；标记数只在检查上限时已经数过的本地文件才有，否则为 None。
         """
 
-        if _arg.startswith("http://") or _arg.startswith("https://"):
-            with urlopen(_arg) as response:
-                html = response.read()
-            data = BeautifulSoup(
-                    html,
-                    features="lxml"
-                ).get_text()
-        else:
-            with open(_arg, "r") as file:
-                data = file.read()
+        is_url = _arg.startswith("http://") or _arg.startswith("https://")
+        if not is_url and self.work_dir is not None:
+            _arg = os.path.join(self.work_dir, os.path.expanduser(_arg))
+
+        with self.tracer.span("fetch", source=_arg) as span:
+            (data, bytes_read, num_tokens) = self.__read_source(_arg, is_url, max_tokens, summarize)
+            if self.tracer.enabled and data is not None:
+                # 网页记录从响应中实际读取的字节数，本地文件记录文件大小。
+                span.set(bytes=bytes_read if is_url else os.path.getsize(_arg))
+        return (data, num_tokens)
+
+    # 读取URL或文件，由 `__get_url_or_file` 调用。
+    def __read_source(self, _arg: str, is_url: bool, max_tokens: int = None, summarize: bool = True) -> tuple:
+        """
+        读取URL或文件的内容。
+
+        参数:
+            arg (str): URL或已解析的文件路径
+            is_url (bool): 来源是否为URL。
+            max_tokens (int, 可选): 本地文件内容的最大标记数。
+            summarize (bool, 可选): 是否摘要超出上限的本地文件。
+
+        返回:
+            tuple: (URL或文件的内容, 从网络读取的字节数, 内容的标记数)；
+                本地文件的字节数为 None，只有未超出上限的本地文件才有标记数。
+        """
+
+        if is_url:
+            sizes = []
+
+            def extract(response):
+                (text, size) = self.__extract_html(response)
+                sizes.append(size)
+                return text
+
+            if self.source_cache is not None:
+                data = self.source_cache.get_url(_arg, extract)
+            else:
+                with urlopen(_arg) as response:
+                    data = extract(response)
+            # 缓存命中或服务器返回 304 时没有读取正文，字节数为 0。
+            return (data, sum(sizes), None)
+
+        # 检查上限时已经数过整个文件，调用方不必再数一遍。
+        num_tokens = None
+        if max_tokens is not None:
+            (num_tokens, exceeded, bytes_per_token) = measure_file(_arg, self.count_tokens, max_tokens)
+            if exceeded:
+                if not summarize:
+                    return (None, None, None)
+                return (self.__summarize_file(_arg, max_tokens, bytes_per_token), None, None)
+        if self.source_cache is not None:
+            return (self.source_cache.get_file(_arg, self.__read_file), None, num_tokens)
+        return (self.__read_file(_arg), None, num_tokens)
+
+    # 确定命令要读取的来源及其标记数上限。
+    def __source_target(self, command: str, _arg: str, named_args: dict = None) -> tuple:
+        """
+        确定 ingest_data 或 process_data 要读取的来源。
+
+        参数:
+            command (str): 命令。
+            arg (str): 命令的参数。
+            named_args (dict, 可选): 函数调用模式下按名称的参数。
+
+        返回:
+            tuple: (来源, 标记数上限)；命令不读取来源或参数无效时为 None。
+        """
+
+        if command == "ingest_data":
+            return (_arg.strip(), self.max_memory_item_size)
+        if command == "process_data":
+            if named_args is not None:
+                return (named_args.get("source", "").strip(), self.max_context_size)
+            args = _arg.split("|")
+            if len(args) == 2:
+                return (args[1].strip(), self.max_context_size)
+        return None
+
+    # 在后台开始读取命令的来源。
+    def __prefetch_source(self, command: str, _arg: str, named_args: dict = None):
+        """
+        在后台开始读取 ingest_data 或 process_data 的来源，结果由 `act()` 取用。
+        只做读取和提取；超出上限、需要调用 LLM 摘要的本地文件不预取。
+
+        参数:
+            command (str): 命令。
+            arg (str): 命令的参数（流式模式下可以只有第一行）。
+            named_args (dict, 可选): 函数调用模式下按名称的参数。
+        """
+
+        if not self.prefetch:
+            return
+        target = self.__source_target(command, _arg, named_args)
+        if target is None or not target[0] or target in self._prefetches:
+            return
+        self._prefetches[target] = self._prefetch_executor.submit(
+            self.__get_url_or_file, target[0], target[1], False
+        )
+
+    # 取消所有未被使用的预取。
+    def __cancel_prefetches(self):
+        """
+        取消所有未被使用的预取。尚未开始的任务不会运行，正在运行的任务的结果被丢弃。
+        """
+
+        for future in self._prefetches.values():
+            future.cancel()
+        self._prefetches = {}
+
+    # 读取来源，优先使用预取的结果。
+    def __fetch_source(self, _arg: str, max_tokens: int) -> tuple:
+        """
+        读取URL或文件。如果有相同来源的预取，则等待并使用它的结果。
+
+        参数:
+            arg (str): URL或文件名
+            max_tokens (int): 内容的最大标记数。
+
+        返回:
+            tuple: (URL或文件的内容, 内容的标记数或 None)。
+        """
+
+        future = self._prefetches.pop((_arg.strip(), max_tokens), None)
+        self.__cancel_prefetches()
+        if future is not None:
+            result = future.result()
+            if result[0] is not None:
+                return result
+        return self.__get_url_or_file(_arg, max_tokens)
+
+    # 通过mmap逐块摘要大文件，内存中只保留少量分块。
+    def __summarize_file(self, path: str, max_tokens: int, bytes_per_token: float) -> str:
+        """
+        逐块读取并摘要大文件。
+
+        参数:
+            path (str): 文件名
+            max_tokens (int): 摘要的最大标记数。
+            bytes_per_token (float): 文件中平均每个标记的字节数，用于确定分块大小。
+
+        返回:
+            str: 文件内容的摘要。
+        """
+
+        chunk_bytes = max(1, int(bytes_per_token * self.chunk_summarizer.chunk_tokens))
+        num_chunks = -(-os.path.getsize(path) // chunk_bytes)
+        chunks = (text for (_, text) in iter_text_chunks(path, chunk_bytes))
+
+        return self.chunk_summarizer.summarize_chunks(
+            chunks, num_chunks, max_tokens,
+            instruction_hint=OBSERVATION_SUMMARY_HINT
+            )
+
+    # 摄入来自URL或文件的数据。
+    def __ingest_data(self, _arg: str) -> str:
+        """
+        摄入来自URL或文件的数据。
+
+        参数:
+            arg (str): URL或文件名
+
+        返回:
+            str: 观察结果：URL或文件的内容。
+        """
 
-        return data
+        try:
+            (data, _) = self.__fetch_source(_arg, self.max_memory_item_size)
+            return data
+        except urllib.error.URLError as e:
+            return f"Error: {str(e)}"
+        except OSError as e:
+            return f"Error: {str(e)}"
 
     # 处理来自URL或文件的数据。
-    def __process_data(self, _arg: str) -> str:
+    def __process_data(self, _arg: str, named_args: dict = None) -> str:
         """
         处理来自URL或文件的数据。
 
         参数:
             arg (str): 提示和URL/文件名，用|分隔
+            named_args (dict, 可选): 函数调用模式下按名称的参数（prompt 和 source）；给出时不拆分 arg。
 
         返回:
             str: 观察结果：处理URL或文件的结果。
         """
-        args = _arg.split("|")
+        if named_args is not None:
+            args = [named_args.get("prompt", ""), named_args.get("source", "")]
+            if not args[1].strip():
+                return "Invalid command. The correct format is: prompt|file or url"
+        else:
+            args = _arg.split("|")
 
         if len(args) == 1:
             return "Invalid command. The correct format is: prompt|file or url"
@@ -334,38 +957,69 @@ class MiniAGI:
         (prompt, __arg) = args
 
         try:
-            input_data = self.__get_url_or_file(__arg)
+            (input_data, input_len) = self.__fetch_source(__arg, self.max_context_size)
         except urllib.error.URLError as e:
             return f"Error: {str(e)}"
         except OSError as e:
             return f"Error: {str(e)}"
 
-        if len(self.encoding.encode(input_data)) > self.max_context_size:
-            input_data = self.summarizer.chunked_summarize(
+        # 本地文件的标记数在检查上限时已经算出，只有网页需要在这里计数。
+        if input_len is None:
+            input_len = self.tokens.count(input_data)
+        if input_len > self.max_context_size:
+            input_data = self.chunk_summarizer.chunked_summarize(
                 input_data, self.max_context_size,
-                instruction_hint=OBSERVATION_SUMMARY_HINT
+                instruction_hint=OBSERVATION_SUMMARY_HINT,
+                num_tokens=input_len
                 )
 
-        print(f"{RETRIEVAL_PROMPT}\n{prompt}\nINPUT DATA:\n{input_data}")
-        
-        return self.agent.predict(
-                prompt=f"{RETRIEVAL_PROMPT}\n{prompt}\nINPUT DATA:\n{input_data}"
-            )
+        retrieval_prompt = f"{RETRIEVAL_PROMPT}\n{prompt}\nINPUT DATA:\n{input_data}"
+        print(retrieval_prompt)
+
+        # 输入可能已被摘要，按实际发送的提示计数。
+        tokens_in = self.count_tokens(retrieval_prompt) if self.tracer.enabled else None
+        with self.tracer.span("agent.predict", tokens_in=tokens_in) as span:
+            response = self.agent.predict(prompt=retrieval_prompt)
+            if self.tracer.enabled:
+                span.set(tokens_out=self.count_tokens(response))
+        return response
 
     # 执行代理建议的命令并更新代理的记忆。
     def act(self):
         """
         执行代理建议的命令并更新代理的记忆。
         """
-        if command == "process_data":
-            obs = self.__process_data(self.proposed_arg)
-        elif command == "ingest_data":
-            obs = self.__ingest_data(self.proposed_arg)
-        else:
-            obs = Commands.execute_command(self.proposed_command, self.proposed_arg)
-
-        self.__update_memory(f"{self.proposed_command}\n{self.proposed_arg}", obs)
-        self.criticism = ""
+        command = self.proposed_command
+        action = f"{self.proposed_command}\n{self.proposed_arg}"
+
+        with self.tracer.span("act", command=command) as span:
+            # 重复执行的幂等命令直接使用缓存的观察结果，它已经摘要过，不必再调用 LLM；
+            # 这一步仍然并入历史摘要，使摘要反映代理实际执行过的动作。
+            cache_key = None
+            if self.result_cache is not None:
+                cache_key = self.result_cache.key(command, self.proposed_arg, self.work_dir)
+                obs = self.result_cache.get(cache_key)
+                if obs is not None:
+                    span.set(cached=True)
+                    self.__cancel_prefetches()
+                    with self.tracer.span("update_memory"):
+                        self.__update_memory(action, obs)
+                    self.criticism = ""
+                    return
+
+            if command == "process_data":
+                obs = self.__process_data(self.proposed_arg, self.proposed_named_args)
+            elif command == "ingest_data":
+                obs = self.__ingest_data(self.proposed_arg)
+            else:
+                self.__cancel_prefetches()
+                obs = Commands.execute_command(self.proposed_command, self.proposed_arg, self.work_dir)
+
+            with self.tracer.span("update_memory"):
+                obs = self.__update_memory(action, obs)
+            if cache_key is not None and self.result_cache.is_cacheable_result(obs):
+                self.result_cache.put(cache_key, obs)
+            self.criticism = ""
 
     # 使用用户对代理最后行动的响应更新代理的记忆。
     def user_response(self, response):
@@ -377,17 +1031,30 @@ class MiniAGI:
         """
         # print("user_response-----")
         # print(f"{self.proposed_command}\n{self.proposed_arg}", response)
-        self.__update_memory(f"{self.proposed_command}\n{self.proposed_arg}", response)
+        self.__cancel_prefetches()
+        with self.tracer.span("user_response"):
+            self.__update_memory(f"{self.proposed_command}\n{self.proposed_arg}", response)
         self.criticism = ""
 
 # 当该脚本被直接运行时执行以下代码
 if __name__ == "__main__":
 
-    # 检查命令行参数数量，如果不等于2，则提示正确的使用方法并退出
-    if len(sys.argv) != 2:
-        print("Usage: main.py <objective>")
+    # 检查命令行参数，支持传入目标，或者用--resume从检查点继续
+    if len(sys.argv) == 3 and sys.argv[1] == "--resume":
+        checkpoint_file = os.path.abspath(sys.argv[2])
+        checkpoint_state = load_checkpoint(checkpoint_file)
+        objective = checkpoint_state["objective"]
+    elif len(sys.argv) == 2 and not sys.argv[1].startswith("--"):
+        checkpoint_file = os.getenv("CHECKPOINT_FILE")
+        checkpoint_state = None
+        objective = sys.argv[1]
+    else:
+        print("Usage: main.py <objective>\n       main.py --resume <checkpoint>")
         sys.exit(0)
 
+    # 设置TRACE_FILE时把每一步各阶段的耗时写入JSONL追踪文件，用 tracing.py 汇总
+    trace_file = os.path.abspath(os.getenv("TRACE_FILE")) if os.getenv("TRACE_FILE") else None
+
     # 从环境变量获取工作目录路径
     # 如果工作目录未设置或为空，则默认设置为用户主目录下的miniagi文件夹
     work_dir = os.getenv("WORK_DIR")
@@ -404,53 +1071,102 @@ if __name__ == "__main__":
         print("Directory doesn't exist. Set WORK_DIR to an existing directory or leave it blank.")
         sys.exit(0)
 
+    # 检查点默认保存在工作目录中
+    if not checkpoint_file:
+        checkpoint_file = os.path.join(work_dir, "miniagi_checkpoint.json.gz")
+
+    # 代理和摘要器共享一个带连接池和重试的HTTP客户端，HTTP_MAX_CONNECTIONS和HTTP_RETRIES可调整其限制
+    from http_client import HttpClient
+    http_client = HttpClient(
+        pool_maxsize=int(os.getenv("HTTP_MAX_CONNECTIONS", "8")),
+        retries=int(os.getenv("HTTP_RETRIES", "5"))
+    )
+
     # 初始化MiniAGI对象，传入模型、摘要模型、目标、上下文大小限制、记忆项大小限制和调试模式标志
     miniagi = MiniAGI(
         "gpt-4",
         "gpt-3.5-turbo",
-        sys.argv[1],
+        objective,
         int(4000),
         int(2000),
-        False
+        False,
+        background_summary=os.getenv("BACKGROUND_SUMMARY") == "1",
+        stream=os.getenv("STREAM_RESPONSES") == "1",
+        semantic_recall=os.getenv("SEMANTIC_RECALL") == "1",
+        prefetch=os.getenv("PREFETCH_SOURCES") == "1",
+        result_cache=os.getenv("RESULT_CACHE") == "1",
+        function_calling=os.getenv("FUNCTION_CALLING") == "1",
+        tracer=Tracer(trace_file) if trace_file else None,
+        http_client=http_client,
+        # 来源缓存默认位于用户主目录下，SOURCE_CACHE_DIR设置为空字符串时禁用
+        source_cache=SourceCache(
+            os.getenv("SOURCE_CACHE_DIR", os.path.join(Path.home(), ".cache", "miniagi", "sources"))
+        ) if os.getenv("SOURCE_CACHE_DIR") != "" else None
     )
-    # 主循环(核心代码)
-    while True:
-        try:
-            # 显示旋转指示器，表示正在处理
-            with Spinner():
-                miniagi.think()
-        except InvalidLLMResponseError:
-            # 如果收到无效的LLM响应，则打印错误信息并重试
-            print(colored("LLM 响应无效，正在重试...", "red"))
-            continue
-
-        # 读取MiniAGI的思考结果(planning起作用)
-        (thought, command, arg) = miniagi.read_mind()
-
-        # 打印MiniAGI的思考结果、命令和参数
-        print(colored(f"MiniAGI: {thought}\nCmd: {command}, Arg: {arg}", "cyan"))
-
-        # 如果命令是"done"，则退出程序
-        if command == "done":
-            sys.exit(0)
-
-        # 如果命令是"talk_to_user"，则与用户交互
-        if command == "talk_to_user":
-            print(colored(f"MiniAGI: {miniagi.proposed_arg}", 'blue'))
-            user_input = input('Your response(if want to end,type done): ')
-            ## 如果用户输入done,那么整个任务结束.
-            if user_input == "done":
-                print(colored("任务结束,合作愉快"))
-                break
-            with Spinner():
-                miniagi.user_response(user_input)
-            continue
 
-        # 如果命令是"memorize_thoughts"，则打印MiniAGI正在思考的内容
-        if command == "memorize_thoughts":
-            print(colored("MiniAGI is thinking:\n"\
-                f"{miniagi.proposed_arg}", 'cyan'))
+    # 如果设置了RECORD_FILE，则把代理和摘要器的响应录制下来，供benchmark.py离线回放
+    record_file = os.getenv("RECORD_FILE")
+    if record_file:
+        miniagi.agent = RecordingLLM(miniagi.agent, record_file, "agent")
+        miniagi.summarizer = RecordingLLM(miniagi.summarizer, record_file, "summarizer")
+        miniagi.chunk_summarizer.summarizer = miniagi.summarizer
+
+    # 从检查点恢复状态，从最后完成的步骤之后继续
+    if checkpoint_state is not None:
+        restore_checkpoint(miniagi, checkpoint_state)
+        print(colored(f"已从 {checkpoint_file} 恢复，已完成 {miniagi.steps} 步", "green"))
+
+    # 主循环(核心代码)，退出时等待后台摘要和预取线程结束
+    try:
+        while True:
+            try:
+                # 显示旋转指示器，表示正在处理
+                # 流式模式下，推理一解析出来就先显示给操作者
+                with Spinner():
+                    miniagi.think(
+                        on_thought=lambda thought: print(colored(f"\rMiniAGI: {thought}", "cyan"))
+                    )
+            except InvalidLLMResponseError:
+                # 如果收到无效的LLM响应，则打印错误信息并重试
+                print(colored("LLM 响应无效，正在重试...", "red"))
+                continue
+
+            # 读取MiniAGI的思考结果(planning起作用)
+            (thought, command, arg) = miniagi.read_mind()
+
+            # 打印MiniAGI的思考结果、命令和参数（流式模式下思考结果已经显示过）
+            if miniagi.stream:
+                print(colored(f"Cmd: {command}, Arg: {arg}", "cyan"))
+            else:
+                print(colored(f"MiniAGI: {thought}\nCmd: {command}, Arg: {arg}", "cyan"))
+
+            # 如果命令是"done"，则退出程序
+            if command == "done":
+                sys.exit(0)
+
+            # 如果命令是"talk_to_user"，则与用户交互
+            if command == "talk_to_user":
+                print(colored(f"MiniAGI: {miniagi.proposed_arg}", 'blue'))
+                user_input = input('Your response(if want to end,type done): ')
+                ## 如果用户输入done,那么整个任务结束.
+                if user_input == "done":
+                    print(colored("任务结束,合作愉快"))
+                    break
+                with Spinner():
+                    miniagi.user_response(user_input)
+                save_checkpoint(miniagi, checkpoint_file)
+                continue
+
+            # 如果命令是"memorize_thoughts"，则打印MiniAGI正在思考的内容
+            if command == "memorize_thoughts":
+                print(colored("MiniAGI is thinking:\n"\
+                    f"{miniagi.proposed_arg}", 'cyan'))
+
+            # 执行MiniAGI的行动
+            with Spinner():
+                miniagi.act()
 
-        # 执行MiniAGI的行动
-        with Spinner():
-            miniagi.act()
+            # 每完成一步就保存检查点
+            save_checkpoint(miniagi, checkpoint_file)
+    finally:
+        miniagi.close()
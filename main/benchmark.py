@@ -0,0 +1,102 @@
+"""Benchmark the Flask builder loop against a scripted stand-in model.
+
+Runs the same scripted build (one create_file per step, then task_completed) in the default
+two-call mode and in single-call mode, and reports iterations, completions, prompt tokens and
+wall-clock time. Nothing is sent to a real model; --latency simulates its response time.
+
+Usage:
+    python benchmark.py [--files N] [--latency SECONDS] [--json FILE]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from types import SimpleNamespace
+
+# The stand-in model needs no network; skip litellm's model cost map download.
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+import main as builder
+from run_journal import list_journals, read_journal
+
+
+class ScriptedModel:
+    def __init__(self, steps, latency):
+        self.steps = list(steps)
+        self.latency = latency
+        self.calls = 0
+
+    @staticmethod
+    def tool_call(index, name, **arguments):
+        function = SimpleNamespace(name=name, arguments=json.dumps(arguments))
+        return SimpleNamespace(id=f"call_{index}", type="function", function=function)
+
+    def __call__(self, model, messages, tools=None, tool_choice=None, **kwargs):
+        time.sleep(self.latency)
+        self.calls += 1
+        if tools is None or not self.steps:
+            message = SimpleNamespace(role="assistant", content="Continuing with the next file.", tool_calls=None)
+        else:
+            message = SimpleNamespace(role="assistant", content="", tool_calls=[self.steps.pop(0)])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def build_steps(files):
+    steps = [
+        ScriptedModel.tool_call(i, "create_file", path=f"templates/page{i}.html", content=f"<h1>Page {i}</h1>\n" * 50)
+        for i in range(files)
+    ]
+    steps.append(ScriptedModel.tool_call(files, "task_completed"))
+    return steps
+
+
+def run(single_call, args):
+    model = ScriptedModel(build_steps(args.files), args.latency)
+    builder.completion = model
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        os.makedirs("templates")
+        try:
+            builder.update_progress(status="running", iteration=0, completed=False)
+            start = time.perf_counter()
+            builder.run_main_loop("Build a site with one page per file.", single_call=single_call)
+            wall = time.perf_counter() - start
+            history = read_journal(list_journals(builder.LOG_DIR)[-1])
+        finally:
+            os.chdir(cwd)
+
+    prompt_tokens = [tokens for iteration in history["iterations"] for tokens in iteration.get("prompt_tokens", [])]
+    return {
+        "mode": "single-call" if single_call else "two-call",
+        "iterations": builder.progress["iteration"],
+        "completions": model.calls,
+        "prompt_tokens": sum(prompt_tokens),
+        "wall_s": wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Flask builder loop with a scripted model")
+    parser.add_argument("--files", type=int, default=5, help="number of files the scripted build creates")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per completion")
+    parser.add_argument("--json", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = [run(False, args), run(True, args)]
+
+    print(f"{'mode':<12} {'iterations':>10} {'completions':>12} {'prompt_tokens':>14} {'wall_s':>8}")
+    for result in results:
+        print(f"{result['mode']:<12} {result['iterations']:>10} {result['completions']:>12} "
+              f"{result['prompt_tokens']:>14} {result['wall_s']:>8.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Token-budgeted conversation for the Flask builder loop.
+
+The builder's tool calls carry whole file bodies (create_file/update_file arguments) and so do
+fetch_code results. Re-sending every one of them on every completion makes each prompt larger
+than the last. BuilderContext keeps the full conversation but renders a compacted copy for each
+request:
+
+- only the newest version of each file is sent in full; older versions become a short reference;
+- if the prompt is still over budget, the oldest remaining file bodies and long tool results
+  outside the most recent messages are replaced by digests (path, size and hash), which the
+  model can expand again with fetch_code.
+
+Messages are never dropped, so every tool result still follows the tool call it answers.
+"""
+import os
+import json
+import hashlib
+
+from litellm import token_counter
+
+# Tools whose arguments carry a file body in "content".
+WRITE_TOOLS = ("create_file", "update_file")
+
+# Tools whose result is a file body.
+READ_TOOLS = ("fetch_code",)
+
+# Results shorter than this are never digested.
+MIN_DIGEST_CHARS = 400
+
+
+def message_to_dict(message):
+    if isinstance(message, dict):
+        return message
+    result = {"role": message.role, "content": message.content}
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        result["tool_calls"] = [
+            {
+                "id": tool_call.id,
+                "type": "function",
+                "function": {"name": tool_call.function.name, "arguments": tool_call.function.arguments},
+            }
+            for tool_call in tool_calls
+        ]
+    return result
+
+
+def digest(path, text):
+    lines = text.count("\n") + 1
+    sha1 = hashlib.sha1(text.encode("utf-8", "replace")).hexdigest()[:12]
+    return f"[{path}: {lines} lines, {len(text)} chars, sha1 {sha1}; call fetch_code to read it]"
+
+
+class BuilderContext:
+    def __init__(self, model, budget_tokens, keep_recent=4):
+        self.model = model
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self.messages = []
+        self.prompt_tokens = 0
+
+    def add(self, message):
+        self.messages.append(message_to_dict(message))
+
+    def count(self, messages):
+        return token_counter(model=self.model, messages=messages)
+
+    def _file_slots(self):
+        # Every place a file body appears, oldest first, as (message index, tool call index or None, path).
+        slots = []
+        paths_by_call = {}
+        for (index, message) in enumerate(self.messages):
+            for (call_index, tool_call) in enumerate(message.get("tool_calls") or []):
+                function = tool_call["function"]
+                try:
+                    arguments = json.loads(function["arguments"])
+                except (TypeError, ValueError):
+                    continue
+                if not isinstance(arguments, dict):
+                    continue
+                path = arguments.get("path") or arguments.get("file_path")
+                if isinstance(path, str):
+                    path = os.path.normpath(path)
+                paths_by_call[tool_call["id"]] = path
+                if function["name"] in WRITE_TOOLS and isinstance(arguments.get("content"), str):
+                    slots.append((index, call_index, path))
+            if message.get("role") == "tool" and message.get("name") in READ_TOOLS:
+                path = paths_by_call.get(message.get("tool_call_id"))
+                if path is not None and not str(message.get("content", "")).startswith("Error fetching code"):
+                    slots.append((index, None, path))
+        return slots
+
+    @staticmethod
+    def _replace(messages, index, call_index, make_text):
+        message = dict(messages[index])
+        if call_index is None:
+            message["content"] = make_text(message["content"])
+        else:
+            tool_calls = [dict(tool_call) for tool_call in message["tool_calls"]]
+            function = dict(tool_calls[call_index]["function"])
+            arguments = json.loads(function["arguments"])
+            arguments["content"] = make_text(arguments["content"])
+            function["arguments"] = json.dumps(arguments)
+            tool_calls[call_index]["function"] = function
+            message["tool_calls"] = tool_calls
+        messages[index] = message
+
+    def render(self):
+        messages = list(self.messages)
+        slots = self._file_slots()
+
+        # Keep only the newest version of each file in full.
+        newest = {}
+        for (index, call_index, path) in slots:
+            newest[path] = (index, call_index)
+        for (index, call_index, path) in slots:
+            if newest[path] != (index, call_index):
+                self._replace(
+                    messages, index, call_index,
+                    lambda text, path=path: f"[older version of {path} omitted; the current version appears later]"
+                )
+
+        # Over budget: digest the oldest file bodies, then the oldest long tool results.
+        self.prompt_tokens = self.count(messages)
+        recent = len(messages) - self.keep_recent
+        candidates = [(index, call_index, path) for (index, call_index, path) in slots
+                      if newest[path] == (index, call_index) and index < recent]
+        candidates += [
+            (index, None, message.get("name")) for (index, message) in enumerate(messages[:recent])
+            if message.get("role") == "tool" and message.get("name") not in READ_TOOLS
+            and len(str(message.get("content") or "")) >= MIN_DIGEST_CHARS
+        ]
+        for (index, call_index, path) in candidates:
+            if self.prompt_tokens <= self.budget_tokens:
+                break
+            before = self.count([messages[index]])
+            self._replace(messages, index, call_index, lambda text, path=path: digest(path, str(text)))
+            self.prompt_tokens += self.count([messages[index]]) - before
+
+        return messages
@@ -3,17 +3,36 @@ import sys
 import json
 import importlib
 import traceback
-from flask import Flask, Blueprint, request, send_from_directory, render_template_string, jsonify
-from threading import Thread
+from flask import Flask, Blueprint, Response, request, send_from_directory, render_template_string, jsonify
+from threading import Thread, Condition
 from time import sleep
 
-from litellm import completion, supports_function_calling
+from litellm import completion, supports_function_calling, RateLimitError
+
+from run_journal import RunJournal
+from builder_context import BuilderContext
 
 MODEL_NAME = os.environ.get('LITELLM_MODEL', 'gpt-4o')
 
 app = Flask(__name__)
 
-LOG_FILE = "flask_app_builder_log.json"
+# One JSONL journal per run, see run_journal.py; only the newest LOG_KEEP_RUNS are kept.
+LOG_DIR = "flask_app_builder_logs"
+LOG_KEEP_RUNS = 20
+
+# Token budget for the conversation sent with each completion, see builder_context.py.
+CONTEXT_BUDGET = int(os.environ.get('BUILDER_CONTEXT_TOKENS', 32000))
+
+# Single-call mode feeds tool results straight into the next tool-enabled completion instead of
+# asking for a separate narration first, and only waits between iterations after a rate limit.
+SINGLE_CALL_LOOP = os.environ.get('BUILDER_SINGLE_CALL') == '1'
+
+# Fixed pause between iterations in the default two-call mode.
+ITERATION_DELAY = 2
+
+# Wait after a rate limit error, doubled for each consecutive one.
+RATE_LIMIT_BACKOFF = 5
+RATE_LIMIT_BACKOFF_MAX = 60
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
@@ -24,10 +43,75 @@ progress = {
     "status": "idle",
     "iteration": 0,
     "max_iterations": 50,
-    "output": "",
+    "prompt_tokens": 0,
     "completed": False
 }
 
+progress_changed = Condition()
+
+# Seconds between keep-alive comments on an idle progress stream.
+STREAM_KEEPALIVE = 15
+
+# Maximum number of events returned by one /progress/events request.
+EVENTS_PAGE_SIZE = 500
+
+EVENT_TEMPLATES = {
+    "iteration": "\n<h2>Iteration {iteration}:</h2>\n",
+    "tool_call": "<strong>Tool Call:</strong>\n<p>{content}</p>\n",
+    "tool_result": "<strong>Tool Result ({tool}):</strong>\n<p>{result}</p>\n",
+    "llm_response": "<strong>LLM Response:</strong>\n<p>{content}</p>\n",
+    "complete": "\n<h2>COMPLETE</h2>\n",
+    "error": "{message}",
+}
+
+def render_event(event):
+    # Rendered on first read and kept, so each event is rendered at most once.
+    if "html" not in event:
+        event["html"] = EVENT_TEMPLATES[event["type"]].format(**event)
+    return event["html"]
+
+# Append-only log of typed output events. Offsets increase monotonically for the life of the
+# process: starting a new run drops the previous run's events without reusing their offsets,
+# so a reader holding a stale offset simply skips ahead.
+class OutputLog:
+    def __init__(self, changed):
+        self.changed = changed
+        self._events = []
+        self._base = 0
+
+    def append(self, event_type, **fields):
+        with self.changed:
+            offset = self._base + len(self._events)
+            self._events.append({"offset": offset, "type": event_type, **fields})
+            self.changed.notify_all()
+            return offset
+
+    def read(self, offset=0, limit=None):
+        with self.changed:
+            start = max(offset, self._base) - self._base
+            end = len(self._events) if limit is None else start + limit
+            return self._events[start:end]
+
+    def end(self):
+        with self.changed:
+            return self._base + len(self._events)
+
+    def clear(self):
+        with self.changed:
+            self._base += len(self._events)
+            self._events = []
+            self.changed.notify_all()
+
+    def render(self, offset=0):
+        return "".join(render_event(event) for event in self.read(offset))
+
+output_log = OutputLog(progress_changed)
+
+def update_progress(**changes):
+    with progress_changed:
+        progress.update(changes)
+        progress_changed.notify_all()
+
 def create_directory(path):
     if not os.path.exists(path):
         os.makedirs(path)
@@ -93,23 +177,18 @@ def load_routes():
         print(f"Error in load_routes: {e}")
         return f"Error loading routes: {e}"
 
+# The loop marks the run completed once the tool result and COMPLETE events are in the output
+# log; setting the flag here would let a stream send "done" before those events.
 def task_completed():
-    progress["status"] = "completed"
-    progress["completed"] = True
     return "Task marked as completed."
 
-create_directory(TEMPLATES_DIR)
-create_directory(STATIC_DIR)
-create_directory(ROUTES_DIR) 
-
-load_routes()
-
-def log_to_file(history_dict):
-    try:
-        with open(LOG_FILE, 'w') as log_file:
-            json.dump(history_dict, log_file, indent=4)
-    except Exception as e:
-        pass 
+# Creates the generated app's directories and registers its routes. Called on start-up rather
+# than at import, so importing this module (tests, benchmark.py) leaves the tree untouched.
+def init_app():
+    create_directory(TEMPLATES_DIR)
+    create_directory(STATIC_DIR)
+    create_directory(ROUTES_DIR)
+    load_routes()
 
 # Default route to serve generated index.html or render a form
 @app.route('/', methods=['GET', 'POST'])
@@ -120,29 +199,27 @@ def home():
     else:
         if request.method == 'POST':
             user_input = request.form.get('user_input')
-            progress["status"] = "running"
-            progress["iteration"] = 0
-            progress["output"] = ""
-            progress["completed"] = False
+            with progress_changed:
+                output_log.clear()
+                update_progress(status="running", iteration=0, completed=False)
             thread = Thread(target=run_main_loop, args=(user_input,))
             thread.start()
             return render_template_string('''
                 <h1>Progress</h1>
-                <pre id="progress">{{ progress_output }}</pre>
+                <pre id="progress"></pre>
                 <script>
-                    setInterval(function() {
-                        fetch('/progress')
-                        .then(response => response.json())
-                        .then(data => {
-                            document.getElementById('progress').innerHTML = data.output;
-                            if (data.completed) {
-                                document.getElementById('refresh-btn').style.display = 'block';
-                            }
-                        });
-                    }, 2000);
+                    // EventSource reconnects on its own and sends Last-Event-ID, so only missed fragments are re-sent.
+                    var source = new EventSource('/progress/stream');
+                    source.onmessage = function(event) {
+                        document.getElementById('progress').insertAdjacentHTML('beforeend', JSON.parse(event.data).html);
+                    };
+                    source.addEventListener('done', function() {
+                        source.close();
+                        document.getElementById('refresh-btn').style.display = 'block';
+                    });
                 </script>
                 <button id="refresh-btn" style="display:none;" onclick="location.reload();">Refresh Page</button>
-            ''', progress_output=progress["output"])
+            ''')
         else:
             return render_template_string('''
                 <h1>Flask App Builder</h1>
@@ -153,9 +230,67 @@ def home():
                 </form>
             ''')
 
+# Cheap status-only view; the output itself is streamed from /progress/stream.
 @app.route('/progress')
 def get_progress():
-    return jsonify(progress)
+    with progress_changed:
+        return jsonify({
+            "status": progress["status"],
+            "iteration": progress["iteration"],
+            "max_iterations": progress["max_iterations"],
+            "prompt_tokens": progress["prompt_tokens"],
+            "completed": progress["completed"],
+            "events": output_log.end()
+        })
+
+def request_offset():
+    offset = request.headers.get('Last-Event-ID') or request.args.get('offset') or 0
+    try:
+        return max(0, int(offset))
+    except ValueError:
+        return 0
+
+# A slice of typed output events starting at ?offset=, with their rendered HTML.
+@app.route('/progress/events')
+def get_progress_events():
+    offset = request_offset()
+    limit = min(request.args.get('limit', EVENTS_PAGE_SIZE, type=int), EVENTS_PAGE_SIZE)
+    events = output_log.read(offset, limit)
+    for event in events:
+        render_event(event)
+    return jsonify({
+        "events": events,
+        "next_offset": events[-1]["offset"] + 1 if events else offset
+    })
+
+# Server-Sent Events stream of output events. Each event's id is its offset + 1, so it resumes
+# after the Last-Event-ID header (sent by EventSource on reconnect) or the ?offset= query parameter.
+@app.route('/progress/stream')
+def stream_progress():
+    def generate(offset):
+        while True:
+            with progress_changed:
+                progress_changed.wait_for(
+                    lambda: output_log.end() > offset or progress["completed"],
+                    timeout=STREAM_KEEPALIVE
+                )
+                events = output_log.read(offset)
+                completed = progress["completed"]
+            for event in events:
+                offset = event["offset"] + 1
+                data = json.dumps({"type": event["type"], "html": render_event(event)})
+                yield f"id: {offset}\ndata: {data}\n\n"
+            if completed:
+                yield "event: done\ndata: {}\n\n"
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+
+    return Response(
+        generate(request_offset()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 available_functions = {
     "create_directory": create_directory,
@@ -256,23 +391,30 @@ tools = [
     }
 ]
 
-def run_main_loop(user_input):
-    # Reset the history_dict for each run
+def render_context(context, journal, iteration):
+    messages = context.render()
+    journal.write("prompt", iteration, tokens=context.prompt_tokens)
+    update_progress(prompt_tokens=context.prompt_tokens)
+    return messages
+
+def run_main_loop(user_input, single_call=SINGLE_CALL_LOOP):
+    # The run's history goes to its journal; the prompt starts from an empty history view.
     history_dict = {
         "iterations": []
     }
 
     if not supports_function_calling(MODEL_NAME):
-        progress["status"] = "error"
-        progress["output"] = "Model does not support function calling."
-        progress["completed"] = True
+        output_log.append("error", message="Model does not support function calling.")
+        update_progress(status="error", completed=True)
         return "Model does not support function calling."
 
     max_iterations = progress["max_iterations"]  # Prevent infinite loops
     iteration = 0
+    journal = RunJournal(LOG_DIR, keep_runs=LOG_KEEP_RUNS)
+    rate_limited = 0
 
     # Updated messages array with enhanced prompt
-    messages = [
+    initial_messages = [
         {
             "role": "system",
             "content": (
@@ -306,47 +448,43 @@ def run_main_loop(user_input):
         {"role": "user", "content": user_input},
         {"role": "system", "content": f"History:\n{json.dumps(history_dict, indent=2)}"}
     ]
+    context = BuilderContext(MODEL_NAME, CONTEXT_BUDGET)
+    for message in initial_messages:
+        context.add(message)
 
-    output = ""
+    start_offset = output_log.end()
 
     while iteration < max_iterations:
-        progress["iteration"] = iteration + 1
-        current_iteration = {
-            "iteration": iteration + 1,  # Start from 1
-            "actions": [],
-            "llm_responses": [],
-            "tool_results": [],
-            "errors": []
-        }
-        history_dict['iterations'].append(current_iteration)
+        update_progress(iteration=iteration + 1)
+        journal.write("iteration", iteration + 1)  # Start from 1
+        delay = 0 if single_call else ITERATION_DELAY
 
         try:
             response = completion(
                 model=MODEL_NAME,
-                messages=messages,
+                messages=render_context(context, journal, iteration + 1),
                 tools=tools,
                 tool_choice="auto"
             )
 
             if not response.choices[0].message:
                 error = response.get('error', 'Unknown error')
-                current_iteration['errors'].append({'action': 'llm_completion', 'error': error})
-                log_to_file(history_dict)
+                journal.write("error", iteration + 1, action='llm_completion', error=error)
                 sleep(5)
                 iteration += 1
                 continue
 
             response_message = response.choices[0].message
             content = response_message.content or ""
-            current_iteration['llm_responses'].append(content)
+            journal.write("llm_response", iteration + 1, content=content)
 
-            output += f"\n<h2>Iteration {iteration + 1}:</h2>\n"
+            output_log.append("iteration", iteration=iteration + 1)
 
             tool_calls = response_message.tool_calls
 
             if tool_calls:
-                output += "<strong>Tool Call:</strong>\n<p>" + content + "</p>\n"
-                messages.append(response_message)
+                output_log.append("tool_call", content=content)
+                context.add(response_message)
 
                 for tool_call in tool_calls:
                     function_name = tool_call.function.name
@@ -354,84 +492,88 @@ def run_main_loop(user_input):
 
                     if not function_to_call:
                         error_message = f"Tool '{function_name}' is not available."
-                        current_iteration['errors'].append({
-                            'action': f'tool_call_{function_name}',
-                            'error': error_message,
-                            'traceback': 'No traceback available.'
-                        })
+                        journal.write(
+                            "error", iteration + 1, action=f'tool_call_{function_name}',
+                            error=error_message, traceback='No traceback available.'
+                        )
+                        # Every tool call needs a result, or the next completion is rejected.
+                        context.add(
+                            {"tool_call_id": tool_call.id, "role": "tool", "name": function_name, "content": error_message}
+                        )
                         continue
 
+                    journal.write("tool_call", iteration + 1, tool=function_name, arguments=tool_call.function.arguments)
+
                     try:
                         function_args = json.loads(tool_call.function.arguments)
 
                         function_response = function_to_call(**function_args)
 
-                        current_iteration['tool_results'].append({
-                            'tool': function_name,
-                            'result': function_response
-                        })
+                        journal.write("tool_result", iteration + 1, tool=function_name, result=function_response)
 
-                        output += f"<strong>Tool Result ({function_name}):</strong>\n<p>{function_response}</p>\n"
+                        output_log.append("tool_result", tool=function_name, result=function_response)
 
-                        messages.append(
+                        context.add(
                             {"tool_call_id": tool_call.id, "role": "tool", "name": function_name, "content": function_response}
                         )
 
                         if function_name == "task_completed":
-                            progress["status"] = "completed"
-                            progress["completed"] = True
-                            output += "\n<h2>COMPLETE</h2>\n"
-                            progress["output"] = output
-                            log_to_file(history_dict)
-                            return output
+                            output_log.append("complete")
+                            update_progress(status="completed", completed=True)
+                            journal.close()
+                            return output_log.render(start_offset)
 
                     except Exception as tool_error:
                         error_message = f"Error executing {function_name}: {tool_error}"
-                        current_iteration['errors'].append({
-                            'action': f'tool_call_{function_name}',
-                            'error': error_message,
-                            'traceback': traceback.format_exc()
-                        })
-
-                second_response = completion(
-                    model=MODEL_NAME,
-                    messages=messages
-                )
-                if second_response.choices and second_response.choices[0].message:
-                    second_response_message = second_response.choices[0].message
-                    content = second_response_message.content or ""
-                    current_iteration['llm_responses'].append(content)
-                    output += "<strong>LLM Response:</strong>\n<p>" + content + "</p>\n"
-                    messages.append(second_response_message)
-                else:
-                    error = second_response.get('error', 'Unknown error in second LLM response.')
-                    current_iteration['errors'].append({'action': 'second_llm_completion', 'error': error})
+                        journal.write(
+                            "error", iteration + 1, action=f'tool_call_{function_name}',
+                            error=error_message, traceback=traceback.format_exc()
+                        )
+                        context.add(
+                            {"tool_call_id": tool_call.id, "role": "tool", "name": function_name, "content": error_message}
+                        )
+
+                # In single-call mode any narration came with the tool calls, and the results
+                # go straight into the next iteration's tool-enabled completion.
+                if not single_call:
+                    second_response = completion(
+                        model=MODEL_NAME,
+                        messages=render_context(context, journal, iteration + 1)
+                    )
+                    if second_response.choices and second_response.choices[0].message:
+                        second_response_message = second_response.choices[0].message
+                        content = second_response_message.content or ""
+                        journal.write("llm_response", iteration + 1, content=content)
+                        output_log.append("llm_response", content=content)
+                        context.add(second_response_message)
+                    else:
+                        error = second_response.get('error', 'Unknown error in second LLM response.')
+                        journal.write("error", iteration + 1, action='second_llm_completion', error=error)
 
             else:
-                output += "<strong>LLM Response:</strong>\n<p>" + content + "</p>\n"
-                messages.append(response_message)
+                output_log.append("llm_response", content=content)
+                context.add(response_message)
+
+            rate_limited = 0
 
-            progress["output"] = output
+        except RateLimitError as e:
+            rate_limited += 1
+            delay = min(RATE_LIMIT_BACKOFF_MAX, RATE_LIMIT_BACKOFF * 2 ** (rate_limited - 1))
+            journal.write("error", iteration + 1, action='rate_limit', error=str(e))
 
         except Exception as e:
             error = str(e)
-            current_iteration['errors'].append({
-                'action': 'main_loop',
-                'error': error,
-                'traceback': traceback.format_exc()
-            })
+            journal.write("error", iteration + 1, action='main_loop', error=error, traceback=traceback.format_exc())
 
         iteration += 1
-        log_to_file(history_dict)
-        sleep(2)
-
-    if iteration >= max_iterations:
-        progress["status"] = "completed"
+        if delay:
+            sleep(delay)
 
-    progress["completed"] = True
-    progress["status"] = "completed"
+    journal.close()
+    update_progress(status="completed", completed=True)
 
-    return output
+    return output_log.render(start_offset)
 
 if __name__ == '__main__':
+    init_app()
     app.run(host='0.0.0.0', port=8080)
@@ -0,0 +1,128 @@
+"""Append-only JSONL journal of Flask builder runs.
+
+Each run writes its own file in the log directory, one JSON record per line: the start of an
+iteration, the prompt size of every completion, every tool call and its result, every LLM
+response and every error. Records are
+flushed to the OS as they are written and fsynced in batches, so a crash loses at most the
+last unsynced batch and never corrupts earlier records.
+
+Usage:
+    python run_journal.py [journal file or log directory]
+
+prints the run's history (the latest run when given a directory) in the old
+flask_app_builder_log.json layout.
+"""
+import os
+import sys
+import json
+import time
+
+JOURNAL_PREFIX = "run-"
+JOURNAL_SUFFIX = ".jsonl"
+
+
+class RunJournal:
+    def __init__(self, directory, keep_runs=20, sync_every=32, sync_interval=1.0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        # Timestamped names sort chronologically, which is what rotation relies on.
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(directory, f"{JOURNAL_PREFIX}{stamp}-{time.time_ns() % 10**9:09d}{JOURNAL_SUFFIX}")
+        self._file = open(self.path, "x", encoding="utf-8")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        prune_journals(directory, keep_runs)
+
+    def write(self, record_type, iteration, **fields):
+        record = {"type": record_type, "iteration": iteration, "time": time.time(), **fields}
+        self._file.write(json.dumps(record, default=str) + "\n")
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def list_journals(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.startswith(JOURNAL_PREFIX) and name.endswith(JOURNAL_SUFFIX)
+    )
+
+
+def prune_journals(directory, keep_runs):
+    for path in list_journals(directory)[:-keep_runs]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def read_journal(path):
+    # Rebuilds the history_dict view that log_to_file used to write. A torn last line
+    # from a crash is skipped.
+    history_dict = {"iterations": []}
+    iterations = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            number = record.get("iteration")
+            current = iterations.get(number)
+            if current is None:
+                current = {"iteration": number, "actions": [], "llm_responses": [], "tool_results": [], "errors": []}
+                iterations[number] = current
+                history_dict["iterations"].append(current)
+
+            record_type = record["type"]
+            if record_type == "tool_call":
+                current["actions"].append({"tool": record["tool"], "arguments": record["arguments"]})
+            elif record_type == "tool_result":
+                current["tool_results"].append({"tool": record["tool"], "result": record["result"]})
+            elif record_type == "llm_response":
+                current["llm_responses"].append(record["content"])
+            elif record_type == "prompt":
+                current.setdefault("prompt_tokens", []).append(record["tokens"])
+            elif record_type == "error":
+                current["errors"].append({
+                    key: record[key] for key in ("action", "error", "traceback") if key in record
+                })
+    return history_dict
+
+
+def main():
+    target = sys.argv[1] if len(sys.argv) > 1 else "flask_app_builder_logs"
+    if os.path.isdir(target):
+        journals = list_journals(target)
+        if not journals:
+            print(f"No runs in {target}")
+            return 1
+        target = journals[-1]
+    print(json.dumps(read_journal(target), indent=4))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
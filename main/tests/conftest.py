@@ -0,0 +1,33 @@
+import os
+import sys
+import importlib.util
+
+import pytest
+
+# No network in tests: use litellm's bundled model cost map.
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+BUILDER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Appended, not prepended: the builder's main.py must not shadow the agent's main.py in the top-level tests.
+if BUILDER_DIR not in sys.path:
+    sys.path.append(BUILDER_DIR)
+
+_builder = None
+
+
+def load_builder():
+    # Loaded by path so it cannot be confused with the agent's top-level main.py.
+    global _builder
+    if _builder is None:
+        spec = importlib.util.spec_from_file_location("flask_app_builder", os.path.join(BUILDER_DIR, "main.py"))
+        _builder = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_builder)
+    return _builder
+
+
+@pytest.fixture
+def builder():
+    module = load_builder()
+    module.output_log.clear()
+    module.update_progress(status="idle", iteration=0, prompt_tokens=0, completed=False)
+    return module
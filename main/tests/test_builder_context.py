@@ -0,0 +1,72 @@
+import json
+
+from builder_context import BuilderContext
+
+MODEL = "gpt-4o"
+
+
+def write_call(call_id, path, content, name="create_file"):
+    return {
+        "role": "assistant",
+        "content": "",
+        "tool_calls": [{
+            "id": call_id,
+            "type": "function",
+            "function": {"name": name, "arguments": json.dumps({"path": path, "content": content})},
+        }],
+    }
+
+
+def tool_result(call_id, name, content):
+    return {"role": "tool", "tool_call_id": call_id, "name": name, "content": content}
+
+
+def file_content(message):
+    return json.loads(message["tool_calls"][0]["function"]["arguments"])["content"]
+
+
+def build(context, versions):
+    context.add({"role": "system", "content": "Build a Flask app."})
+    for (i, (path, content)) in enumerate(versions):
+        context.add(write_call(f"call_{i}", path, content))
+        context.add(tool_result(f"call_{i}", "create_file", f"Created file: {path}"))
+
+
+def test_only_newest_version_of_a_file_is_sent():
+    context = BuilderContext(MODEL, budget_tokens=100000)
+    build(context, [("templates/index.html", "<p>v1</p>"), ("./templates/index.html", "<p>v2</p>")])
+
+    messages = context.render()
+    assert file_content(messages[1]).startswith("[older version of templates/index.html omitted")
+    assert file_content(messages[3]) == "<p>v2</p>"
+    # The stored conversation is left intact.
+    assert file_content(context.messages[1]) == "<p>v1</p>"
+
+
+def test_over_budget_digests_oldest_files_and_keeps_recent():
+    context = BuilderContext(MODEL, budget_tokens=1500, keep_recent=2)
+    build(context, [(f"static/s{i}.css", "a { color: red; }\n" * 100) for i in range(6)])
+    full_tokens = context.count(context.messages)
+
+    messages = context.render()
+    assert len(messages) == len(context.messages)
+    assert context.prompt_tokens <= 1500 < full_tokens
+    assert context.prompt_tokens == context.count(messages)
+    assert file_content(messages[1]).startswith("[static/s0.css: 101 lines")
+    assert file_content(messages[-2]) == "a { color: red; }\n" * 100
+    for (call, result) in zip(messages[1::2], messages[2::2]):
+        assert result["tool_call_id"] == call["tool_calls"][0]["id"]
+
+
+def test_fetch_code_results_are_digested_by_path():
+    context = BuilderContext(MODEL, budget_tokens=400, keep_recent=1)
+    context.add({"role": "system", "content": "Build a Flask app."})
+    call = write_call("call_0", "routes/app.py", "", name="fetch_code")
+    call["tool_calls"][0]["function"]["arguments"] = json.dumps({"file_path": "routes/app.py"})
+    context.add(call)
+    context.add(tool_result("call_0", "fetch_code", "def view():\n    return 'ok'\n" * 100))
+    context.add({"role": "assistant", "content": "Reviewed the routes."})
+
+    messages = context.render()
+    assert messages[2]["content"].startswith("[routes/app.py: 201 lines")
+    assert context.prompt_tokens <= 400
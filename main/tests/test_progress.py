@@ -0,0 +1,130 @@
+import os
+import json
+import shutil
+import threading
+import importlib.util
+from types import SimpleNamespace
+
+BUILDER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if fields:
+            events.append(fields)
+    return events
+
+
+def scripted_completion(*steps):
+    steps = list(steps)
+
+    def completion(model, messages, tools=None, tool_choice=None, **kwargs):
+        tool_calls = steps.pop(0) if tools is not None and steps else None
+        message = SimpleNamespace(role="assistant", content="", tool_calls=tool_calls)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+    return completion
+
+
+def tool_call(call_id, name, **arguments):
+    function = SimpleNamespace(name=name, arguments=json.dumps(arguments))
+    return SimpleNamespace(id=call_id, type="function", function=function)
+
+
+def test_import_has_no_side_effects(tmp_path):
+    # A fresh copy, so directories left by earlier runs of the real app do not matter.
+    shutil.copy(os.path.join(BUILDER_DIR, "main.py"), tmp_path)
+    spec = importlib.util.spec_from_file_location("flask_app_builder_copy", tmp_path / "main.py")
+    spec.loader.exec_module(importlib.util.module_from_spec(spec))
+    assert [path.name for path in tmp_path.iterdir() if path.name != "__pycache__"] == ["main.py"]
+
+
+def test_output_log_offsets_survive_clear(builder):
+    log = builder.output_log
+    start = log.end()
+    assert [log.append("iteration", iteration=i) for i in range(3)] == [start, start + 1, start + 2]
+
+    log.clear()
+    assert log.end() == start + 3
+    assert log.read(start) == []
+    assert log.append("complete") == start + 3
+    assert [event["offset"] for event in log.read(start)] == [start + 3]
+
+
+def test_output_log_read_limit_and_render(builder):
+    log = builder.output_log
+    start = log.end()
+    for i in range(5):
+        log.append("llm_response", content=f"step {i}")
+
+    events = log.read(start + 1, limit=2)
+    assert [event["content"] for event in events] == ["step 1", "step 2"]
+    assert log.render(start + 4) == "<strong>LLM Response:</strong>\n<p>step 4</p>\n"
+    assert "html" in log.read(start + 4)[0]
+
+
+def test_progress_is_status_only(builder):
+    builder.output_log.append("iteration", iteration=1)
+    builder.update_progress(status="running", iteration=1)
+
+    data = builder.app.test_client().get("/progress").get_json()
+    assert data["status"] == "running"
+    assert data["events"] == builder.output_log.end()
+    assert "output" not in data
+
+
+def test_progress_events_slice(builder):
+    start = builder.output_log.end()
+    for i in range(4):
+        builder.output_log.append("tool_result", tool="fetch_code", result=f"r{i}")
+
+    data = builder.app.test_client().get(f"/progress/events?offset={start + 1}&limit=2").get_json()
+    assert [event["offset"] for event in data["events"]] == [start + 1, start + 2]
+    assert data["events"][0]["html"] == "<strong>Tool Result (fetch_code):</strong>\n<p>r1</p>\n"
+    assert data["next_offset"] == start + 3
+
+
+def test_stream_resumes_after_last_event_id(builder):
+    start = builder.output_log.end()
+    for i in range(5):
+        builder.output_log.append("iteration", iteration=i + 1)
+    builder.update_progress(status="completed", completed=True)
+    client = builder.app.test_client()
+
+    events = sse_events(client.get("/progress/stream", query_string={"offset": start}).get_data(as_text=True))
+    assert [event["id"] for event in events[:-1]] == [str(start + i + 1) for i in range(5)]
+    assert events[-1]["event"] == "done"
+
+    # EventSource sends the id of the last event it received; only later events are re-sent.
+    resumed = client.get("/progress/stream", headers={"Last-Event-ID": str(start + 3)})
+    events = sse_events(resumed.get_data(as_text=True))
+    assert [event["id"] for event in events[:-1]] == [str(start + 4), str(start + 5)]
+    assert json.loads(events[0]["data"]) == {"type": "iteration", "html": "\n<h2>Iteration 4:</h2>\n"}
+    assert events[-1]["event"] == "done"
+
+
+def test_stream_carries_completion_events_before_done(builder, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(builder, "completion", scripted_completion([tool_call("call_0", "task_completed")]))
+
+    # The flag must only be set once the final events are in the log.
+    completed_at_append = {}
+    append = builder.output_log.append
+
+    def recording_append(event_type, **fields):
+        completed_at_append[event_type] = builder.progress["completed"]
+        return append(event_type, **fields)
+    monkeypatch.setattr(builder.output_log, "append", recording_append)
+
+    start = builder.output_log.end()
+    builder.update_progress(status="running")
+    thread = threading.Thread(target=builder.run_main_loop, args=("Build a page.",), kwargs={"single_call": True})
+    thread.start()
+    response = builder.app.test_client().get("/progress/stream", query_string={"offset": start}, buffered=False)
+    body = "".join(chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in response.response)
+    thread.join()
+
+    assert completed_at_append == {"iteration": False, "tool_call": False, "tool_result": False, "complete": False}
+    types = [event.get("event") or json.loads(event["data"])["type"] for event in sse_events(body)]
+    assert types == ["iteration", "tool_call", "tool_result", "complete", "done"]
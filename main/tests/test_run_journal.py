@@ -0,0 +1,51 @@
+import os
+
+from run_journal import RunJournal, list_journals, prune_journals, read_journal
+
+
+def test_read_journal_rebuilds_history(tmp_path):
+    with RunJournal(str(tmp_path)) as journal:
+        journal.write("iteration", 1)
+        journal.write("prompt", 1, tokens=120)
+        journal.write("tool_call", 1, tool="create_file", arguments={"path": "templates/index.html"})
+        journal.write("tool_result", 1, tool="create_file", result="Created file: templates/index.html")
+        journal.write("llm_response", 1, content="Created the index page.")
+        journal.write("iteration", 2)
+        journal.write("prompt", 2, tokens=180)
+        journal.write("error", 2, action="main_loop", error="boom", traceback="Traceback ...")
+
+    history = read_journal(journal.path)
+    (first, second) = history["iterations"]
+    assert first == {
+        "iteration": 1,
+        "actions": [{"tool": "create_file", "arguments": {"path": "templates/index.html"}}],
+        "llm_responses": ["Created the index page."],
+        "tool_results": [{"tool": "create_file", "result": "Created file: templates/index.html"}],
+        "errors": [],
+        "prompt_tokens": [120],
+    }
+    assert second["prompt_tokens"] == [180]
+    assert second["errors"] == [{"action": "main_loop", "error": "boom", "traceback": "Traceback ..."}]
+
+
+def test_read_journal_skips_torn_last_line(tmp_path):
+    with RunJournal(str(tmp_path)) as journal:
+        journal.write("iteration", 1)
+        journal.write("llm_response", 1, content="ok")
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"type": "llm_response", "iteration": 1, "cont')
+
+    assert read_journal(journal.path)["iterations"][0]["llm_responses"] == ["ok"]
+
+
+def test_prune_keeps_newest_runs(tmp_path):
+    for i in range(5):
+        (tmp_path / f"run-2026010{i}-000000-000000000.jsonl").write_text("")
+    (tmp_path / "notes.txt").write_text("")
+
+    prune_journals(str(tmp_path), 2)
+    assert [os.path.basename(path) for path in list_journals(str(tmp_path))] == [
+        "run-20260103-000000-000000000.jsonl",
+        "run-20260104-000000-000000000.jsonl",
+    ]
+    assert (tmp_path / "notes.txt").exists()
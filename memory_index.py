@@ -0,0 +1,104 @@
+"""
+这个模块提供了 `MemoryIndex` 类，一个增量构建的 TF-IDF 记忆索引，
+用于在构建上下文时把最近的记忆和与当前目标相关的较早记忆结合起来。
+"""
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+
+
+class MemoryIndex:
+    """
+    增量的 TF-IDF 记忆索引。
+
+    使用字符 n-gram 的哈希向量化，因此新增记忆时不需要重新拟合词表，
+    中英文混合的文本也能得到合理的相似度。文档频率随记忆的加入增量更新，
+    查询时再换算成 IDF 权重并计算余弦相似度。
+
+    Attributes:
+        texts (list): 按加入顺序排列的记忆项。
+    """
+
+    def __init__(self, n_features: int = 2 ** 18):
+        """
+        构造一个 `MemoryIndex` 实例。
+
+        Args:
+            n_features (int, optional): 哈希特征空间的大小。
+        """
+        self.vectorizer = HashingVectorizer(
+            analyzer="char_wb",
+            ngram_range=(2, 4),
+            n_features=n_features,
+            alternate_sign=False,
+            norm=None,
+        )
+        self.texts = []
+        self._rows = []
+        self._matrix = None
+        self._document_frequency = np.zeros(n_features)
+
+    def add(self, text: str):
+        """
+        把一个记忆项加入索引。
+
+        Args:
+            text (str): 记忆项。
+        """
+        row = self.vectorizer.transform([text]).tocsr()
+        self._document_frequency[row.indices] += 1
+        self.texts.append(text)
+        self._rows.append(row)
+        self._matrix = None
+
+    def search(self, query: str, limit: int, exclude_last: int = 0) -> list:
+        """
+        查找与查询最相关的记忆项。
+
+        Args:
+            query (str): 查询文本。
+            limit (int): 返回的最大记忆项数。
+            exclude_last (int, optional): 不参与查找的最近记忆项数量（它们会按时间顺序另外选入）。
+
+        Returns:
+            list: (位置, 相似度) 的列表，按相似度从高到低排列，只包含相似度大于 0 的记忆项。
+        """
+        candidates = len(self.texts) - exclude_last
+        if candidates <= 0 or limit <= 0:
+            return []
+
+        if self._matrix is None:
+            self._matrix = sparse.vstack(self._rows).tocsr()
+
+        idf = np.log((1 + len(self.texts)) / (1 + self._document_frequency)) + 1
+        weights = sparse.diags(idf)
+
+        documents = self._matrix[:candidates] @ weights
+        norms = np.sqrt(np.asarray(documents.multiply(documents).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+
+        query_vector = self.vectorizer.transform([query]) @ weights
+        query_norm = np.sqrt(query_vector.multiply(query_vector).sum()) or 1
+
+        scores = np.asarray((documents @ query_vector.T).todense()).ravel() / norms / query_norm
+        best = np.argsort(-scores)[:limit]
+        return [(int(i), float(scores[i])) for i in best if scores[i] > 0]
+
+    def recall(self, query: str, recent: int, relevant: int) -> list:
+        """
+        按优先级返回记忆项：先是最近的 `recent` 个（从新到旧），再是较早记忆中最相关的 `relevant` 个。
+
+        Args:
+            query (str): 查询文本。
+            recent (int): 最近记忆项的数量。
+            relevant (int): 相关记忆项的数量。
+
+        Returns:
+            list: (位置, 记忆项) 的列表，按优先级排列。
+        """
+        count = len(self.texts)
+        selected = [(i, self.texts[i]) for i in range(count - 1, max(count - recent, 0) - 1, -1)]
+        for (i, _) in self.search(query, relevant, exclude_last=recent):
+            selected.append((i, self.texts[i]))
+        return selected
@@ -0,0 +1,194 @@
+"""
+这个模块提供了 `ParallelSummarizer` 类，以 map-reduce 的方式摘要超大的输入：
+在有界的线程池中并发摘要各个分块，再按树形结构合并部分摘要。
+"""
+
+import sys
+import time
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import Tracer
+
+
+def _is_rate_limit_error(exception: Exception) -> bool:
+    """
+    判断异常是否为 OpenAI 的速率限制错误。openai 尚未被导入时，异常不可能来自它，因此无需导入。
+    """
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(exception, openai.error.RateLimitError)
+
+
+class ParallelSummarizer:
+    """
+    并发的分块摘要器，可以替代 `ThinkGPT.chunked_summarize`。
+
+    分块方式和每块的摘要预算与顺序实现一致；只有当部分摘要合起来仍超出预算时，
+    才把它们分组再次摘要，直到结果放得下。
+
+    Attributes:
+        summarizer: 提供 `summarize` 方法的 `ThinkGPT` 实例或替身。
+        count_tokens (callable): 计算文本标记数的函数。
+        chunk_tokens (int): 每个分块的标记数。
+        max_workers (int): 并发摘要的最大线程数。
+        min_leaf_tokens (int): 每个分块摘要的最小预算。
+        max_retries (int): 遇到速率限制时的最大重试次数；由 `HttpClient` 负责重试时应为 0。
+        tracer (Tracer): 记录 chunked_summarize 和 summarize 区间的追踪器。
+    """
+
+    def __init__(self, summarizer, count_tokens, chunk_tokens: int = 3000, max_workers: int = 4,
+                 min_leaf_tokens: int = 200, max_retries: int = 5, tracer: Tracer = None):
+        """
+        构造一个 `ParallelSummarizer` 实例。
+
+        Args:
+            summarizer: 提供 `summarize` 方法的 `ThinkGPT` 实例或替身。
+            count_tokens (callable): 计算文本标记数的函数。
+            chunk_tokens (int, optional): 每个分块的标记数，默认与 `ThinkGPT` 的分块大小相同。
+            max_workers (int, optional): 并发摘要的最大线程数。
+            min_leaf_tokens (int, optional): 每个分块摘要的最小预算。
+            max_retries (int, optional): 遇到速率限制时的最大重试次数。
+            tracer (Tracer, optional): 追踪器；为 None 时不记录。
+        """
+        self.summarizer = summarizer
+        self.count_tokens = count_tokens
+        self.chunk_tokens = chunk_tokens
+        self.max_workers = max_workers
+        self.min_leaf_tokens = min_leaf_tokens
+        self.max_retries = max_retries
+        self.tracer = tracer or Tracer()
+
+    def _summarize(self, content: str, max_tokens: int, instruction_hint: str) -> str:
+        """
+        摘要一段内容，遇到速率限制时以带抖动的指数退避重试。
+
+        Args:
+            content (str): 要摘要的内容。
+            max_tokens (int): 摘要的最大标记数。
+            instruction_hint (str): 摘要提示。
+
+        Returns:
+            tuple: 摘要及其标记数。
+        """
+        tokens_in = self.count_tokens(content) if self.tracer.enabled else None
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.tracer.span("summarize", tokens_in=tokens_in, attempt=attempt) as span:
+                    summary = self.summarizer.summarize(content, max_tokens, instruction_hint=instruction_hint)
+                    tokens_out = self.count_tokens(summary)
+                    span.set(tokens_out=tokens_out)
+                return (summary, tokens_out)
+            except Exception as exception:  # pylint: disable=broad-exception-caught
+                if not _is_rate_limit_error(exception) or attempt == self.max_retries:
+                    raise
+                time.sleep(min(60.0, 2 ** attempt) * random.uniform(0.5, 1.0))
+        return ("", 0)
+
+    @staticmethod
+    def split(content: str, chunk_chars: int) -> list:
+        """
+        把内容切分为大约 `chunk_chars` 个字符的分块，尽量在空白处断开。
+
+        Args:
+            content (str): 要切分的内容。
+            chunk_chars (int): 每个分块的目标字符数。
+
+        Returns:
+            list: 分块列表。
+        """
+        chunks = []
+        start = 0
+        while start < len(content):
+            end = min(start + chunk_chars, len(content))
+            if end < len(content):
+                boundary = max(content.rfind("\n", start, end), content.rfind(" ", start, end))
+                if boundary > start + chunk_chars * 0.9:
+                    end = boundary + 1
+            chunks.append(content[start:end])
+            start = end
+        return chunks
+
+    def chunked_summarize(self, content: str, max_tokens: int = 4096, instruction_hint: str = "",
+                          num_tokens: int = None) -> str:
+        """
+        把内容摘要到 `max_tokens` 以内。内容本来就放得下时原样返回。
+
+        Args:
+            content (str): 要摘要的内容。
+            max_tokens (int, optional): 摘要的最大标记数。
+            instruction_hint (str, optional): 摘要提示。
+            num_tokens (int, optional): 调用方已经算好的内容标记数，避免重新计数。
+
+        Returns:
+            str: 摘要。
+        """
+        if num_tokens is None:
+            num_tokens = self.count_tokens(content)
+        if num_tokens <= max_tokens:
+            return content
+
+        chunk_chars = max(1, int(len(content) / num_tokens * self.chunk_tokens))
+        chunks = self.split(content, chunk_chars)
+        return self.summarize_chunks(chunks, len(chunks), max_tokens, instruction_hint)
+
+    def summarize_chunks(self, chunks, num_chunks: int, max_tokens: int, instruction_hint: str = "") -> str:
+        """
+        摘要一个按顺序产出的分块序列，并合并为不超过 `max_tokens` 的摘要。
+
+        分块可以是惰性生成的：同一时间最多只有 `max_workers` 个分块在内存中等待摘要。
+
+        Args:
+            chunks: 分块的可迭代对象。
+            num_chunks (int): 分块数量（或其估计值），用于分配每块的摘要预算。
+            max_tokens (int): 摘要的最大标记数。
+            instruction_hint (str, optional): 摘要提示。
+
+        Returns:
+            str: 摘要。
+        """
+        leaf_tokens = max(max_tokens // max(num_chunks, 1), min(self.min_leaf_tokens, max_tokens))
+
+        with self.tracer.span("chunked_summarize", chunks=num_chunks, max_tokens=max_tokens), \
+                ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            parts = self._bounded_map(
+                executor, lambda chunk: self._summarize(chunk, leaf_tokens, instruction_hint), chunks
+            )
+
+            # 树形合并：把相邻的部分摘要分组再摘要，直到合起来放得下。
+            # 每个部分摘要只在产生时计数一次，合并判断使用它们的累计标记数，不再重新编码拼接结果。
+            while len(parts) > 1 and sum(tokens for (_, tokens) in parts) > max_tokens:
+                group_size = max(2, self.chunk_tokens // max(leaf_tokens, 1))
+                groups = [
+                    "\n".join(summary for (summary, _) in parts[i:i + group_size])
+                    for i in range(0, len(parts), group_size)
+                ]
+                leaf_tokens = max(max_tokens // len(groups), min(self.min_leaf_tokens, max_tokens))
+                parts = list(executor.map(
+                    lambda group, budget=leaf_tokens: self._summarize(group, budget, instruction_hint), groups
+                ))
+
+        return "".join(summary for (summary, _) in parts)
+
+    def _bounded_map(self, executor, func, items) -> list:
+        """
+        按顺序把 `func` 应用到 `items` 上，同一时间最多提交 `max_workers` 个任务，
+        从而不会提前把整个惰性序列读入内存。
+
+        Args:
+            executor (ThreadPoolExecutor): 线程池。
+            func (callable): 要应用的函数。
+            items: 可迭代对象。
+
+        Returns:
+            list: 按原顺序排列的结果。
+        """
+        pending = deque()
+        results = []
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= self.max_workers:
+                results.append(pending.popleft().result())
+        while pending:
+            results.append(pending.popleft().result())
+        return results
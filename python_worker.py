@@ -0,0 +1,339 @@
+"""
+这个模块提供了 `PythonWorker` 类，一个常驻的进程外 Python 工作进程，用于执行代理生成的代码。
+
+工作进程在多次执行之间保留已导入的模块和全局变量，执行时有墙钟时间和内存限制，
+标准输出以流的形式传回；工作进程崩溃或超时被终止后，下一次执行时会自动重启。
+
+当作为脚本运行时，本模块就是工作进程本身：`python python_worker.py <命令管道> <结果管道> <内存上限MB>`。
+"""
+
+import io
+import os
+import sys
+import json
+import codecs
+import time
+import queue
+import signal
+import threading
+import traceback
+import subprocess
+
+from exceptions import PythonWorkerError
+
+# 单次执行的默认墙钟时间上限（秒）和工作进程的默认内存上限（MB）。
+DEFAULT_TIMEOUT = float(os.getenv("PYTHON_WORKER_TIMEOUT", "120"))
+DEFAULT_MEMORY_MB = int(os.getenv("PYTHON_WORKER_MEMORY_MB", "4096"))
+
+
+class PythonWorker:
+    """
+    常驻的进程外 Python 工作进程。
+
+    Attributes:
+        timeout (float): 单次执行的墙钟时间上限（秒）。
+        memory_mb (int): 工作进程的地址空间上限（MB）；为 0 时不限制。
+        restarts (int): 工作进程被（重新）启动的次数。
+        cwd (str): 工作进程的工作目录；为 None 时继承当前进程的工作目录。
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, memory_mb: int = DEFAULT_MEMORY_MB, cwd: str = None):
+        """
+        构造一个 `PythonWorker` 实例。工作进程在第一次执行时才启动。
+
+        Args:
+            timeout (float, optional): 单次执行的墙钟时间上限（秒）。
+            memory_mb (int, optional): 工作进程的地址空间上限（MB）。
+            cwd (str, optional): 工作进程的工作目录。
+        """
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.cwd = cwd
+        self.restarts = 0
+        self._process = None
+        self._commands = None
+        self._results = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, cwd: str = None):
+        """
+        返回进程内共享的工作进程实例，每个工作目录一个。
+
+        Args:
+            cwd (str, optional): 工作进程的工作目录。
+
+        Returns:
+            PythonWorker: 共享的实例。
+        """
+        with cls._shared_lock:
+            if cwd not in cls._shared:
+                cls._shared[cwd] = cls(cwd=cwd)
+            return cls._shared[cwd]
+
+    @classmethod
+    def release(cls, cwd: str = None):
+        """
+        终止并移除某个工作目录的共享工作进程。
+
+        Args:
+            cwd (str, optional): 工作进程的工作目录。
+        """
+        with cls._shared_lock:
+            worker = cls._shared.pop(cwd, None)
+        if worker is not None:
+            worker.close()
+
+    def _start(self):
+        """
+        启动工作进程，并开始在后台线程中读取它的结果。
+        """
+        (command_read, command_write) = os.pipe()
+        (result_read, result_write) = os.pipe()
+
+        self._process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), str(command_read), str(result_write), str(self.memory_mb)],
+            stdin=subprocess.DEVNULL,
+            cwd=self.cwd,
+            pass_fds=(command_read, result_write),
+            start_new_session=True,
+        )
+        os.close(command_read)
+        os.close(result_write)
+
+        self._commands = os.fdopen(command_write, "w", encoding="utf-8")
+        self._results = queue.Queue()
+        threading.Thread(
+            target=self._read_results,
+            args=(os.fdopen(result_read, "r", encoding="utf-8"), self._results),
+            daemon=True
+        ).start()
+        self.restarts += 1
+
+    @staticmethod
+    def _read_results(stream, results: queue.Queue):
+        """
+        把工作进程发回的消息放入队列；管道关闭时放入 None。
+
+        Args:
+            stream: 结果管道。
+            results (queue.Queue): 消息队列。
+        """
+        with stream:
+            for line in stream:
+                results.put(json.loads(line))
+        results.put(None)
+
+    def _kill(self):
+        """
+        终止工作进程及其进程组中的所有子进程。
+        """
+        if self._process is None:
+            return
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(self._process.pid, signal.SIGKILL)
+            else:
+                self._process.kill()
+        except OSError:
+            pass
+        self._process.wait()
+        try:
+            self._commands.close()
+        except OSError:
+            pass
+        self._process = None
+
+    def close(self):
+        """
+        终止工作进程。
+        """
+        with self._lock:
+            self._kill()
+
+    def execute(self, code: str, timeout: float = None, on_output=None) -> str:
+        """
+        在工作进程中执行代码并返回其标准输出。
+
+        Args:
+            code (str): 要执行的 Python 代码。
+            timeout (float, optional): 本次执行的墙钟时间上限（秒），默认使用 `self.timeout`。
+            on_output (callable, optional): 每收到一段输出时调用的回调。
+
+        Returns:
+            str: 代码产生的标准输出。
+
+        Raises:
+            PythonWorkerError: 代码抛出异常、超时或工作进程崩溃时。
+        """
+        timeout = self.timeout if timeout is None else timeout
+
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._kill()
+                self._start()
+
+            try:
+                self._commands.write(json.dumps({"code": code}) + "\n")
+                self._commands.flush()
+            except OSError:
+                self._kill()
+                raise PythonWorkerError("Python 工作进程已退出，将在下次执行时重启。")
+
+            output = []
+            start = time.monotonic()
+            while True:
+                remaining = max(timeout - (time.monotonic() - start), 0) if timeout else None
+                try:
+                    message = self._results.get(timeout=remaining)
+                except queue.Empty:
+                    self._kill()
+                    raise PythonWorkerError(
+                        f"执行超时（{timeout} 秒），工作进程已被终止。\n输出:\n{''.join(output)}"
+                    ) from None
+
+                if message is None:
+                    self._kill()
+                    raise PythonWorkerError(
+                        f"Python 工作进程崩溃（可能超出了 {self.memory_mb}MB 内存限制），将在下次执行时重启。"
+                        f"\n输出:\n{''.join(output)}"
+                    )
+
+                if "out" in message:
+                    output.append(message["out"])
+                    if on_output is not None:
+                        on_output(message["out"])
+                    continue
+
+                if message.get("error"):
+                    raise PythonWorkerError(f"{message['error']}\n输出:\n{''.join(output)}")
+                return "".join(output)
+
+
+class _OutputStream(io.TextIOBase):
+    """
+    工作进程中替代 `sys.stdout` 的流，按行把输出发回父进程。
+
+    它是一个不连接终端、没有文件描述符的文本流，探测 `isatty()` 或 `encoding` 的库会按普通管道处理它。
+    """
+
+    def __init__(self, send):
+        super().__init__()
+        self._send = send
+        self._buffer = []
+        self._size = 0
+        self.buffer = _OutputBuffer(self)
+
+    @property
+    def encoding(self):
+        return "utf-8"
+
+    @property
+    def errors(self):
+        return "strict"
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        return False
+
+    def write(self, text):
+        if not isinstance(text, str):
+            raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+        self._buffer.append(text)
+        self._size += len(text)
+        if "\n" in text or self._size >= 4096:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self._buffer:
+            self._send({"out": "".join(self._buffer)})
+            self._buffer = []
+            self._size = 0
+
+
+class _OutputBuffer(io.RawIOBase):
+    """
+    `_OutputStream.buffer`：把写入的字节按 UTF-8 解码后交给文本流。
+    """
+
+    def __init__(self, text):
+        super().__init__()
+        self._text = text
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._text.write(self._decoder.decode(data))
+        return len(data)
+
+    def flush(self):
+        self._text.flush()
+
+
+def _format_error(exc: BaseException) -> str:
+    """
+    格式化代码抛出的异常，去掉工作进程自身的栈帧，只保留代码片段中的栈帧。
+
+    Args:
+        exc (BaseException): 代码抛出的异常。
+
+    Returns:
+        str: 格式化后的回溯信息。
+    """
+    tb = exc.__traceback__
+    while tb is not None and tb.tb_frame.f_code.co_filename == __file__:
+        tb = tb.tb_next
+    return "".join(traceback.format_exception(type(exc), exc, tb))
+
+
+def serve(command_fd: int, result_fd: int, memory_mb: int):
+    """
+    工作进程的主循环：逐行读取代码，在持久的命名空间中执行，并把输出和结果发回。
+
+    Args:
+        command_fd (int): 命令管道的文件描述符。
+        result_fd (int): 结果管道的文件描述符。
+        memory_mb (int): 地址空间上限（MB）；为 0 时不限制。
+    """
+    if memory_mb:
+        try:
+            import resource  # pylint: disable=import-outside-toplevel
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+
+    results = os.fdopen(result_fd, "w", encoding="utf-8")
+
+    def send(message):
+        results.write(json.dumps(message) + "\n")
+        results.flush()
+
+    namespace = {"__name__": "__main__"}
+    stdout = _OutputStream(send)
+    with os.fdopen(command_fd, "r", encoding="utf-8") as commands:
+        for line in commands:
+            code = json.loads(line)["code"]
+            error = None
+            sys.stdout = stdout
+            try:
+                exec(code, namespace)  # pylint: disable=exec-used
+            except BaseException as exc:  # pylint: disable=broad-exception-caught
+                error = _format_error(exc)
+            finally:
+                stdout.flush()
+                sys.stdout = sys.__stdout__
+            send({"error": error})
+
+
+if __name__ == "__main__":
+    serve(int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3]))
@@ -0,0 +1,89 @@
+"""
+这个模块提供了 `RateLimiter` 类，一个线程安全的令牌桶限速器，用于在多个线程之间共享 LLM 请求速率，
+以及 `RateLimitedLLM`，在每次 LLM 请求前从共享的限速器获取令牌。
+"""
+
+import time
+import threading
+
+from streaming import stream_predict
+from function_calling import call_function
+
+
+class RateLimiter:
+    """
+    线程安全的令牌桶限速器。
+
+    Attributes:
+        rate (float): 每秒补充的令牌数。
+        burst (int): 令牌桶的容量，即允许的突发请求数。
+    """
+
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        """
+        构造一个 `RateLimiter` 实例。
+
+        Args:
+            requests_per_minute (float): 每分钟允许的请求数。
+            burst (int, optional): 允许的突发请求数。
+        """
+        self.rate = requests_per_minute / 60.0
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        阻塞直到获得一个令牌。
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimitedLLM:
+    """
+    包装 `ThinkGPT` 或替身，在每次预测、函数调用和摘要请求前从限速器获取令牌。
+
+    Attributes:
+        llm: 被包装的 `ThinkGPT` 实例或替身。
+        rate_limiter (RateLimiter): 共享的限速器。
+    """
+
+    def __init__(self, llm, rate_limiter: RateLimiter):
+        """
+        构造一个 `RateLimitedLLM` 实例。
+
+        Args:
+            llm: 被包装的 `ThinkGPT` 实例或替身。
+            rate_limiter (RateLimiter): 共享的限速器。
+        """
+        self.llm = llm
+        self.rate_limiter = rate_limiter
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def predict(self, prompt: str, **kwargs) -> str:
+        self.rate_limiter.acquire()
+        return self.llm.predict(prompt=prompt, **kwargs)
+
+    def stream(self, prompt: str):
+        self.rate_limiter.acquire()
+        yield from stream_predict(self.llm, prompt)
+
+    def call_function(self, prompt: str) -> dict:
+        self.rate_limiter.acquire()
+        return call_function(self.llm, prompt)
+
+    def summarize(self, content: str, max_tokens: int = 4096, instruction_hint: str = "") -> str:
+        self.rate_limiter.acquire()
+        return self.llm.summarize(content, max_tokens, instruction_hint=instruction_hint)
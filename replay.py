@@ -0,0 +1,264 @@
+"""
+这个模块提供了可以替代 `ThinkGPT` 的离线 LLM 后端：`ReplayLLM` 按顺序回放录制或脚本化的响应，
+`RecordingLLM` 包装真实的 `ThinkGPT` 并把响应录制到 JSONL 文件中。
+"""
+
+import json
+import time
+import threading
+
+from exceptions import ReplayExhaustedError
+from streaming import stream_predict
+from function_calling import call_function, message_from_text
+
+
+class ReplayLLM:
+    """
+    回放录制或脚本化响应的 LLM 替身，实现 `MiniAGI` 用到的 `ThinkGPT` 接口。
+
+    Attributes:
+        model_name (str): 模型名称，用于选择分词器。
+        latency (float): 每次调用的模拟延迟（秒）。
+        calls (dict): 每种调用已消耗的响应数量。
+        memory (list): 按加入顺序排列的记忆项。
+    """
+
+    def __init__(self, responses: dict = None, model_name: str = "gpt-4", latency: float = 0.0):
+        """
+        构造一个 `ReplayLLM` 实例。
+
+        Args:
+            responses (dict, optional): 调用类型（"predict"、"call_function"、"summarize"、"chunked_summarize"）到响应列表的映射。
+            model_name (str, optional): 模型名称。
+            latency (float, optional): 每次调用的模拟延迟（秒）。
+        """
+        self.model_name = model_name
+        self.latency = latency
+        self._responses = {kind: list(items) for kind, items in (responses or {}).items()}
+        self.memory = []
+        self._lock = threading.Lock()
+        self.calls = {}
+
+    @classmethod
+    def from_recording(cls, path: str, role: str, **kwargs):
+        """
+        从 `RecordingLLM` 写入的 JSONL 文件中加载某个角色的响应。
+
+        Args:
+            path (str): 录制文件路径。
+            role (str): 要加载的角色，例如 "agent" 或 "summarizer"。
+
+        Returns:
+            ReplayLLM: 按录制顺序回放响应的实例。
+        """
+        responses = {}
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record["role"] == role:
+                    responses.setdefault(record["kind"], []).append(record["response"])
+
+        return cls(responses, **kwargs)
+
+    def _next(self, kind: str, delay: bool = True):
+        """
+        取出某种调用的下一个响应，并模拟延迟。
+
+        Args:
+            kind (str): 调用类型。
+            delay (bool, optional): 是否在返回前模拟延迟。
+
+        Returns:
+            str: 下一个响应；如果没有剩余响应则为 None。
+        """
+        if delay and self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+            queue = self._responses.get(kind)
+            if not queue:
+                return None
+            return queue.pop(0)
+
+    def predict(self, prompt: str, **kwargs) -> str:  # pylint: disable=unused-argument
+        """
+        返回下一个录制的预测响应。
+
+        Args:
+            prompt (str): 提示（被忽略）。
+
+        Returns:
+            str: 录制的响应。
+        """
+        response = self._next("predict")
+        if response is None:
+            raise ReplayExhaustedError("predict")
+        return response
+
+    def stream(self, prompt: str, chunk_size: int = 16):  # pylint: disable=unused-argument
+        """
+        以流式方式返回下一个录制的预测响应，模拟延迟平均分摊到各个片段上。
+
+        Args:
+            prompt (str): 提示（被忽略）。
+            chunk_size (int, optional): 每个片段的字符数。
+
+        Yields:
+            str: 响应文本的增量片段。
+        """
+        response = self._next("predict", delay=False)
+        if response is None:
+            raise ReplayExhaustedError("predict")
+
+        chunks = [response[i:i + chunk_size] for i in range(0, len(response), chunk_size)]
+        for chunk in chunks:
+            if self.latency:
+                time.sleep(self.latency / len(chunks))
+            yield chunk
+
+    def call_function(self, prompt: str) -> dict:  # pylint: disable=unused-argument
+        """
+        返回下一个录制的函数调用消息；没有录制时把下一个预测响应转换为函数调用。
+
+        Args:
+            prompt (str): 提示（被忽略）。
+
+        Returns:
+            dict: 函数调用消息。
+        """
+        if self._responses.get("call_function"):
+            return self._next("call_function")
+        response = self._next("predict")
+        if response is None:
+            raise ReplayExhaustedError("call_function")
+        return message_from_text(response)
+
+    def summarize(self, content: str, max_tokens: int = 4096, instruction_hint: str = "") -> str:  # pylint: disable=unused-argument
+        """
+        返回下一个录制的摘要；没有录制时截取内容的前 `max_tokens` 个词。
+
+        Args:
+            content (str): 要摘要的内容。
+            max_tokens (int, optional): 摘要的最大大小。
+            instruction_hint (str, optional): 摘要提示（被忽略）。
+
+        Returns:
+            str: 摘要。
+        """
+        response = self._next("summarize")
+        if response is None:
+            return " ".join(content.split()[:max_tokens])
+        return response
+
+    def chunked_summarize(self, content: str, max_tokens: int = 4096, instruction_hint: str = "") -> str:
+        """
+        返回下一个录制的分块摘要；没有录制时退回到 `summarize`。
+
+        Args:
+            content (str): 要摘要的内容。
+            max_tokens (int, optional): 摘要的最大大小。
+            instruction_hint (str, optional): 摘要提示。
+
+        Returns:
+            str: 摘要。
+        """
+        response = self._next("chunked_summarize")
+        if response is None:
+            return self.summarize(content, max_tokens, instruction_hint)
+        return response
+
+    def memorize(self, concept: str):
+        """
+        把记忆项追加到记忆中。
+
+        Args:
+            concept (str): 记忆项。
+        """
+        self.memory.append(concept)
+
+    def remember(self, concept: str = None, limit: int = 5, sort_by_order: bool = False,  # pylint: disable=unused-argument
+                 max_tokens: int = None) -> list:  # pylint: disable=unused-argument
+        """
+        与 `ThinkGPT.remember` 在不带概念时的行为一致，返回最近的 `limit` 个记忆项。
+
+        Args:
+            concept (str, optional): 查询概念（被忽略）。
+            limit (int, optional): 返回的最大记忆项数。
+
+        Returns:
+            list: 最近的记忆项，按时间顺序排列。
+        """
+        return self.memory[-limit:]
+
+
+class RecordingLLM:
+    """
+    包装真实的 `ThinkGPT`，把预测、函数调用和摘要的响应录制到 JSONL 文件中，供 `ReplayLLM` 回放。
+
+    Attributes:
+        llm: 被包装的 `ThinkGPT` 实例。
+        path (str): 录制文件路径。
+        role (str): 写入每条记录的角色名称。
+    """
+
+    _write_lock = threading.Lock()
+
+    def __init__(self, llm, path: str, role: str):
+        """
+        构造一个 `RecordingLLM` 实例。
+
+        Args:
+            llm: 被包装的 `ThinkGPT` 实例。
+            path (str): 录制文件路径。
+            role (str): 角色名称，例如 "agent" 或 "summarizer"。
+        """
+        self.llm = llm
+        self.path = path
+        self.role = role
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def _record(self, kind: str, response: str) -> str:
+        """
+        把一条响应追加到录制文件。
+
+        Args:
+            kind (str): 调用类型。
+            response (str): 响应。
+
+        Returns:
+            str: 原样返回响应。
+        """
+        record = {"role": self.role, "kind": kind, "response": response}
+        with self._write_lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return response
+
+    def predict(self, prompt: str, **kwargs) -> str:
+        return self._record("predict", self.llm.predict(prompt=prompt, **kwargs))
+
+    def stream(self, prompt: str):
+        chunks = []
+        try:
+            for chunk in stream_predict(self.llm, prompt):
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            # 提前停止的流只录制已经收到的部分，回放时同样会在此处停止。
+            self._record("predict", "".join(chunks))
+
+    def call_function(self, prompt: str) -> dict:
+        return self._record("call_function", call_function(self.llm, prompt))
+
+    def summarize(self, content: str, max_tokens: int = 4096, instruction_hint: str = "") -> str:
+        return self._record("summarize", self.llm.summarize(content, max_tokens, instruction_hint=instruction_hint))
+
+    def chunked_summarize(self, content: str, max_tokens: int = 4096, instruction_hint: str = "") -> str:
+        return self._record(
+            "chunked_summarize",
+            self.llm.chunked_summarize(content, max_tokens, instruction_hint=instruction_hint)
+        )
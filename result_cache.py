@@ -0,0 +1,199 @@
+"""
+这个模块提供了 `ResultCache` 类，缓存幂等命令的观察结果，使代理重复执行同一个命令时
+不再重新执行命令和摘要观察结果。
+
+哪些命令可以缓存由 `ResultCache.key` 中的规则决定：
+
+- execute_shell：只缓存由只读命令（`READ_ONLY_SHELL_COMMANDS`）组成的管道，
+  不能包含重定向、命令替换、多条命令或通配符，也不能递归遍历目录；
+  键中包含工作目录和参数中所有已存在路径的修改时间和大小。
+- ingest_data、process_data：本地文件按修改时间和大小作为键；URL 的结果在 `url_ttl` 秒内有效。
+- memorize_thoughts、execute_python、talk_to_user 等其他命令：不缓存。
+"""
+
+import os
+import time
+import shlex
+from collections import OrderedDict
+
+# 输出只取决于参数和所涉及文件内容的只读 shell 命令。
+# 递归遍历目录的命令（find、du 等）不在其中，因为子目录的变化不会改变顶层目录的修改时间。
+READ_ONLY_SHELL_COMMANDS = (
+    "ls", "cat", "head", "tail", "wc", "stat", "file", "pwd", "grep", "cut", "md5sum", "sha256sum"
+)
+
+# 出于同样的原因，这些命令带上递归选项时不缓存：命令到（短选项字母, 长选项）的映射。
+RECURSIVE_OPTIONS = {
+    "grep": ("rR", ("--recursive", "--dereference-recursive")),
+    "ls": ("R", ("--recursive",)),
+}
+
+# 出现这些字符时不缓存 shell 命令：重定向、后台执行、多条命令和命令替换，
+# 以及通配符（匹配到的文件不会出现在键中，只有字面路径会被记录）。
+UNSAFE_SHELL_CHARACTERS = (">", "<", "&", ";", "`", "$(", "\n", "*", "?", "[")
+
+
+class ResultCache:
+    """
+    幂等命令观察结果的内存缓存，按最近最少使用的顺序淘汰。
+
+    Attributes:
+        max_entries (int): 最大条目数。
+        url_ttl (float): URL 来源的结果的有效期（秒）。
+        hits (int): 命中次数。
+        misses (int): 未命中次数。
+    """
+
+    def __init__(self, max_entries: int = 256, url_ttl: float = 3600):
+        """
+        构造一个 `ResultCache` 实例。
+
+        Args:
+            max_entries (int, optional): 最大条目数。
+            url_ttl (float, optional): URL 来源的结果的有效期（秒）。
+        """
+        self.max_entries = max_entries
+        self.url_ttl = url_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def is_cacheable_result(observation: str) -> bool:
+        """
+        判断观察结果是否可以缓存。错误和超时的结果可能是暂时的，不缓存。
+
+        Args:
+            observation (str): 命令返回的观察结果。
+
+        Returns:
+            bool: 是否可以缓存。
+        """
+        return not (observation.startswith("Error:") or observation.startswith("命令返回错误")
+                    or ", TIMED OUT after " in observation)
+
+    @staticmethod
+    def _fingerprint(path: str):
+        """
+        返回路径的修改时间和大小；路径不存在时返回 None。
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (path, stat.st_mtime_ns, stat.st_size)
+
+    def _shell_key(self, arg: str, work_dir: str):
+        """
+        为只读的 shell 命令构造键。
+
+        Args:
+            arg (str): shell 命令。
+            work_dir (str): 命令的工作目录。
+
+        Returns:
+            tuple: 缓存键；命令不可缓存时为 None。
+        """
+        if any(character in arg for character in UNSAFE_SHELL_CHARACTERS):
+            return None
+
+        fingerprints = [self._fingerprint(work_dir)]
+        for segment in arg.split("|"):
+            try:
+                words = shlex.split(segment)
+            except ValueError:
+                return None
+            if not words or words[0] not in READ_ONLY_SHELL_COMMANDS:
+                return None
+            if words[0] in RECURSIVE_OPTIONS:
+                (letters, long_options) = RECURSIVE_OPTIONS[words[0]]
+                if any(word.startswith("-") and not word.startswith("--") and any(c in word for c in letters)
+                       or word in long_options for word in words[1:]):
+                    return None
+            for word in words[1:]:
+                if not word.startswith("-"):
+                    fingerprints.append(self._fingerprint(os.path.join(work_dir, os.path.expanduser(word))))
+
+        return ("execute_shell", arg, tuple(fingerprints))
+
+    def _source_key(self, command: str, arg: str, source: str, work_dir: str):
+        """
+        为读取来源的命令构造键。
+
+        Args:
+            command (str): 命令。
+            arg (str): 命令的参数。
+            source (str): URL 或文件名。
+            work_dir (str): 相对路径的基准目录。
+
+        Returns:
+            tuple: 缓存键；来源不存在时为 None。
+        """
+        source = source.strip()
+        if source.startswith("http://") or source.startswith("https://"):
+            return (command, arg, None)
+        fingerprint = self._fingerprint(os.path.join(work_dir, os.path.expanduser(source)))
+        if fingerprint is None:
+            return None
+        return (command, arg, fingerprint)
+
+    def key(self, command: str, arg: str, work_dir: str = None):
+        """
+        按缓存规则为命令构造键。
+
+        Args:
+            command (str): 命令。
+            arg (str): 命令的参数。
+            work_dir (str, optional): 命令的工作目录；为 None 时使用当前工作目录。
+
+        Returns:
+            tuple: 缓存键；命令不可缓存时为 None。
+        """
+        work_dir = work_dir or os.getcwd()
+        if command == "execute_shell":
+            return self._shell_key(arg, work_dir)
+        if command == "ingest_data":
+            return self._source_key(command, arg, arg, work_dir)
+        if command == "process_data":
+            args = arg.split("|")
+            if len(args) != 2:
+                return None
+            return self._source_key(command, arg, args[1], work_dir)
+        return None
+
+    def get(self, key):
+        """
+        读取缓存的观察结果。
+
+        Args:
+            key (tuple): `key` 返回的缓存键；为 None 时视为未命中。
+
+        Returns:
+            str: 缓存的观察结果；未命中或已过期时为 None。
+        """
+        if key is None:
+            return None
+        entry = self._entries.get(key)
+        if entry is None or (entry[1] is not None and entry[1] < time.monotonic()):
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, observation: str):
+        """
+        写入观察结果。URL 来源的结果在 `url_ttl` 秒后过期。
+
+        Args:
+            key (tuple): `key` 返回的缓存键；为 None 时不写入。
+            observation (str): 观察结果（已摘要）。
+        """
+        if key is None:
+            return
+        expires = time.monotonic() + self.url_ttl if key[0] != "execute_shell" and key[2] is None else None
+        self._entries[key] = (observation, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
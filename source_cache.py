@@ -0,0 +1,254 @@
+"""
+这个模块提供了 `SourceCache` 类，一个持久化的、按内容寻址的磁盘缓存，
+用于保存从 URL 或本地文件中提取的文本，避免重复的网络请求和 HTML 解析。
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+
+class SourceCache:
+    """
+    URL 和文件提取文本的磁盘缓存。
+
+    URL 按地址作为键，本地文件按路径、修改时间和大小作为键；提取的文本按内容的 SHA-256 存储，
+    相同的内容只保存一份。过期的 URL 条目会带上 ETag/Last-Modified 重新验证，
+    总大小超出上限时按最近最少使用的顺序淘汰。
+
+    命中只在内存中更新访问时间；索引文件在写入或淘汰条目时保存，其余的访问时间由 `flush` 写回。
+
+    Attributes:
+        directory (str): 缓存目录。
+        max_bytes (int): 缓存文本的总大小上限（字节）。
+        ttl (float): URL 条目在无需重新验证时的默认有效期（秒）。
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024, ttl: float = 3600):
+        """
+        构造一个 `SourceCache` 实例。
+
+        Args:
+            directory (str): 缓存目录，不存在时会被创建。
+            max_bytes (int, optional): 缓存文本的总大小上限（字节）。
+            ttl (float, optional): URL 条目的默认有效期（秒）。
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self) -> dict:
+        """
+        读取索引文件；文件不存在或损坏时返回空索引。
+
+        Returns:
+            dict: 缓存键到条目的映射。
+        """
+        try:
+            with open(os.path.join(self.directory, self.INDEX_FILE), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        """
+        以原子方式写入索引文件。调用方必须持有 `_lock`。
+        """
+        path = os.path.join(self.directory, self.INDEX_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self._index, file)
+        os.replace(tmp_path, path)
+        self._dirty = False
+
+    def flush(self):
+        """
+        把只在内存中更新的访问时间写回索引文件。
+        """
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", f"{digest}.txt")
+
+    def _read(self, key: str):
+        """
+        读取条目对应的文本，并在内存中更新其访问时间。文本在锁外读取，命中之间不会互相等待。
+
+        Args:
+            key (str): 缓存键。
+
+        Returns:
+            str: 缓存的文本；条目或文本不存在时为 None。
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            digest = entry["digest"]
+
+        try:
+            with open(self._blob_path(digest), "r", encoding="utf-8") as file:
+                text = file.read()
+        except OSError:
+            with self._lock:
+                if self._index.get(key, {}).get("digest") == digest:
+                    del self._index[key]
+                    self._dirty = True
+            return None
+
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is not None:
+                entry["accessed_at"] = time.time()
+                self._dirty = True
+        return text
+
+    def _write(self, key: str, text: str, **meta):
+        """
+        保存文本并记录条目，然后按需淘汰旧条目。
+
+        Args:
+            key (str): 缓存键。
+            text (str): 提取的文本。
+            **meta: 条目的其他元数据，例如 etag、last_modified、expires_at。
+        """
+        data = text.encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            blob_path = self._blob_path(digest)
+            if not os.path.exists(blob_path):
+                tmp_path = f"{blob_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as file:
+                    file.write(data)
+                os.replace(tmp_path, blob_path)
+
+            now = time.time()
+            self._index[key] = {"digest": digest, "size": len(data), "accessed_at": now, "fetched_at": now, **meta}
+            self._evict()
+            self._save_index()
+
+    def _evict(self):
+        """
+        按最近最少使用的顺序淘汰条目，直到总大小不超过上限。调用方必须持有 `_lock`。
+        """
+        sizes = {entry["digest"]: entry["size"] for entry in self._index.values()}
+        total = sum(sizes.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]["accessed_at"]):
+            if total <= self.max_bytes:
+                break
+            digest = self._index.pop(key)["digest"]
+            if all(entry["digest"] != digest for entry in self._index.values()):
+                total -= sizes[digest]
+                try:
+                    os.remove(self._blob_path(digest))
+                except OSError:
+                    pass
+
+    def get_file(self, path: str, extract) -> str:
+        """
+        返回本地文件的提取文本。文件的路径、修改时间或大小变化后会重新读取。
+
+        Args:
+            path (str): 文件路径。
+            extract (callable): 在未命中时读取并提取文件文本的函数，参数为路径。
+
+        Returns:
+            str: 提取的文本。
+        """
+        stat = os.stat(path)
+        key = f"file:{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+        text = self._read(key)
+        if text is None:
+            text = extract(path)
+            self._write(key, text)
+        return text
+
+    def get_url(self, url: str, extract) -> str:
+        """
+        返回 URL 的提取文本。有效期内直接读取缓存；过期后带上 ETag/Last-Modified 重新验证，
+        服务器返回 304 时沿用缓存的文本。
+
+        Args:
+            url (str): URL。
+            extract (callable): 从响应中提取文本的函数，参数为 `urlopen` 返回的响应对象。
+
+        Returns:
+            str: 提取的文本。
+        """
+        key = f"url:{url}"
+        with self._lock:
+            entry = dict(self._index.get(key) or {})
+
+        if entry and entry.get("expires_at", 0) > time.time():
+            text = self._read(key)
+            if text is not None:
+                return text
+
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            with urlopen(Request(url, headers=headers)) as response:
+                text = extract(response)
+                response_headers = response.headers
+        except HTTPError as e:
+            if e.code != 304 or not entry:
+                raise
+            text = self._read(key)
+            if text is None:
+                # 缓存的文本已经丢失，无条件地重新获取。
+                with self._lock:
+                    if self._index.pop(key, None) is not None:
+                        self._dirty = True
+                return self.get_url(url, extract)
+            with self._lock:
+                if key in self._index:
+                    self._index[key]["expires_at"] = time.time() + self._max_age(e.headers)
+                    self._save_index()
+            return text
+
+        cache_control = response_headers.get("Cache-Control", "")
+        if "no-store" not in cache_control:
+            self._write(
+                key, text,
+                etag=response_headers.get("ETag"),
+                last_modified=response_headers.get("Last-Modified"),
+                expires_at=time.time() + self._max_age(response_headers),
+            )
+        return text
+
+    def _max_age(self, headers) -> float:
+        """
+        根据 Cache-Control 头计算有效期，没有 max-age 时使用默认值。
+
+        Args:
+            headers: 响应头。
+
+        Returns:
+            float: 有效期（秒）。
+        """
+        cache_control = headers.get("Cache-Control", "") if headers is not None else ""
+        if "no-cache" in cache_control:
+            return 0
+        match = re.search(r"max-age=(\d+)", cache_control)
+        return float(match[1]) if match else self.ttl
@@ -0,0 +1,147 @@
+"""
+这个模块提供了流式预测和动作解析：`stream_predict` 逐段产出 LLM 的响应文本，
+`ActionStreamParser` 在文本到达时增量解析 `<r>…</r><c>…</c>` 动作，并在动作完整后提示停止生成。
+"""
+
+import os
+
+
+def stream_predict(llm, prompt: str):
+    """
+    以流式方式获取 LLM 对提示的响应。
+
+    如果后端自己实现了 `stream`（例如 `replay.ReplayLLM`），则使用它；否则直接调用 OpenAI 的流式接口。
+    关闭返回的生成器会关闭底层连接，从而停止生成。
+
+    Args:
+        llm: `ThinkGPT` 实例或实现了 `stream` 的后端。
+        prompt (str): 提示。
+
+    Yields:
+        str: 响应文本的增量片段。
+    """
+    if hasattr(type(llm), "stream"):
+        yield from llm.stream(prompt)
+        return
+
+    import openai  # pylint: disable=import-outside-toplevel
+
+    response = openai.ChatCompletion.create(
+        model=llm.model_name,
+        messages=[{"role": "user", "content": prompt}],
+        stream=True,
+        request_timeout=getattr(llm, "request_timeout", None),
+        api_key=os.environ.get("OPENAI_API_KEY"),
+    )
+    try:
+        for chunk in response:
+            delta = chunk["choices"][0]["delta"].get("content")
+            if delta:
+                yield delta
+    finally:
+        close = getattr(response, "close", None)
+        if close is not None:
+            close()
+
+
+class ActionStreamParser:
+    """
+    增量解析 `<r>[REASONING]</r><c>[COMMAND]</c>\\n[ARGUMENT]` 格式的动作。
+
+    Attributes:
+        thought (str): 已解析的推理；在 `</r>` 到达前为 None。
+        command (str): 已解析的命令；在 `</c>` 到达前为 None。
+        complete (bool): 动作是否已经完整，可以停止生成。
+    """
+
+    # 这些命令的参数无关紧要，一旦命令完整即可停止生成。
+    NO_ARG_COMMANDS = ("done",)
+
+    def __init__(self):
+        self.buffer = ""
+        self.thought = None
+        self.command = None
+        self.complete = False
+        self._command_start = None
+        self._arg_start = None
+        self._arg_end = None
+        self._arg_line_sent = False
+
+    def feed(self, text: str) -> list:
+        """
+        追加一段响应文本并推进解析。
+
+        Args:
+            text (str): 响应文本的增量片段。
+
+        Returns:
+            list: 本次新产生的事件，元素为 ("thought", 推理)、("command", 命令)
+                或 ("arg_line", 参数的第一行)。参数的第一行在其后的换行到达或动作完整时产生。
+        """
+        if self.complete:
+            return []
+
+        self.buffer += text
+        events = []
+
+        if self.thought is None:
+            start = self._find_line_start("<r>", 0)
+            end = self.buffer.find("</r><c>", start + 3) if start >= 0 else -1
+            if end < 0:
+                return events
+            self.thought = self.buffer[start + 3:end]
+            self._command_start = end + len("</r><c>")
+            events.append(("thought", self.thought))
+
+        if self.command is None:
+            end = self.buffer.find("</c>", self._command_start)
+            if end < 0:
+                return events
+            self.command = self.buffer[self._command_start:end]
+            self._arg_start = end + len("</c>")
+            events.append(("command", self.command))
+            if self.command in self.NO_ARG_COMMANDS:
+                self.complete = True
+                self._arg_end = self._arg_start
+                return events
+
+        # 第二个动作开始时，当前动作的参数已经完整。
+        second_action = self.buffer.find("\n<r>", self._arg_start)
+        if second_action >= 0:
+            self._arg_end = second_action
+            self.complete = True
+
+        if not self._arg_line_sent:
+            arg = self.arg
+            newline = arg.find("\n")
+            if newline > 0 or (self.complete and arg):
+                self._arg_line_sent = True
+                events.append(("arg_line", arg[:newline] if newline > 0 else arg))
+
+        return events
+
+    def _find_line_start(self, tag: str, start: int) -> int:
+        """
+        查找位于行首的标签，与 `re.MULTILINE` 下的 `^` 一致。
+
+        Args:
+            tag (str): 要查找的标签。
+            start (int): 开始查找的位置。
+
+        Returns:
+            int: 标签的位置；未找到时为 -1。
+        """
+        index = self.buffer.find(tag, start)
+        while index > 0 and self.buffer[index - 1] != "\n":
+            index = self.buffer.find(tag, index + 1)
+        return index
+
+    @property
+    def arg(self) -> str:
+        """
+        当前已解析的参数；在命令完整前为 None。
+        """
+        if self._arg_start is None:
+            return None
+        end = self._arg_end if self._arg_end is not None else len(self.buffer)
+        return self.buffer[self._arg_start:end].lstrip("\n")
@@ -0,0 +1,52 @@
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class StandInServer:
+    """
+    A local HTTP server whose responses are scripted per path. Each route is a list of
+    (status, headers, body) tuples served in order; the last one repeats. Every request is
+    recorded as (method, path, headers).
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def respond(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                server.requests.append((self.command, self.path, dict(self.headers)))
+                responses = server.routes.get(self.path) or [(404, {}, b"")]
+                count = sum(1 for (_, path, _) in server.requests if path == self.path)
+                (status, headers, body) = responses[min(count, len(responses)) - 1]
+                if callable(body):
+                    body = body()
+                self.send_response(status)
+                for (name, value) in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = respond
+            do_POST = respond
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def hits(self, path):
+        return [request for request in self.requests if request[1] == path]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,71 @@
+import re
+import json
+
+import pytest
+
+import main
+from replay import ReplayLLM
+from tracing import Tracer
+
+
+class WordEncoding:
+    # Counts words and punctuation, so the tests need no tiktoken download.
+    def encode(self, text, **kwargs):
+        return re.findall(r"\w+|[^\w\s]", text)
+
+
+class FailingSummarizer(ReplayLLM):
+    def __init__(self):
+        super().__init__({}, model_name="gpt-3.5-turbo")
+        self.failing = True
+
+    def summarize(self, content, max_tokens, instruction_hint=None):
+        if self.failing:
+            raise RuntimeError("summarizer unavailable")
+        return "summary"
+
+
+@pytest.fixture
+def miniagi(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "encoding_for_model", lambda model: WordEncoding())
+    agent = main.MiniAGI(
+        "gpt-4", "gpt-3.5-turbo", "objective", 4000, 200,
+        background_summary=True,
+        agent=ReplayLLM({}, model_name="gpt-4"),
+        summarizer=FailingSummarizer(),
+        tracer=Tracer(str(tmp_path / "trace.jsonl"))
+    )
+    yield agent
+    agent.close()
+    agent.tracer.close()
+
+
+def remember(miniagi, count):
+    miniagi.proposed_command = "memorize_thoughts"
+    for i in range(count):
+        miniagi.proposed_arg = f"thought number {i} " * 10
+        miniagi.user_response("ok")
+
+
+def test_flush_summary_reraises_background_roll_error(miniagi, tmp_path):
+    remember(miniagi, 30)
+
+    with pytest.raises(RuntimeError, match="summarizer unavailable"):
+        miniagi.flush_summary()
+
+    # The error is reported once; the memories stay in the history for the next roll.
+    miniagi.flush_summary()
+    with open(tmp_path / "trace.jsonl", encoding="utf-8") as file:
+        rolls = [json.loads(line) for line in file if '"summary.roll"' in line]
+    assert any(record["name"] == "summary.roll" and record.get("error") == "RuntimeError" for record in rolls)
+
+
+def test_successful_roll_clears_earlier_error(miniagi):
+    remember(miniagi, 30)
+    miniagi.summarizer.failing = False
+    remember(miniagi, 1)
+
+    miniagi.flush_summary()
+
+    assert miniagi.summary_error is None
+    assert "summary" in miniagi.summarized_history
@@ -0,0 +1,44 @@
+import os
+import json
+
+import pytest
+
+from fleet import Fleet, read_objectives
+
+
+def write_objectives(path, items):
+    path.write_text("".join(json.dumps(item) + "\n" for item in items), encoding="utf-8")
+    return str(path)
+
+
+def test_ids_default_to_line_numbers(tmp_path):
+    path = write_objectives(tmp_path / "objectives.jsonl", [{"objective": "a"}, {"objective": "b", "id": "x"}])
+
+    assert read_objectives(path) == [{"id": "1", "objective": "a"}, {"id": "x", "objective": "b"}]
+
+
+@pytest.mark.parametrize("item_id", ["../escape", "a/b", "a\\b", "..", ".", "", "/tmp/abs", "C:x"])
+def test_rejects_ids_that_are_not_directory_names(tmp_path, item_id):
+    path = write_objectives(tmp_path / "objectives.jsonl", [{"objective": "a", "id": item_id}])
+
+    with pytest.raises(ValueError):
+        read_objectives(path)
+
+
+def test_rejects_duplicate_ids(tmp_path):
+    path = write_objectives(tmp_path / "objectives.jsonl", [{"objective": "a"}, {"objective": "b", "id": 1}])
+
+    with pytest.raises(ValueError, match="重复"):
+        read_objectives(path)
+
+
+def test_run_checks_ids_before_starting(tmp_path):
+    work_root = tmp_path / "work"
+    fleet = Fleet(str(work_root), workers=1)
+
+    with pytest.raises(ValueError):
+        fleet.run([{"id": "ok", "objective": "a"}, {"id": "../escape", "objective": "b"}],
+                  str(tmp_path / "results.jsonl"))
+
+    assert not os.path.exists(work_root)
+    assert not os.path.exists(tmp_path / "escape")
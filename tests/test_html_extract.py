@@ -0,0 +1,43 @@
+import io
+from urllib.request import urlopen
+
+import pytest
+
+from html_extract import extract_text
+from stand_in_server import StandInServer
+
+
+@pytest.fixture
+def server():
+    server = StandInServer()
+    yield server
+    server.close()
+
+
+def test_reports_bytes_read_from_response(server):
+    body = b"<html><head><script>var x = 1;</script></head><body><p>Hello</p><p>world</p></body></html>"
+    server.routes["/page"] = [(200, {"Content-Type": "text/html; charset=utf-8"}, body)]
+
+    with urlopen(f"{server.url}/page") as response:
+        (text, bytes_read) = extract_text(response)
+
+    assert text == "Hello\nworld\n"
+    assert bytes_read == len(body)
+
+
+def test_stops_at_max_bytes():
+    body = b"<p>" + b"a" * 10000 + b"</p>"
+
+    (text, bytes_read) = extract_text(io.BytesIO(body), max_bytes=1000, chunk_size=256)
+
+    assert bytes_read == 1000
+    assert len(text) < 1000
+
+
+def test_stops_reading_once_enough_text_is_extracted():
+    body = b"".join(b"<p>paragraph %d</p>" % i for i in range(1000))
+
+    (text, bytes_read) = extract_text(io.BytesIO(body), max_tokens=50, chunk_size=64)
+
+    assert bytes_read < len(body)
+    assert text.startswith("paragraph 0\n")
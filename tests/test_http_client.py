@@ -0,0 +1,84 @@
+import time
+
+import pytest
+import requests
+
+from http_client import HttpClient
+from stand_in_server import StandInServer
+
+OK = (200, {"Content-Type": "application/json"}, b'{"ok": true}')
+
+
+@pytest.fixture
+def server():
+    server = StandInServer()
+    yield server
+    server.close()
+
+
+def test_rate_limit_honours_retry_after(server):
+    server.routes["/v1/chat"] = [
+        (429, {"Retry-After": "1"}, b'{"error": "slow down"}'),
+        (429, {"Retry-After": "1"}, b'{"error": "slow down"}'),
+        OK,
+    ]
+    client = HttpClient(backoff_factor=0.01)
+    start = time.monotonic()
+
+    response = client.session.post(f"{server.url}/v1/chat", json={})
+    assert response.status_code == 200
+    assert len(server.hits("/v1/chat")) == 3
+    # Two Retry-After waits of one second each, not the 0.01 s exponential backoff.
+    assert 1.9 <= time.monotonic() - start < 5
+
+
+def test_server_errors_are_retried(server):
+    server.routes["/v1/chat"] = [(503, {}, b""), (502, {}, b""), (500, {}, b""), OK]
+    client = HttpClient(backoff_factor=0.01)
+
+    response = client.session.post(f"{server.url}/v1/chat", json={})
+    assert response.status_code == 200
+    assert len(server.hits("/v1/chat")) == 4
+
+
+def test_retry_limit_returns_last_error(server):
+    server.routes["/v1/chat"] = [(500, {}, b'{"error": "down"}')]
+    client = HttpClient(retries=2, backoff_factor=0.01)
+
+    response = client.session.post(f"{server.url}/v1/chat", json={})
+    assert response.status_code == 500
+    assert len(server.hits("/v1/chat")) == 3
+
+
+def test_client_errors_are_not_retried(server):
+    server.routes["/v1/chat"] = [(400, {}, b'{"error": "bad request"}')]
+    client = HttpClient(backoff_factor=0.01)
+
+    assert client.session.post(f"{server.url}/v1/chat", json={}).status_code == 400
+    assert len(server.hits("/v1/chat")) == 1
+
+
+def test_expect_output_sets_read_timeout(server):
+    def slow_body():
+        time.sleep(1)
+        return b'{"ok": true}'
+    server.routes["/v1/chat"] = [(200, {}, slow_body)]
+    client = HttpClient(base_timeout=0.2, tokens_per_second=1000)
+    assert client.timeout_for(100) == (client.connect_timeout, pytest.approx(0.3))
+
+    start = time.monotonic()
+    with client.expect_output(100):
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            client.session.post(f"{server.url}/v1/chat", json={}, timeout=600)
+    assert time.monotonic() - start < 0.9
+    # Read timeouts are not retried: the server may already be generating.
+    assert len(server.hits("/v1/chat")) == 1
+
+    # Outside expect_output the caller's own timeout applies.
+    assert client.session.post(f"{server.url}/v1/chat", json={}, timeout=5).status_code == 200
+
+
+def test_timeout_is_capped():
+    client = HttpClient(base_timeout=30, tokens_per_second=10, max_timeout=120)
+    assert client.timeout_for(500) == (client.connect_timeout, 80)
+    assert client.timeout_for(100000) == (client.connect_timeout, 120)
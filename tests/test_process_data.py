@@ -0,0 +1,43 @@
+import re
+
+import pytest
+
+import main
+from replay import ReplayLLM
+
+
+class CountingEncoding:
+    # Counts words and punctuation, and records the length of every text it encodes.
+    def __init__(self):
+        self.lengths = []
+
+    def encode(self, text, **kwargs):
+        self.lengths.append(len(text))
+        return re.findall(r"\w+|[^\w\s]", text)
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_local_file_is_tokenized_once(monkeypatch, tmp_path, prefetch):
+    encoding = CountingEncoding()
+    monkeypatch.setattr(main, "encoding_for_model", lambda model: encoding)
+    text = "alpha beta gamma delta " * 300
+    (tmp_path / "data.txt").write_text(text)
+    agent = ReplayLLM(
+        {"predict": ["<r>reason</r><c>process_data</c>\nsummarize|data.txt", "processed"]},
+        model_name="gpt-4"
+    )
+    miniagi = main.MiniAGI(
+        "gpt-4", "gpt-3.5-turbo", "objective", 4000, 2000,
+        agent=agent,
+        summarizer=ReplayLLM({}, model_name="gpt-3.5-turbo"),
+        prefetch=prefetch,
+        work_dir=str(tmp_path)
+    )
+    try:
+        miniagi.think()
+        miniagi.act()
+    finally:
+        miniagi.close()
+
+    assert encoding.lengths.count(len(text)) == 1
+    assert agent.calls["predict"] == 2
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from result_cache import ResultCache
+
+
+@pytest.fixture
+def work_dir(tmp_path):
+    (tmp_path / "data.txt").write_text("a\nb\n")
+    (tmp_path / "sub").mkdir()
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize("command", [
+    "cat data.txt",
+    "ls -la sub",
+    "ls -r",
+    "grep -n a data.txt | wc -l",
+    "head -n 1 data.txt",
+])
+def test_read_only_commands_are_cached(work_dir, command):
+    assert ResultCache().key("execute_shell", command, work_dir) is not None
+
+
+@pytest.mark.parametrize("command", [
+    "ls -R",
+    "ls -laR sub",
+    "ls --recursive",
+    "grep -r a .",
+    "grep -nR a sub",
+    "grep --recursive a .",
+    "ls *.txt",
+    "cat data.tx?",
+    "cat data.[t]xt",
+    "cat data.txt > copy.txt",
+    "cat data.txt; rm data.txt",
+    "find .",
+    "rm data.txt",
+])
+def test_recursive_globbing_and_unsafe_commands_are_not_cached(work_dir, command):
+    assert ResultCache().key("execute_shell", command, work_dir) is None
+
+
+def test_key_changes_when_a_named_file_changes(work_dir):
+    cache = ResultCache()
+    key = cache.key("execute_shell", "cat data.txt", work_dir)
+    cache.put(key, "a\nb\n")
+    assert cache.get(cache.key("execute_shell", "cat data.txt", work_dir)) == "a\nb\n"
+
+    with open(os.path.join(work_dir, "data.txt"), "a", encoding="utf-8") as file:
+        file.write("c\n")
+    assert cache.get(cache.key("execute_shell", "cat data.txt", work_dir)) is None
+
+
+def test_errors_are_not_cacheable():
+    assert ResultCache.is_cacheable_result("STDOUT:\nok\nSTDERR:\n\nEXIT CODE: 0")
+    assert not ResultCache.is_cacheable_result("Error: not found")
@@ -0,0 +1,97 @@
+import os
+import json
+import time
+
+import pytest
+
+from source_cache import SourceCache
+from stand_in_server import StandInServer
+
+
+@pytest.fixture
+def server():
+    server = StandInServer()
+    yield server
+    server.close()
+
+
+def extract(response):
+    return response.read().decode("utf-8")
+
+
+def test_etag_revalidation_reuses_cached_body(server, tmp_path):
+    server.routes["/page"] = [
+        (200, {"ETag": '"v1"', "Cache-Control": "no-cache"}, b"first body"),
+        (304, {"ETag": '"v1"'}, b""),
+    ]
+    cache = SourceCache(str(tmp_path))
+
+    assert cache.get_url(f"{server.url}/page", extract) == "first body"
+    assert cache.get_url(f"{server.url}/page", extract) == "first body"
+
+    (first, second) = server.hits("/page")
+    assert "If-None-Match" not in first[2]
+    assert second[2]["If-None-Match"] == '"v1"'
+
+
+def test_max_age_serves_from_cache_without_request(server, tmp_path):
+    server.routes["/fresh"] = [(200, {"Cache-Control": "max-age=60"}, b"fresh")]
+    cache = SourceCache(str(tmp_path))
+
+    assert cache.get_url(f"{server.url}/fresh", extract) == "fresh"
+    assert cache.get_url(f"{server.url}/fresh", extract) == "fresh"
+    assert len(server.hits("/fresh")) == 1
+
+
+def test_no_store_is_never_cached(server, tmp_path):
+    server.routes["/private"] = [
+        (200, {"Cache-Control": "no-store"}, b"one"),
+        (200, {"Cache-Control": "no-store"}, b"two"),
+    ]
+    cache = SourceCache(str(tmp_path))
+
+    assert cache.get_url(f"{server.url}/private", extract) == "one"
+    assert cache.get_url(f"{server.url}/private", extract) == "two"
+    assert os.listdir(tmp_path / "blobs") == []
+
+
+def test_ttl_expiry_refetches(server, tmp_path):
+    server.routes["/ttl"] = [(200, {}, b"old"), (200, {}, b"new")]
+    cache = SourceCache(str(tmp_path), ttl=0.2)
+
+    assert cache.get_url(f"{server.url}/ttl", extract) == "old"
+    assert cache.get_url(f"{server.url}/ttl", extract) == "old"
+    time.sleep(0.3)
+    assert cache.get_url(f"{server.url}/ttl", extract) == "new"
+    assert len(server.hits("/ttl")) == 2
+
+
+def test_lru_eviction_under_max_bytes(tmp_path):
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    for name in ("a", "b", "c"):
+        (sources / f"{name}.txt").write_text(name * 100)
+    cache = SourceCache(str(tmp_path / "cache"), max_bytes=250)
+    reads = []
+
+    def read(path):
+        reads.append(os.path.basename(path))
+        with open(path, "r", encoding="utf-8") as file:
+            return file.read()
+
+    cache.get_file(str(sources / "a.txt"), read)
+    time.sleep(0.01)
+    cache.get_file(str(sources / "b.txt"), read)
+    time.sleep(0.01)
+    # A hit makes "a" the most recently used, so storing "c" evicts "b".
+    cache.get_file(str(sources / "a.txt"), read)
+    time.sleep(0.01)
+    cache.get_file(str(sources / "c.txt"), read)
+    assert reads == ["a.txt", "b.txt", "c.txt"]
+
+    cache.get_file(str(sources / "a.txt"), read)
+    assert reads == ["a.txt", "b.txt", "c.txt"]
+    assert len(os.listdir(tmp_path / "cache" / "blobs")) == 2
+
+    with open(tmp_path / "cache" / "index.json", "r", encoding="utf-8") as file:
+        assert not any("b.txt" in key for key in json.load(file))
@@ -0,0 +1,135 @@
+"""
+这个模块提供了 `TokenLedger` 类，用于缓存文本的标记（token）计数，避免对同一段文本重复编码。
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class TokenLedger:
+    """
+    标记计数账本。按文本内容缓存计数，并为摘要、批评等会变化的文本提供按名称的槽位。
+    可以在多个线程间共享（例如主线程和后台摘要线程）；编码在锁外进行。
+
+    Attributes:
+        encoding: 用于计数的 tiktoken 编码。
+        max_entries (int): 按内容缓存的最大条目数，超出后淘汰最久未使用的条目。
+        max_text_length (int): 可缓存文本的最大字符数，更长的文本只计数不缓存。
+    """
+
+    def __init__(self, encoding, max_entries: int = 4096, max_text_length: int = 65536):
+        """
+        构造一个 `TokenLedger` 实例。
+
+        Args:
+            encoding: 用于计数的 tiktoken 编码。
+            max_entries (int, optional): 按内容缓存的最大条目数。
+            max_text_length (int, optional): 可缓存文本的最大字符数。
+        """
+        self.encoding = encoding
+        self.max_entries = max_entries
+        self.max_text_length = max_text_length
+        self._counts = OrderedDict()
+        self._slots = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, text: str) -> int:
+        """
+        返回文本的标记数。相同内容只编码一次。
+
+        Args:
+            text (str): 要计数的文本。
+
+        Returns:
+            int: 文本的标记数。
+        """
+        if not text:
+            return 0
+
+        with self._lock:
+            cached = self._counts.get(text)
+            if cached is not None:
+                self._counts.move_to_end(text)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        num_tokens = len(self.encoding.encode(text))
+        if len(text) > self.max_text_length:
+            return num_tokens
+
+        with self._lock:
+            self._counts[text] = num_tokens
+            if len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return num_tokens
+
+    def slot(self, name: str, text: str) -> int:
+        """
+        返回命名槽位中文本的标记数。只有当槽位的文本版本变化时才重新计数，
+        旧版本不会留在按内容缓存中。
+
+        Args:
+            name (str): 槽位名称，例如 "summary" 或 "criticism"。
+            text (str): 槽位的当前文本。
+
+        Returns:
+            int: 文本的标记数。
+        """
+        with self._lock:
+            current = self._slots.get(name)
+            if current is not None and current[0] == text:
+                self.hits += 1
+                return current[1]
+            self.misses += 1
+
+        num_tokens = len(self.encoding.encode(text)) if text else 0
+        with self._lock:
+            self._slots[name] = (text, num_tokens)
+        return num_tokens
+
+    def fit(self, texts: list, max_tokens: int) -> list:
+        """
+        从最新的文本开始，选取总标记数不超过 `max_tokens` 的文本，并保持原有顺序。
+
+        Args:
+            texts (list): 按时间顺序排列的文本列表。
+            max_tokens (int): 标记预算。
+
+        Returns:
+            list: 能放入预算的最新文本，按时间顺序排列。
+        """
+        selected = []
+        total = 0
+        for text in reversed(texts):
+            total += self.count(text)
+            if total > max_tokens:
+                break
+            selected.append(text)
+        selected.reverse()
+        return selected
+
+    def fit_ranked(self, items: list, max_tokens: int) -> list:
+        """
+        按优先级选取总标记数不超过 `max_tokens` 的文本，放不下的文本被跳过，
+        结果按位置（时间顺序）排列。
+
+        Args:
+            items (list): (位置, 文本) 的列表，按优先级排列。
+            max_tokens (int): 标记预算。
+
+        Returns:
+            list: 选中的文本，按位置排列。
+        """
+        selected = []
+        total = 0
+        for (position, text) in items:
+            num_tokens = self.count(text)
+            if total + num_tokens > max_tokens:
+                continue
+            total += num_tokens
+            selected.append((position, text))
+        selected.sort()
+        return [text for (_, text) in selected]
@@ -0,0 +1,109 @@
+"""
+这个模块提供了离线可用的分词器缓存。
+
+tiktoken 默认把 BPE 文件下载到临时目录，重启机器后需要重新下载，离线时无法使用。
+这里把缓存目录固定在用户主目录下（可用 TIKTOKEN_CACHE_DIR 覆盖），并在进程内缓存已加载的编码；
+`python tokenizer.py` 可以提前下载编码，或者把本地的 BPE 文件装入缓存，之后完全离线可用。
+
+用法:
+    python tokenizer.py [模型名 ...]
+    python tokenizer.py --install <编码名> <BPE文件>
+"""
+
+import os
+import sys
+import shutil
+import hashlib
+import functools
+
+from exceptions import TokenizerUnavailableError
+
+# 分词器缓存目录，tiktoken 通过 TIKTOKEN_CACHE_DIR 读取。
+CACHE_DIR = os.getenv("TIKTOKEN_CACHE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".cache", "miniagi", "tiktoken"
+)
+
+# tiktoken 格式的编码文件地址，缓存文件以地址的 SHA-1 命名。
+BPE_URLS = {
+    "r50k_base": "https://openaipublic.blob.core.windows.net/encodings/r50k_base.tiktoken",
+    "p50k_base": "https://openaipublic.blob.core.windows.net/encodings/p50k_base.tiktoken",
+    "cl100k_base": "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken",
+}
+
+# 默认预加载的模型，与 main.py 使用的模型一致。
+DEFAULT_MODELS = ("gpt-4", "gpt-3.5-turbo")
+
+
+@functools.lru_cache(maxsize=None)
+def encoding_for_model(model_name: str):
+    """
+    返回模型的编码。第一次调用时才导入 tiktoken，同一进程中的后续调用直接返回已加载的编码。
+
+    Args:
+        model_name (str): 模型名称。
+
+    Returns:
+        tiktoken.Encoding: 模型的编码。
+
+    Raises:
+        TokenizerUnavailableError: 缓存中没有编码且无法下载时。
+    """
+    os.environ.setdefault("TIKTOKEN_CACHE_DIR", CACHE_DIR)
+    import tiktoken  # pylint: disable=import-outside-toplevel
+
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except (OSError, ValueError) as exception:
+        raise TokenizerUnavailableError(
+            f"无法加载 {model_name} 的分词器: {exception}\n"
+            f"请在联网时运行 `python tokenizer.py {model_name}`，"
+            f"或用 `python tokenizer.py --install <编码名> <BPE文件>` 装入本地文件。"
+        ) from exception
+
+
+def cache_path(encoding_name: str) -> str:
+    """
+    返回编码在缓存目录中的文件路径。
+
+    Args:
+        encoding_name (str): 编码名称，例如 "cl100k_base"。
+
+    Returns:
+        str: 缓存文件路径。
+    """
+    cache_dir = os.environ.get("TIKTOKEN_CACHE_DIR", CACHE_DIR)
+    return os.path.join(cache_dir, hashlib.sha1(BPE_URLS[encoding_name].encode()).hexdigest())
+
+
+def install(encoding_name: str, path: str) -> str:
+    """
+    把本地的 BPE 文件装入缓存，使编码无需联网即可加载。
+
+    Args:
+        encoding_name (str): 编码名称，例如 "cl100k_base"。
+        path (str): 本地 `.tiktoken` 文件路径。
+
+    Returns:
+        str: 缓存文件路径。
+    """
+    target = cache_path(encoding_name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f"{target}.tmp"
+    shutil.copyfile(path, tmp_path)
+    os.replace(tmp_path, target)
+    return target
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--install":
+        print(install(sys.argv[2], sys.argv[3]))
+        return 0
+
+    for model_name in sys.argv[1:] or DEFAULT_MODELS:
+        encoding = encoding_for_model(model_name)
+        print(f"{model_name}: {encoding.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
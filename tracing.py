@@ -0,0 +1,261 @@
+"""
+这个模块提供了按步骤的追踪：`Tracer` 记录 think、LLM 调用、解析、act、来源读取、摘要和分词等阶段的耗时，
+以及输入输出的标记数和读取的字节数，并把每个区间以一行 JSON 写入追踪文件。
+
+当作为脚本运行时，按阶段汇总追踪文件中的耗时：
+
+用法:
+    python tracing.py <追踪文件>
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+
+class Span:
+    """
+    一个追踪区间。
+
+    Attributes:
+        name (str): 阶段名称。
+        attrs (dict): 区间的属性，例如 tokens_in、tokens_out 和 bytes。
+    """
+
+    __slots__ = ("name", "attrs")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        """
+        设置区间的属性。
+        """
+        self.attrs.update(attrs)
+
+
+class _NullSpan(Span):
+    """
+    追踪关闭时使用的区间，忽略所有属性。
+    """
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan("", {})
+
+
+class Tracer:
+    """
+    把追踪区间写入 JSONL 文件。没有指定文件时不做任何记录。
+
+    每行包含 name、step、parent、thread、start（Unix 时间）、duration_s、区间的属性，
+    以及区间内抛出异常时的 error。
+
+    Attributes:
+        path (str): 追踪文件路径；为 None 时不记录。
+        enabled (bool): 是否记录。
+        step (int): 当前步数，写入之后开始的每个区间。
+    """
+
+    def __init__(self, path: str = None):
+        """
+        构造一个 `Tracer` 实例。
+
+        Args:
+            path (str, optional): 追踪文件路径，以追加方式写入。
+        """
+        self.path = path
+        self.enabled = path is not None
+        self.step = 0
+        self._file = open(path, "a", encoding="utf-8") if self.enabled else None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """
+        记录代码块的耗时。
+
+        Args:
+            name (str): 阶段名称。
+            **attrs: 区间的初始属性。
+
+        Yields:
+            Span: 可以在代码块中补充属性的区间。
+        """
+        if not self.enabled:
+            yield _NULL_SPAN
+            return
+
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        parent = stack[-1].name if stack else None
+
+        span = Span(name, attrs)
+        step = self.step
+        stack.append(span)
+        wall_start = time.time()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield span
+        except BaseException as exception:
+            error = type(exception).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+            record = {
+                "name": name,
+                "step": step,
+                "parent": parent,
+                "thread": threading.current_thread().name,
+                "start": wall_start,
+                "duration_s": duration,
+                **span.attrs,
+            }
+            if error is not None:
+                record["error"] = error
+            self._write(record, flush=parent is None)
+
+    def _write(self, record: dict, flush: bool):
+        """
+        写入一条记录。顶层区间结束时刷新文件。
+
+        Args:
+            record (dict): 记录。
+            flush (bool): 是否刷新文件。
+        """
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if flush:
+                self._file.flush()
+
+    def close(self):
+        """
+        关闭追踪文件。
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        self.enabled = False
+
+
+class TracedEncoding:
+    """
+    包装 tiktoken 编码，为每次 `encode` 记录一个 count_tokens 区间。
+    """
+
+    def __init__(self, encoding, tracer: Tracer):
+        self.encoding = encoding
+        self.tracer = tracer
+
+    def __getattr__(self, name):
+        return getattr(self.encoding, name)
+
+    def encode(self, text, *args, **kwargs):
+        with self.tracer.span("count_tokens", chars=len(text)) as span:
+            tokens = self.encoding.encode(text, *args, **kwargs)
+            span.set(tokens_out=len(tokens))
+        return tokens
+
+
+def percentile(values: list, fraction: float) -> float:
+    """
+    计算已排序列表的百分位数（最近秩法）。
+
+    Args:
+        values (list): 已排序的数值。
+        fraction (float): 0 到 1 之间的百分位。
+
+    Returns:
+        float: 百分位数。
+    """
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def summarize_trace(path: str) -> dict:
+    """
+    按阶段汇总追踪文件。
+
+    Args:
+        path (str): 追踪文件路径。
+
+    Returns:
+        dict: 阶段名称到 count、total_s、p50_s、p95_s、tokens_in、tokens_out 和 bytes 的映射，
+            以及 "_run" 中的步数和总时长。
+    """
+    durations = {}
+    totals = {}
+    steps = set()
+    (first, last) = (None, None)
+
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            durations.setdefault(record["name"], []).append(record["duration_s"])
+            sums = totals.setdefault(record["name"], {"tokens_in": 0, "tokens_out": 0, "bytes": 0})
+            for key in sums:
+                sums[key] += record.get(key) or 0
+            steps.add(record["step"])
+            end = record["start"] + record["duration_s"]
+            first = record["start"] if first is None else min(first, record["start"])
+            last = end if last is None else max(last, end)
+
+    summary = {}
+    for (name, values) in durations.items():
+        values.sort()
+        summary[name] = {
+            "count": len(values),
+            "total_s": sum(values),
+            "p50_s": percentile(values, 0.5),
+            "p95_s": percentile(values, 0.95),
+            **totals[name],
+        }
+    summary["_run"] = {"steps": len(steps), "wall_s": (last - first) if first is not None else 0.0}
+    return summary
+
+
+def print_summary(summary: dict):
+    """
+    以表格形式打印 `summarize_trace` 的结果，按总耗时从高到低排列。
+
+    Args:
+        summary (dict): `summarize_trace` 返回的汇总。
+    """
+    run = summary["_run"]
+    print(f"steps={run['steps']} wall={run['wall_s']:.2f}s")
+    print(f"{'phase':<20} {'n':>6} {'total':>10} {'p50':>10} {'p95':>10} {'tok_in':>9} {'tok_out':>9} {'bytes':>11}")
+    phases = sorted(
+        ((name, stats) for (name, stats) in summary.items() if name != "_run"),
+        key=lambda item: -item[1]["total_s"]
+    )
+    for (name, stats) in phases:
+        print(f"{name:<20} {stats['count']:>6} {stats['total_s']:>9.3f}s "
+              f"{stats['p50_s'] * 1000:>8.1f}ms {stats['p95_s'] * 1000:>8.1f}ms "
+              f"{stats['tokens_in']:>9} {stats['tokens_out']:>9} {stats['bytes']:>11}")
+
+
+def main():
+    if len(sys.argv) != 2 or not os.path.exists(sys.argv[1]):
+        print("Usage: tracing.py <trace.jsonl>")
+        return 1
+    print_summary(summarize_trace(sys.argv[1]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())